@@ -1,4 +1,14 @@
+import atexit
+import json
 import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# 日志调用方只把 record 放入队列, 格式化、写文件和滚动都在后台 QueueListener 线程中完成,
+# 交易和回测的热路径不会被磁盘 IO 阻塞
 
 # 1.创建一个logger实例，并且logger实例的名称命名为“single info”，设定的严重级别为DEBUG
 LOGGER = logging.getLogger("qbot")
@@ -11,8 +21,18 @@ LOGGER_TXT.setLevel(logging.DEBUG)
 ch = logging.StreamHandler()
 ch.setLevel(logging.DEBUG)
 
-# 2、创建一个handler，用于写入日志文件
-fh = logging.FileHandler("qbot_pro.log", encoding="utf-8", mode="a")
+# 2、创建一个handler，用于写入日志文件, 单个文件超过 50MB 时滚动
+# 日志目录由 QBOT_LOG_DIR 指定, 默认 ~/.qbot/logs; delay=True 时第一条记录写入时才创建文件
+LOG_DIR = os.path.expanduser(os.environ.get("QBOT_LOG_DIR", os.path.join("~", ".qbot", "logs")))
+os.makedirs(LOG_DIR, exist_ok=True)
+fh = RotatingFileHandler(
+    os.path.join(LOG_DIR, "qbot_pro.log"),
+    encoding="utf-8",
+    mode="a",
+    maxBytes=50 * 2**20,
+    backupCount=5,
+    delay=True,
+)
 fh.setLevel(logging.WARNING)
 
 # 3.创建handler的输出格式（formatter）
@@ -20,10 +40,129 @@ formatter = logging.Formatter(
     "%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d %(funcName)s: %(message)s"
 )
 
+# attributes of every LogRecord, the others come from ``extra`` and go into the json lines
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """one json object per line: time, level, logger, file, line, func, msg and the extra fields"""
+
+    def format(self, record):
+        data = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.filename,
+            "line": record.lineno,
+            "func": record.funcName,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    # the listener runs in this process: hand over the record as is and leave the
+    # formatting of the message to the listener thread
+    def prepare(self, record):
+        return record
+
+
+_listeners = []
+
+
+def queue_handlers(logger, *handlers):
+    """
+    send the records of ``logger`` through a queue to ``handlers``, which are served by a
+    background thread, return the started QueueListener
+    """
+    records = queue.SimpleQueue()
+    logger.addHandler(_QueueHandler(records))
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    return listener
+
+
+def set_json_lines(enabled=True, handlers=None):
+    """write json lines instead of text to ``handlers``, the log file by default"""
+    for handler in handlers or [fh]:
+        handler.setFormatter(JsonFormatter() if enabled else formatter)
+
+
+@atexit.register
+def _stop_listeners():
+    # flush the records still in the queues
+    for listener in _listeners:
+        listener.stop()
+    _listeners.clear()
+
+
+class RateLimitedLogger:
+    """
+    logger for per-tick messages: each message (or ``key``) is logged at most once per
+    ``interval`` seconds and only every ``sample``-th call, the next message logged tells how
+    many were suppressed
+
+    .. code-block:: python
+
+        tick_log = RateLimitedLogger(LOGGER, interval=1.0)
+        tick_log.info("tick %s %s", symbol, price, key=symbol)
+    """
+
+    def __init__(self, logger, interval=1.0, sample=1):
+        self.logger = logger
+        self.interval = interval
+        self.sample = sample
+        self._state = {}  # key -> [calls, suppressed, last logged time]
+        self._lock = threading.Lock()
+
+    def _allow(self, key):
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.get(key)
+            if state is None:
+                state = self._state[key] = [0, 0, float("-inf")]
+            state[0] += 1
+            if (state[0] - 1) % self.sample or now - state[2] < self.interval:
+                state[1] += 1
+                return None
+            suppressed, state[1], state[2] = state[1], 0, now
+            return suppressed
+
+    def log(self, level, msg, *args, key=None, **kwargs):
+        if not self.logger.isEnabledFor(level):
+            return
+        suppressed = self._allow(msg if key is None else key)
+        if suppressed is None:
+            return
+        if suppressed:
+            msg = f"{msg} ({suppressed} suppressed)"
+        kwargs.setdefault("stacklevel", 3)
+        self.logger.log(level, msg, *args, **kwargs)
+
+    def debug(self, msg, *args, **kwargs):
+        self.log(logging.DEBUG, msg, *args, **kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        self.log(logging.INFO, msg, *args, **kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        self.log(logging.WARNING, msg, *args, **kwargs)
+
+    def error(self, msg, *args, **kwargs):
+        self.log(logging.ERROR, msg, *args, **kwargs)
+
+
 # 4.将formatter添加到handler中
 ch.setFormatter(formatter)
 fh.setFormatter(formatter)
+if os.environ.get("QBOT_LOG_JSON"):
+    set_json_lines()
 
-# 5.将handler添加到logger中
-LOGGER.addHandler(ch)
-LOGGER_TXT.addHandler(fh)
+# 5.将handler添加到logger中, 经由队列交给后台线程
+queue_handlers(LOGGER, ch, fh)
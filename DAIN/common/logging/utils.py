@@ -1,8 +1,19 @@
 import logging
+from logging.handlers import RotatingFileHandler
+
+from qbot.common.logging.logger import JsonFormatter, queue_handlers
 
 
 class logger:
-    def __init__(self, path, clevel=logging.INFO, Flevel=logging.INFO):
+    def __init__(
+        self,
+        path,
+        clevel=logging.INFO,
+        Flevel=logging.INFO,
+        json_lines=False,
+        max_bytes=50 * 2**20,
+        backup_count=5,
+    ):
         self.logger = logging.getLogger(path)
         self.logger.setLevel(logging.DEBUG)
         fmt = logging.Formatter(
@@ -12,12 +23,14 @@ class logger:
         sh = logging.StreamHandler()
         sh.setFormatter(fmt)
         sh.setLevel(clevel)
-        # 设置文件日志
-        fh = logging.FileHandler(path, encoding="utf-8")
-        fh.setFormatter(fmt)
+        # 设置文件日志, 超过 max_bytes 时滚动
+        fh = RotatingFileHandler(
+            path, encoding="utf-8", maxBytes=max_bytes, backupCount=backup_count
+        )
+        fh.setFormatter(JsonFormatter() if json_lines else fmt)
         fh.setLevel(Flevel)
-        self.logger.addHandler(sh)
-        self.logger.addHandler(fh)
+        # 写日志由后台线程完成, 调用方只入队
+        self.listener = queue_handlers(self.logger, sh, fh)
 
     def debug(self, message):
         self.logger.debug(message)
@@ -26,7 +39,7 @@ class logger:
         self.logger.info(message)
 
     def war(self, message):
-        self.logger.warn(message)
+        self.logger.warning(message)
 
     def error(self, message):
         self.logger.error(message)
@@ -0,0 +1,456 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Benchmark and round-trip check for ``dump_bin.py`` and ``dump_pit.py`` on synthetic data.
+
+Generates a CSV universe of N symbols x M days (daily or 1-minute), runs each dump mode
+stage by stage, reports rows/sec and peak RSS (main process + workers) per stage and
+verifies the result by reading the ``.bin`` files directly, no qlib init required.
+
+    python bench_dump.py run --n_symbols 500 --n_days 2500 --freq day --max_workers 8
+    python bench_dump.py run --n_symbols 50 --n_days 60 --freq 1min --modes all,update
+"""
+
+import json
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import fire
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from chunked_bin import read_chunked
+from dump_bin import DumpDataAll, DumpDataFix, DumpDataIncremental, DumpDataUpdate
+from dump_pit import DumpPitData
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+FIELDS = ["open", "high", "low", "close", "volume", "factor"]
+PIT_FIELDS = ["roeWa", "yoyNI"]
+
+
+def _proc_rss(pid: int) -> int:
+    """rss in bytes of ``pid`` and all its descendants, read from /proc"""
+    total = 0
+    stack = [pid]
+    while stack:
+        p = stack.pop()
+        try:
+            with open(f"/proc/{p}/statm") as f:
+                total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+            for task in os.listdir(f"/proc/{p}/task"):
+                with open(f"/proc/{p}/task/{task}/children") as f:
+                    stack.extend(int(c) for c in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+def tree_rss(pid: int = None) -> int:
+    pid = os.getpid() if pid is None else pid
+    if psutil is not None:
+        try:
+            proc = psutil.Process(pid)
+            procs = [proc] + proc.children(recursive=True)
+        except psutil.Error:
+            return 0
+        total = 0
+        for p in procs:
+            try:
+                total += p.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+    return _proc_rss(pid)
+
+
+class PeakRSS:
+    """sample the rss of this process tree in a background thread, the peak is kept in ``peak``"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, tree_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = tree_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, tree_rss())
+
+
+def trading_calendar(n_days: int, freq: str = "day", end: str = "2022-12-30") -> pd.DatetimeIndex:
+    """weekdays ending at ``end``, with 240 bars per day (A-share sessions) for ``1min``"""
+    days = pd.bdate_range(end=end, periods=n_days)
+    if freq == "day":
+        return days
+    minutes = np.concatenate(
+        [
+            np.arange(9 * 60 + 31, 11 * 60 + 31),  # 09:31 - 11:30
+            np.arange(13 * 60 + 1, 15 * 60 + 1),  # 13:01 - 15:00
+        ]
+    ).astype("timedelta64[m]")
+    return pd.DatetimeIndex((days.values[:, None] + minutes[None, :]).ravel())
+
+
+def generate_universe(
+    csv_dir: Path,
+    n_symbols: int,
+    calendar: pd.DatetimeIndex,
+    seed: int = 0,
+    missing: float = 0.01,
+) -> int:
+    """
+    write ``n_symbols`` csv files with staggered listing dates, random missing bars and
+    suspended (all NaN) stretches; return the total number of rows
+    """
+    rng = np.random.default_rng(seed)
+    csv_dir.mkdir(parents=True, exist_ok=True)
+    n = len(calendar)
+    rows = 0
+    for i in range(n_symbols):
+        symbol = f"{'SH' if i % 2 else 'SZ'}{600000 + i:06d}"
+        begin = int(rng.integers(0, max(1, n // 4)))
+        idx = np.arange(begin, n)
+        idx = idx[rng.random(len(idx)) > missing]
+        m = len(idx)
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.01, m)))
+        df = pd.DataFrame(
+            {
+                "symbol": symbol,
+                "date": calendar[idx],
+                "open": close * (1 + rng.normal(0, 0.002, m)),
+                "high": close * (1 + np.abs(rng.normal(0, 0.005, m))),
+                "low": close * (1 - np.abs(rng.normal(0, 0.005, m))),
+                "close": close,
+                "volume": np.round(rng.lognormal(12, 1, m)),
+                "factor": np.ones(m),
+            }
+        )
+        if m > 20 and i % 10 == 0:
+            s = int(rng.integers(0, m - 10))
+            df.loc[s : s + 9, FIELDS] = np.nan
+        df.to_csv(csv_dir.joinpath(f"{symbol.lower()}.csv"), index=False)
+        rows += m
+    return rows
+
+
+def head_universe(csv_dir: Path, head_dir: Path, cut: pd.Timestamp):
+    """copy the csv files of ``csv_dir`` keeping only the rows before ``cut``"""
+    head_dir.mkdir(parents=True, exist_ok=True)
+    for f in sorted(csv_dir.glob("*.csv")):
+        df = pd.read_csv(f, parse_dates=["date"])
+        df[df["date"] < cut].to_csv(head_dir.joinpath(f.name), index=False)
+
+
+def generate_pit_universe(csv_dir: Path, n_symbols: int, n_years: int, seed: int = 0) -> int:
+    """quarterly PIT csv files (date, period, value, field) with some restatements"""
+    rng = np.random.default_rng(seed)
+    csv_dir.mkdir(parents=True, exist_ok=True)
+    rows = 0
+    for i in range(n_symbols):
+        records = []
+        for field in PIT_FIELDS:
+            for year in range(2022 - n_years + 1, 2023):
+                for q in range(1, 5):
+                    period = year * 100 + q
+                    date = pd.Timestamp(year, 3 * q, 1) + pd.offsets.MonthEnd(1) + pd.Timedelta(days=30)
+                    records.append([date.strftime("%Y-%m-%d"), period, rng.normal(), field])
+                    if rng.random() < 0.1:  # restated later
+                        later = date + pd.Timedelta(days=45)
+                        records.append([later.strftime("%Y-%m-%d"), period, rng.normal(), field])
+        df = pd.DataFrame(records, columns=["date", "period", "value", "field"])
+        df.to_csv(csv_dir.joinpath(f"sh{600000 + i:06d}.csv"), index=False)
+        rows += len(df)
+    return rows
+
+
+def read_bin(bin_path: Path) -> (int, np.ndarray):
+    """read a feature ``.bin`` or ``.cbin`` file: (start index in the calendar, float32 values)"""
+    if bin_path.suffix == ".cbin":
+        return read_chunked(bin_path)
+    data = np.fromfile(bin_path, dtype="<f4")
+    if len(data) == 0:
+        return 0, data
+    return int(data[0]), data[1:]
+
+
+def verify_features(qlib_dir: Path, csv_dir: Path, freq: str, fields=FIELDS, suffix: str = ".bin") -> list:
+    """
+    compare every ``<field>.<freq><suffix>`` against its csv, aligned through the calendar;
+    return a list of mismatch descriptions
+    """
+    calendar = pd.to_datetime(
+        pd.read_csv(qlib_dir.joinpath("calendars", f"{freq}.txt"), header=None)[0]
+    ).values
+    errors = []
+    for csv_file in sorted(csv_dir.glob("*.csv")):
+        df = pd.read_csv(csv_file, parse_dates=["date"]).drop_duplicates("date")
+        # dates outside the calendar are dropped by the dumpers, eg. by ``dump_fix``
+        df = df[df["date"].isin(calendar)].set_index("date").sort_index()
+        if df.empty:
+            continue
+        features_dir = qlib_dir.joinpath("features", csv_file.stem.lower())
+        for field in fields:
+            bin_path = features_dir.joinpath(f"{field}.{freq}{suffix}")
+            if not bin_path.exists():
+                errors.append(f"{csv_file.stem}: missing {bin_path.name}")
+                continue
+            start, values = read_bin(bin_path)
+            dates = calendar[start : start + len(values)]
+            if len(dates) != len(values) or dates[0] != df.index[0].to_datetime64():
+                errors.append(f"{csv_file.stem}.{field}: bad start index {start}")
+                continue
+            expected = df[field].reindex(dates).values.astype("<f4")
+            bad = ~np.isclose(values, expected, rtol=1e-6, equal_nan=True)
+            if bad.any():
+                first = pd.Timestamp(dates[np.argmax(bad)])
+                errors.append(f"{csv_file.stem}.{field}: {bad.sum()} mismatches from {first}")
+    return errors
+
+
+def verify_pit(qlib_dir: Path, csv_dir: Path) -> list:
+    """check that every PIT record of the csv files is found in the ``.data`` files, in date order"""
+    errors = []
+    for csv_file in sorted(csv_dir.glob("*.csv")):
+        df = pd.read_csv(csv_file)
+        for field, df_sub in df.groupby("field"):
+            data_file = qlib_dir.joinpath(
+                DumpPitData.PIT_DIR_NAME, csv_file.stem.lower(), f"{field}_q{DumpPitData.DATA_FILE_SUFFIX}".lower()
+            )
+            if not data_file.exists():
+                errors.append(f"{csv_file.stem}: missing {data_file.name}")
+                continue
+            records = list(struct.iter_unpack(DumpPitData.DATA_DTYPE, data_file.read_bytes()))
+            df_sub = df_sub.sort_values("date", kind="stable")
+            got = np.array([r[2] for r in records], dtype="f4")
+            if len(got) != len(df_sub) or not np.allclose(got, df_sub["value"].values.astype("f4")):
+                errors.append(f"{csv_file.stem}.{field}: {len(got)} records, {len(df_sub)} expected")
+    return errors
+
+
+class DumpHarness:
+    def __init__(self, work_dir: str = None, keep: bool = False):
+        """
+
+        Parameters
+        ----------
+        work_dir: str, default None
+            where the synthetic csv and qlib dirs are created, a temporary dir by default
+        keep: bool, default False
+            keep ``work_dir`` after the run
+        """
+        self.keep = keep
+        self.work_dir = Path(work_dir or tempfile.mkdtemp(prefix="dump_bench_")).expanduser()
+        self.results = []
+        self.feature_format = "bin"
+        self.csv_engine = "auto"
+
+    def _kwargs(self, freq, max_workers):
+        return dict(
+            freq=freq,
+            max_workers=max_workers,
+            exclude_fields="symbol",
+            feature_format=self.feature_format,
+            csv_engine=self.csv_engine,
+        )
+
+    def _verify(self, mode, rows, qlib_dir, csv_dir, freq):
+        suffix = ".cbin" if self.feature_format == "chunked" else ".bin"
+        size = sum(f.stat().st_size for f in qlib_dir.joinpath("features").glob(f"*/*{suffix}"))
+        logger.info(f"{mode:>8} features     {size / 2**20:8.1f} MB on disk")
+        return self._stage(mode, "verify", rows, verify_features, qlib_dir, csv_dir, freq, suffix=suffix)
+
+    def _stage(self, mode: str, stage: str, rows: int, func, *args, **kwargs):
+        with PeakRSS() as rss:
+            start = time.perf_counter()
+            ret = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+        r = {
+            "mode": mode,
+            "stage": stage,
+            "seconds": elapsed,
+            "rows": rows,
+            "rows_per_sec": rows / elapsed if elapsed > 0 else float("inf"),
+            "peak_rss_mb": rss.peak / 2**20,
+        }
+        logger.info(
+            f"{mode:>8} {stage:<12} {elapsed:8.2f}s {r['rows_per_sec']:12.0f} rows/s {r['peak_rss_mb']:8.1f} MB"
+        )
+        self.results.append(r)
+        return ret
+
+    def _run_all(self, mode, csv_dir, qlib_dir, rows, freq, max_workers, **kwargs):
+        dumper = DumpDataAll(
+            csv_path=str(csv_dir), qlib_dir=str(qlib_dir), **self._kwargs(freq, max_workers), **kwargs
+        )
+        self._stage(mode, "date scan", rows, dumper._get_all_date)
+        self._stage(mode, "calendar", rows, dumper._dump_calendars)
+        self._stage(mode, "instruments", rows, dumper._dump_instruments)
+        self._stage(mode, "features", rows, dumper._dump_features)
+
+    def run(
+        self,
+        n_symbols: int = 100,
+        n_days: int = 250,
+        freq: str = "day",
+        max_workers: int = 4,
+        modes: str = "all,single,fix,update,incremental,pit",
+        output: str = None,
+        seed: int = 0,
+        feature_format: str = "bin",
+        csv_engine: str = "auto",
+    ):
+        """
+        Parameters
+        ----------
+        n_symbols: int
+            symbols in the universe
+        n_days: int
+            trading days, each has 240 bars when ``freq`` is "1min"
+        freq: str
+            "day" or "1min"
+        max_workers: int
+            passed to the dumpers
+        modes: str
+            comma separated, any of all, single, fix, update, incremental, pit
+        output: str, default None
+            json file for the results
+        feature_format: str, default "bin"
+            "bin" or "chunked", passed to the dumpers
+        csv_engine: str, default "auto"
+            "pyarrow" or "pandas", passed to the dumpers
+        """
+        self.feature_format = feature_format
+        self.csv_engine = csv_engine
+        modes = modes.split(",") if isinstance(modes, str) else list(modes)
+        calendar = trading_calendar(n_days, freq)
+        errors = []
+        try:
+            csv_dir = self.work_dir.joinpath("csv")
+            rows = self._stage("generate", "csv", 0, generate_universe, csv_dir, n_symbols, calendar, seed)
+            logger.info(f"{n_symbols} symbols, {rows} rows in {csv_dir}")
+
+            if "all" in modes:
+                qlib_dir = self.work_dir.joinpath("qlib_all")
+                self._run_all("all", csv_dir, qlib_dir, rows, freq, max_workers)
+                errors += self._verify("all", rows, qlib_dir, csv_dir, freq)
+
+            if "single" in modes:
+                # dump_all parsing each csv once through the intermediate files
+                qlib_dir = self.work_dir.joinpath("qlib_single")
+                intermediate_dir = self.work_dir.joinpath("intermediate")
+                self._run_all(
+                    "single", csv_dir, qlib_dir, rows, freq, max_workers, intermediate_dir=str(intermediate_dir)
+                )
+                errors += self._verify("single", rows, qlib_dir, csv_dir, freq)
+
+            if "fix" in modes:
+                # dump the first half of the symbols, then let ``dump_fix`` add the rest
+                qlib_dir = self.work_dir.joinpath("qlib_fix")
+                half_dir = self.work_dir.joinpath("csv_half")
+                half_dir.mkdir(exist_ok=True)
+                for f in sorted(csv_dir.glob("*.csv"))[: n_symbols // 2]:
+                    shutil.copy(f, half_dir)
+                DumpDataAll(csv_path=str(half_dir), qlib_dir=str(qlib_dir), **self._kwargs(freq, max_workers)).dump()
+                fixer = DumpDataFix(csv_path=str(csv_dir), qlib_dir=str(qlib_dir), **self._kwargs(freq, max_workers))
+                self._stage("fix", "dump", rows, fixer.dump)
+                errors += self._verify("fix", rows, qlib_dir, csv_dir, freq)
+
+            if "update" in modes:
+                # dump all but the last 5% of the calendar, then update with the full csv files
+                qlib_dir = self.work_dir.joinpath("qlib_update")
+                head_dir = self.work_dir.joinpath("csv_head")
+                head_universe(csv_dir, head_dir, calendar[int(len(calendar) * 0.95)])
+                DumpDataAll(csv_path=str(head_dir), qlib_dir=str(qlib_dir), **self._kwargs(freq, max_workers)).dump()
+                updater = self._stage(
+                    "update",
+                    "load",
+                    rows,
+                    DumpDataUpdate,
+                    csv_path=str(csv_dir),
+                    qlib_dir=str(qlib_dir),
+                    **self._kwargs(freq, max_workers),
+                )
+                self._stage("update", "dump", rows, updater.dump)
+                errors += self._verify("update", rows, qlib_dir, csv_dir, freq)
+
+            if "incremental" in modes:
+                # dump the first 95% of the calendar, run again without changes, then with the
+                # full csv files (appends) and one bar restated in the middle of history (rewrite)
+                qlib_dir = self.work_dir.joinpath("qlib_incremental")
+                inc_dir = self.work_dir.joinpath("csv_incremental")
+                head_universe(csv_dir, inc_dir, calendar[int(len(calendar) * 0.95)])
+
+                def _incremental():
+                    DumpDataIncremental(
+                        csv_path=str(inc_dir), qlib_dir=str(qlib_dir), **self._kwargs(freq, max_workers)
+                    ).dump()
+
+                self._stage("incremental", "initial", rows, _incremental)
+                self._stage("incremental", "no change", rows, _incremental)
+                for f in sorted(csv_dir.glob("*.csv")):
+                    shutil.copy(f, inc_dir)
+                restated = sorted(inc_dir.glob("*.csv"))[0]
+                df = pd.read_csv(restated)
+                df.loc[len(df) // 2, "close"] *= 1.01
+                df.to_csv(restated, index=False)
+                self._stage("incremental", "changed", rows, _incremental)
+                errors += self._verify("incremental", rows, qlib_dir, inc_dir, freq)
+
+            if "pit" in modes:
+                pit_csv = self.work_dir.joinpath("pit_csv")
+                qlib_dir = self.work_dir.joinpath("qlib_pit")
+                pit_rows = generate_pit_universe(pit_csv, n_symbols, max(1, n_days // 250), seed)
+                dumper = DumpPitData(
+                    csv_path=str(pit_csv), qlib_dir=str(qlib_dir), max_workers=max_workers, csv_engine=csv_engine
+                )
+                self._stage("pit", "dump", pit_rows, dumper.dump, interval="quarterly")
+                errors += self._stage("pit", "verify", pit_rows, verify_pit, qlib_dir, pit_csv)
+        finally:
+            if not self.keep:
+                shutil.rmtree(self.work_dir, ignore_errors=True)
+
+        for e in errors:
+            logger.error(e)
+        logger.info(f"{len(errors)} mismatches")
+        if output is not None:
+            with open(output, "w") as f:
+                json.dump(
+                    {
+                        "n_symbols": n_symbols,
+                        "n_days": n_days,
+                        "freq": freq,
+                        "max_workers": max_workers,
+                        "feature_format": feature_format,
+                        "csv_engine": csv_engine,
+                        "results": self.results,
+                        "errors": errors,
+                    },
+                    f,
+                    indent=2,
+                )
+        return len(errors) == 0
+
+
+if __name__ == "__main__":
+    fire.Fire(DumpHarness)
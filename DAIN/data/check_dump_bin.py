@@ -4,14 +4,15 @@
 from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-import datacompy
 import fire
+import numpy as np
 import pandas as pd
-import qlib
 from loguru import logger
-from qlib.data import D
 from tqdm import tqdm
 
+from chunked_bin import read_chunked
+from csv_reader import read_csv
+
 
 class CheckBin:
 
@@ -19,6 +20,7 @@ class CheckBin:
     COMPARE_FALSE = "compare False"
     COMPARE_TRUE = "compare True"
     COMPARE_ERROR = "compare error"
+    FEATURE_SUFFIXES = (".bin", ".cbin")
 
     def __init__(
         self,
@@ -30,6 +32,10 @@ class CheckBin:
         date_field_name: str = "date",
         file_suffix: str = ".csv",
         max_workers: int = 16,
+        fast: bool = False,
+        rtol: float = 1e-05,
+        atol: float = 1e-08,
+        report_path: str = None,
     ):
         """
 
@@ -41,6 +47,7 @@ class CheckBin:
             origin csv path
         check_fields : str, optional
             check fields, by default None, check qlib_dir/features/<first_dir>/*.<freq>.bin
+            and *.<freq>.cbin
         freq : str, optional
             freq, value from ["day", "1m"]
         symbol_field_name: str, optional
@@ -51,24 +58,54 @@ class CheckBin:
             csv file suffix, by default ".csv"
         max_workers: int, optional
             max workers, by default 16
+        fast: bool, optional
+            read the bin files directly with numpy instead of through qlib and datacompy,
+            and report every mismatching symbol and field, by default False
+        rtol: float, optional
+            relative tolerance of the fast check, by default 1e-05
+        atol: float, optional
+            absolute tolerance of the fast check, by default 1e-08
+        report_path: str, optional
+            csv file for the mismatch report of the fast check, by default None
         """
         self.qlib_dir = Path(qlib_dir).expanduser()
         bin_path_list = list(self.qlib_dir.joinpath("features").iterdir())
         self.qlib_symbols = sorted(map(lambda x: x.name.lower(), bin_path_list))
-        qlib.init(
-            provider_uri=str(self.qlib_dir.resolve()),
-            mount_path=str(self.qlib_dir.resolve()),
-            auto_mount=False,
-            redis_port=-1,
-        )
+        self.fast = fast
+        self.rtol = rtol
+        self.atol = atol
+        self.report_path = report_path
+        if fast:
+            self.calendar = (
+                pd.read_csv(
+                    self.qlib_dir.joinpath("calendars", f"{freq}.txt"),
+                    header=None,
+                    dtype=str,
+                )
+                .loc[:, 0]
+                .values.astype("<M8[ns]")
+            )
+        else:
+            import qlib
+
+            qlib.init(
+                provider_uri=str(self.qlib_dir.resolve()),
+                mount_path=str(self.qlib_dir.resolve()),
+                auto_mount=False,
+                redis_port=-1,
+            )
         csv_path = Path(csv_path).expanduser()
         self.csv_files = sorted(
             csv_path.glob(f"*{file_suffix}") if csv_path.is_dir() else [csv_path]
         )
 
         if check_fields is None:
-            check_fields = list(
-                map(lambda x: x.name.split(".")[0], bin_path_list[0].glob("*.bin"))
+            check_fields = sorted(
+                {
+                    x.name.split(".")[0]
+                    for x in bin_path_list[0].iterdir()
+                    if x.suffix in self.FEATURE_SUFFIXES
+                }
             )
         else:
             check_fields = (
@@ -84,8 +121,15 @@ class CheckBin:
         self.freq = freq
         self.file_suffix = file_suffix
 
+    def _get_symbol(self, file_path: Path) -> str:
+        # NOTE: not str.strip, which removes any of the suffix characters from both ends
+        return file_path.name[: -len(self.file_suffix)]
+
     def _compare(self, file_path: Path):
-        symbol = file_path.name.strip(self.file_suffix)
+        import datacompy
+        from qlib.data import D
+
+        symbol = self._get_symbol(file_path)
         if symbol.lower() not in self.qlib_symbols:
             return self.NOT_IN_FEATURES
         # qlib data
@@ -121,9 +165,132 @@ class CheckBin:
             logger.warning(f"{symbol} compare error: {e}")
             return self.COMPARE_ERROR
 
+    def _read_feature(self, features_dir: Path, field: str):
+        """
+        (start, values) of the ``.bin`` or chunked ``.cbin`` file of the field, None if both are missing
+        """
+        bin_path = features_dir.joinpath(f"{field.lower()}.{self.freq}.bin")
+        if bin_path.exists():
+            data = np.fromfile(bin_path, dtype="<f")
+            return int(data[0]), data[1:]
+        cbin_path = bin_path.with_suffix(".cbin")
+        if cbin_path.exists():
+            return read_chunked(cbin_path)
+        return None
+
+    def _fast_compare(self, file_path: Path):
+        """
+        compare the bin files of one symbol with its csv file
+
+        Returns
+        -------
+        (status, mismatches): mismatches are dicts of symbol, field, mismatches, first_bad_date
+        and max_abs_error
+        """
+        symbol = self._get_symbol(file_path)
+        features_dir = self.qlib_dir.joinpath("features", symbol.lower())
+        if symbol.lower() not in self.qlib_symbols:
+            return self.NOT_IN_FEATURES, []
+        try:
+            origin_df = read_csv(
+                file_path,
+                date_column=self.date_field_name,
+                columns=self.check_fields + [self.date_field_name],
+            )
+            origin_df = origin_df.drop_duplicates(self.date_field_name)
+            # dates missing from the calendar are not dumped
+            origin_df = origin_df[
+                origin_df[self.date_field_name].isin(self.calendar)
+            ].set_index(self.date_field_name)
+            mismatches = []
+            for field in self.check_fields:
+                feature = self._read_feature(features_dir, field)
+                if feature is None or field not in origin_df.columns:
+                    # -1: the bin file or the csv column is missing
+                    mismatches.append(
+                        dict(
+                            symbol=symbol,
+                            field=field,
+                            mismatches=-1,
+                            first_bad_date=None,
+                            max_abs_error=None,
+                        )
+                    )
+                    continue
+                start, values = feature
+                dates = self.calendar[start : start + len(values)]
+                expected = (
+                    origin_df[field].reindex(dates).values.astype("<f")
+                    if len(dates) == len(values)
+                    else np.full(len(values), np.nan, dtype="<f")
+                )
+                bad = ~np.isclose(
+                    values, expected, rtol=self.rtol, atol=self.atol, equal_nan=True
+                )
+                if len(origin_df) and dates[0] != origin_df.index.min().to_datetime64():
+                    bad[0] = True
+                if bad.any():
+                    error = np.abs(values[bad].astype(float) - expected[bad])
+                    mismatches.append(
+                        dict(
+                            symbol=symbol,
+                            field=field,
+                            mismatches=int(bad.sum()),
+                            first_bad_date=str(pd.Timestamp(dates[np.argmax(bad)]))
+                            if len(dates)
+                            else None,
+                            # NaN against a value counts as an infinite error
+                            max_abs_error=float(np.nan_to_num(error, nan=np.inf).max()),
+                        )
+                    )
+        except Exception as e:
+            logger.warning(f"{symbol} compare error: {e}")
+            return self.COMPARE_ERROR, []
+        return (self.COMPARE_FALSE if mismatches else self.COMPARE_TRUE), mismatches
+
+    def _fast_check(self):
+        error_list = []
+        not_in_features = []
+        report = []
+        chunksize = max(1, len(self.csv_files) // (self.max_workers * 8))
+        with tqdm(total=len(self.csv_files)) as p_bar:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                for file_path, (_check_res, _mismatches) in zip(
+                    self.csv_files,
+                    executor.map(self._fast_compare, self.csv_files, chunksize=chunksize),
+                ):
+                    symbol = self._get_symbol(file_path)
+                    if _check_res == self.NOT_IN_FEATURES:
+                        not_in_features.append(symbol)
+                    elif _check_res == self.COMPARE_ERROR:
+                        error_list.append(symbol)
+                    report.extend(_mismatches)
+                    p_bar.update()
+
+        logger.info("end of check......")
+        if error_list:
+            logger.warning(f"compare error: {error_list}")
+        if not_in_features:
+            logger.warning(f"not in features: {not_in_features}")
+        report_df = pd.DataFrame(
+            report,
+            columns=["symbol", "field", "mismatches", "first_bad_date", "max_abs_error"],
+        )
+        if not report_df.empty:
+            logger.warning(f"mismatches:\n{report_df.to_string(index=False)}")
+        if self.report_path is not None:
+            report_df.to_csv(self.report_path, index=False)
+        logger.info(
+            f"total {len(self.csv_files)}, {len(error_list)} errors, {len(not_in_features)} not in features, "
+            f"{report_df['symbol'].nunique()} compare false"
+        )
+
     def check(self):
         """Check whether the bin file after ``dump_bin.py`` is executed is consistent with the original csv file data"""
         logger.info("start check......")
+        if self.fast:
+            self._fast_check()
+            return
 
         error_list = []
         not_in_features = []
@@ -133,7 +300,7 @@ class CheckBin:
                 for file_path, _check_res in zip(
                     self.csv_files, executor.map(self._compare, self.csv_files)
                 ):
-                    symbol = file_path.name.strip(self.file_suffix)
+                    symbol = self._get_symbol(file_path)
                     if _check_res == self.NOT_IN_FEATURES:
                         not_in_features.append(symbol)
                     elif _check_res == self.COMPARE_ERROR:
@@ -0,0 +1,205 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+Chunk-compressed feature files, an alternative to the raw float32 ``.bin`` files of ``dump_bin.py``.
+
+Layout, little endian:
+
+    header        magic "QCB2", codec id (uint8), 3 pad bytes, start index in the calendar,
+                  number of values, values per chunk, number of chunks (4 x uint32),
+                  offset of the offset table (uint64)
+    chunks        float32 values of each chunk, compressed with the codec
+    offset table  (number of chunks + 1) x uint64, absolute offset of each chunk and of the end
+
+``read_chunked`` decodes only the chunks covering the requested calendar range. The offset table
+follows the chunks so that ``append_chunked`` rewrites only the last chunk, if it is not full,
+the offset table and the header.
+
+Files of the previous layout "QCB1", with a header without the table offset (3 x uint32 less
+one uint64) and the offset table right after it, are still read; ``append_chunked`` writes them
+back in the current layout.
+zstd and lz4 come from ``numcodecs``, zlib from the standard library is used when it is missing.
+"""
+
+import struct
+import zlib
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+try:
+    import numcodecs
+except ImportError:
+    numcodecs = None
+
+MAGIC = b"QCB2"
+HEADER = struct.Struct("<4sB3xIIIIQ")
+MAGIC_V1 = b"QCB1"
+HEADER_V1 = struct.Struct("<4sB3xIIII")
+CODEC_IDS = {"zlib": 1, "zstd": 2, "lz4": 3}
+CODEC_NAMES = {v: k for k, v in CODEC_IDS.items()}
+DEFAULT_CHUNK_SIZE = 4096
+
+
+def _compressor(codec: str):
+    if codec == "zlib":
+        return lambda buf: zlib.compress(buf, 1)
+    if codec == "zstd":
+        return numcodecs.Zstd(level=1).encode
+    if codec == "lz4":
+        return numcodecs.LZ4().encode
+    raise ValueError(f"unknown codec {codec}, use one of {list(CODEC_IDS)}")
+
+
+def _decompressor(codec_id: int):
+    if codec_id == CODEC_IDS["zlib"]:
+        return zlib.decompress
+    if numcodecs is None:
+        raise ImportError("numcodecs is required to read zstd or lz4 chunks")
+    if codec_id == CODEC_IDS["zstd"]:
+        return numcodecs.Zstd().decode
+    if codec_id == CODEC_IDS["lz4"]:
+        return numcodecs.LZ4().decode
+    raise ValueError(f"unknown codec id {codec_id}")
+
+
+def resolve_codec(codec: str) -> str:
+    """``codec`` itself, or zlib if it needs numcodecs which is not installed"""
+    if codec not in CODEC_IDS:
+        raise ValueError(f"unknown codec {codec}, use one of {list(CODEC_IDS)}")
+    if codec != "zlib" and numcodecs is None:
+        logger.warning(f"numcodecs not installed, use zlib instead of {codec}")
+        return "zlib"
+    return codec
+
+
+def write_chunked(
+    path: Path,
+    date_index: int,
+    values: np.ndarray,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    codec: str = "zlib",
+):
+    path = Path(path)
+    values = np.ascontiguousarray(values, dtype="<f")
+    chunks = _compress_chunks(values, chunk_size, codec)
+    offsets = _offsets(HEADER.size, chunks)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as fp:
+        fp.write(
+            HEADER.pack(
+                MAGIC,
+                CODEC_IDS[codec],
+                int(date_index),
+                len(values),
+                chunk_size,
+                len(chunks),
+                int(offsets[-1]),
+            )
+        )
+        for chunk in chunks:
+            fp.write(chunk)
+        fp.write(offsets.tobytes())
+    tmp_path.replace(path)
+
+
+def _compress_chunks(values: np.ndarray, chunk_size: int, codec: str) -> list:
+    compress = _compressor(codec)
+    return [
+        compress(values[i : i + chunk_size].tobytes())
+        for i in range(0, len(values), chunk_size)
+    ]
+
+
+def _offsets(start: int, chunks: list) -> np.ndarray:
+    offsets = np.empty(len(chunks) + 1, dtype="<u8")
+    offsets[0] = start
+    offsets[1:] = start + np.cumsum([len(c) for c in chunks], dtype="<u8")
+    return offsets
+
+
+def _read_header(fp, path):
+    """codec id, start index, number of values, values per chunk, number of chunks, table offset"""
+    magic = fp.read(len(MAGIC))
+    fp.seek(0)
+    if magic == MAGIC:
+        return HEADER.unpack(fp.read(HEADER.size))[1:]
+    if magic == MAGIC_V1:
+        return HEADER_V1.unpack(fp.read(HEADER_V1.size))[1:] + (HEADER_V1.size,)
+    raise ValueError(f"{path} is not a chunked feature file (magic {magic!r})")
+
+
+def append_chunked(path: Path, values: np.ndarray):
+    """
+    append ``values`` after the last value of the file, with the codec of the file
+
+    The full chunks are left in place, only the last chunk if it is not full, the offset table and
+    the header are rewritten, in place like the appends of the raw ``.bin`` files. A QCB1 file
+    becomes a QCB2 one: its chunks start after its offset table, beyond the larger header, and
+    the new table is written after the chunks.
+    """
+    values = np.ascontiguousarray(values, dtype="<f")
+    if len(values) == 0:
+        return
+    with Path(path).open("r+b") as fp:
+        codec_id, date_index, length, chunk_size, n_chunks, table_offset = _read_header(fp, path)
+        fp.seek(table_offset)
+        offsets = np.frombuffer(fp.read(8 * (n_chunks + 1)), dtype="<u8")
+        keep = length // chunk_size
+        if keep < n_chunks:
+            fp.seek(int(offsets[keep]))
+            raw = fp.read(int(offsets[keep + 1] - offsets[keep]))
+            tail = np.frombuffer(_decompressor(codec_id)(raw), dtype="<f")
+            values = np.concatenate([tail, values])
+        chunks = _compress_chunks(values, chunk_size, CODEC_NAMES[codec_id])
+        offsets = np.concatenate([offsets[:keep], _offsets(int(offsets[keep]), chunks)])
+        fp.seek(int(offsets[keep]))
+        for chunk in chunks:
+            fp.write(chunk)
+        fp.write(offsets.tobytes())
+        fp.truncate()
+        fp.seek(0)
+        fp.write(
+            HEADER.pack(
+                MAGIC,
+                codec_id,
+                date_index,
+                keep * chunk_size + len(values),
+                chunk_size,
+                keep + len(chunks),
+                int(offsets[-1]),
+            )
+        )
+
+
+def read_chunked(path: Path, start: int = None, end: int = None) -> (int, np.ndarray):
+    """
+    read the values between calendar indexes ``start`` (included) and ``end`` (excluded)
+
+    Returns
+    -------
+    (index, values): calendar index of the first value returned, float32 values
+    """
+    with Path(path).open("rb") as fp:
+        codec_id, date_index, length, chunk_size, n_chunks, table_offset = _read_header(fp, path)
+        lo = date_index if start is None else max(start, date_index)
+        hi = date_index + length if end is None else min(end, date_index + length)
+        if hi <= lo:
+            return lo, np.empty(0, dtype="<f")
+        first = (lo - date_index) // chunk_size
+        last = (hi - date_index - 1) // chunk_size + 1
+        fp.seek(table_offset + 8 * first)
+        offsets = np.frombuffer(fp.read(8 * (last - first + 1)), dtype="<u8")
+        fp.seek(int(offsets[0]))
+        raw = fp.read(int(offsets[-1] - offsets[0]))
+    decompress = _decompressor(codec_id)
+    rel = (offsets - offsets[0]).astype(np.int64)
+    values = np.concatenate(
+        [
+            np.frombuffer(decompress(raw[rel[i] : rel[i + 1]]), dtype="<f")
+            for i in range(len(rel) - 1)
+        ]
+    )
+    cut = lo - date_index - first * chunk_size
+    return lo, values[cut : cut + hi - lo]
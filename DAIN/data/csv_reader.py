@@ -0,0 +1,116 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+"""
+CSV reader shared by ``dump_bin.py`` and ``dump_pit.py``.
+
+With ``pyarrow`` installed the files are parsed by ``pyarrow.csv`` with explicit column types
+and multiple threads, otherwise by ``pandas.read_csv``. Both engines return the same frame: the
+date column as ``datetime64[ns]`` (or ``YYYYMMDD`` int32), the requested dtypes, and only the
+requested columns which exist in the file.
+"""
+
+import io
+from pathlib import Path
+from typing import Dict, Iterable, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+ENGINES = ("auto", "pyarrow", "pandas")
+
+
+def resolve_engine(engine: str = "auto") -> str:
+    if engine not in ENGINES:
+        raise ValueError(f"unknown csv engine {engine}, use one of {ENGINES}")
+    if engine == "pyarrow" and pa is None:
+        raise ImportError("pyarrow is required for the pyarrow csv engine")
+    if engine == "auto":
+        return "pandas" if pa is None else "pyarrow"
+    return engine
+
+
+def read_header(source: Union[Path, str, io.BytesIO], sep: str = ",") -> list:
+    if isinstance(source, io.BytesIO):
+        line = source.getvalue().split(b"\n", 1)[0]
+    else:
+        with open(source, "rb") as fp:
+            line = fp.readline()
+    return [c.strip().strip('"') for c in line.decode("utf-8-sig").strip().split(sep)]
+
+
+def _arrow_type(dtype: str):
+    if dtype in ("str", "string", "object"):
+        return pa.string()
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+
+def read_csv(
+    source: Union[Path, str, io.BytesIO],
+    date_column: str = None,
+    date_as_int: bool = False,
+    columns: Iterable[str] = None,
+    dtypes: Dict[str, str] = None,
+    engine: str = "auto",
+    use_threads: bool = True,
+) -> pd.DataFrame:
+    """
+
+    Parameters
+    ----------
+    source: Path, str or BytesIO
+        csv file or its content
+    date_column: str, default None
+        parsed as datetime64[ns], or as YYYYMMDD int32 if ``date_as_int``
+    columns: Iterable[str], default None
+        read only these columns, those missing in the file are skipped; all columns by default
+    dtypes: dict, default None
+        column -> numpy dtype, "str" for strings
+    engine: str, default "auto"
+        "pyarrow", "pandas", or "auto" for pyarrow when it is installed
+    use_threads: bool, default True
+        parse with multiple threads, pyarrow only
+    """
+    if isinstance(source, Path):
+        source = str(source.resolve())
+    if columns is not None:
+        header = read_header(source)
+        wanted = set(columns)
+        columns = [c for c in header if c in wanted]
+    dtypes = {} if dtypes is None else dict(dtypes)
+    if columns is not None:
+        dtypes = {c: t for c, t in dtypes.items() if c in columns}
+    if isinstance(source, io.BytesIO):
+        source.seek(0)
+
+    if resolve_engine(engine) == "pyarrow":
+        column_types = {c: _arrow_type(t) for c, t in dtypes.items()}
+        if date_column is not None:
+            column_types[date_column] = pa.string() if date_as_int else pa.timestamp("ns")
+        table = pa_csv.read_csv(
+            source,
+            read_options=pa_csv.ReadOptions(use_threads=use_threads),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=column_types, include_columns=columns
+            ),
+        )
+        if date_as_int and date_column in table.column_names:
+            i = table.column_names.index(date_column)
+            dates = pc.cast(pc.replace_substring(table[date_column], "-", ""), pa.int32())
+            table = table.set_column(i, date_column, dates)
+        return table.to_pandas()
+
+    pd_dtypes = {c: (str if t in ("str", "string", "object") else t) for c, t in dtypes.items()}
+    df = pd.read_csv(source, usecols=columns, dtype=pd_dtypes, low_memory=False)
+    if date_column is not None and date_column in df.columns:
+        if date_as_int:
+            df[date_column] = df[date_column].astype(str).str.replace("-", "").astype("int32")
+        else:
+            df[date_column] = pd.to_datetime(df[date_column].astype(str)).astype("datetime64[ns]")
+    return df
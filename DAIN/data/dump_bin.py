@@ -2,6 +2,9 @@
 # Licensed under the MIT License.
 
 import abc
+import hashlib
+import io
+import json
 import shutil
 import traceback
 from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
@@ -16,6 +19,18 @@ from loguru import logger
 from qlib.utils import code_to_fname, fname_to_code
 from tqdm import tqdm
 
+from csv_reader import read_csv, resolve_engine
+from chunked_bin import DEFAULT_CHUNK_SIZE, append_chunked, resolve_codec, write_chunked
+
+# calendar of the worker processes, sent once per worker through the executor initializer
+# instead of being pickled with every task
+_worker_calendar = None
+
+
+def _init_worker_calendar(calendar: np.ndarray):
+    global _worker_calendar
+    _worker_calendar = calendar
+
 
 class DumpDataBase:
     INSTRUMENTS_START_FIELD = "start_datetime"
@@ -24,6 +39,7 @@ class DumpDataBase:
     FEATURES_DIR_NAME = "features"
     INSTRUMENTS_DIR_NAME = "instruments"
     DUMP_FILE_SUFFIX = ".bin"
+    CHUNKED_FILE_SUFFIX = ".cbin"
     DAILY_FORMAT = "%Y-%m-%d"
     HIGH_FREQ_FORMAT = "%Y-%m-%d %H:%M:%S"
     INSTRUMENTS_SEP = "\t"
@@ -32,6 +48,19 @@ class DumpDataBase:
     UPDATE_MODE = "update"
     ALL_MODE = "all"
 
+    # the tasks of the process pools pickle ``self``; these attributes are only used in the
+    # parent and are left out, the workers get the calendar once through the initializer
+    PARENT_ONLY_ATTRS = (
+        "csv_files",
+        "_calendars_list",
+        "_all_data",
+        "_old_calendar_list",
+        "_new_calendar_list",
+        "_old_instruments",
+        "_update_instruments",
+    )
+    PARENT_ONLY_KWARGS = ("all_datetime_set", "all_datetime_arrays", "date_range_list")
+
     def __init__(
         self,
         csv_path: str,
@@ -45,6 +74,12 @@ class DumpDataBase:
         exclude_fields: str = "",
         include_fields: str = "",
         limit_nums: int = None,
+        intermediate_dir: str = None,
+        keep_intermediate: bool = False,
+        feature_format: str = "bin",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        codec: str = "zstd",
+        csv_engine: str = "auto",
     ):
         """
 
@@ -72,6 +107,22 @@ class DumpDataBase:
             fields not dumped
         limit_nums: int
             Use when debugging, default None
+        intermediate_dir: str, default None
+            if not None, dump_all parses each csv only once: the date scan saves the
+            parsed fields of each symbol as a ``.npy`` file in this directory and the
+            feature dump memory-maps it instead of reading the csv again
+        keep_intermediate: bool, default False
+            keep the ``.npy`` files of ``intermediate_dir`` after the features are dumped,
+            otherwise they are deleted as they are a full copy of the dumped fields
+        feature_format: str, default "bin"
+            "bin" for the raw float32 files read by qlib, "chunked" for ``.cbin`` files of
+            compressed chunks which are read with ``chunked_bin.read_chunked``
+        chunk_size: int, default 4096
+            values per chunk of the "chunked" format
+        codec: str, default "zstd"
+            "zstd", "lz4" or "zlib" for the "chunked" format, zlib if numcodecs is not installed
+        csv_engine: str, default "auto"
+            "pyarrow", "pandas", or "auto" for pyarrow when it is installed
         """
         csv_path = Path(csv_path).expanduser()
         if isinstance(exclude_fields, str):
@@ -102,9 +153,25 @@ class DumpDataBase:
         self.calendar_format = (
             self.DAILY_FORMAT if self.freq == "day" else self.HIGH_FREQ_FORMAT
         )
+        # high frequency calendars are too long for python sets and lists of Timestamp,
+        # they are kept as numpy datetime64 arrays end-to-end
+        self._high_freq = self.freq != "day"
 
         self.works = max_workers
         self.date_field_name = date_field_name
+        self.intermediate_dir = (
+            intermediate_dir
+            if intermediate_dir is None
+            else Path(intermediate_dir).expanduser()
+        )
+        self.keep_intermediate = keep_intermediate
+
+        if feature_format not in ("bin", "chunked"):
+            raise ValueError(f"feature_format must be bin or chunked, not {feature_format}")
+        self.feature_format = feature_format
+        self.chunk_size = int(chunk_size)
+        self.codec = resolve_codec(codec) if feature_format == "chunked" else codec
+        self.csv_engine = resolve_engine(csv_engine)
 
         self._calendars_dir = self.qlib_dir.joinpath(self.CALENDARS_DIR_NAME)
         self._features_dir = self.qlib_dir.joinpath(self.FEATURES_DIR_NAME)
@@ -115,6 +182,15 @@ class DumpDataBase:
         self._mode = self.ALL_MODE
         self._kwargs = {}
 
+    def __getstate__(self):
+        state = {
+            k: v for k, v in self.__dict__.items() if k not in self.PARENT_ONLY_ATTRS
+        }
+        state["_kwargs"] = {
+            k: v for k, v in self._kwargs.items() if k not in self.PARENT_ONLY_KWARGS
+        }
+        return state
+
     def _backup_qlib_dir(self, target_dir: Path):
         shutil.copytree(str(self.qlib_dir.resolve()), str(target_dir.resolve()))
 
@@ -147,11 +223,23 @@ class DumpDataBase:
         else:
             return _calendars.tolist()
 
-    def _get_source_data(self, file_path: Path) -> pd.DataFrame:
-        df = pd.read_csv(str(file_path.resolve()), low_memory=False)
-        df[self.date_field_name] = (
-            df[self.date_field_name].astype(str).astype(np.datetime64)
+    def _read_csv(self, file_path: [Path, io.BytesIO]) -> pd.DataFrame:
+        """typed read of the date, symbol and dump fields only"""
+        columns = (
+            set(self._include_fields) | {self.date_field_name, self.symbol_field_name}
+            if self._include_fields
+            else None
         )
+        return read_csv(
+            file_path,
+            date_column=self.date_field_name,
+            columns=columns,
+            dtypes={self.symbol_field_name: "str"},
+            engine=self.csv_engine,
+        )
+
+    def _get_source_data(self, file_path: [Path, io.BytesIO]) -> pd.DataFrame:
+        df = self._read_csv(file_path)
         # df.drop_duplicates([self.date_field_name], inplace=True)
         return df
 
@@ -167,8 +255,76 @@ class DumpDataBase:
             else df_columns
         )
 
+    def _get_intermediate_path(self, file_path: Path) -> Path:
+        symbol = self.get_symbol_from_file(file_path)
+        return self.intermediate_dir.joinpath(f"{code_to_fname(symbol).lower()}.npy")
+
+    def _save_intermediate(self, file_path: Path, df: pd.DataFrame):
+        """save the date and dump fields of ``df`` as one structured array, float32 like the bin files"""
+        df = df.drop_duplicates(self.date_field_name)
+        fields = [
+            field
+            for field in self.get_dump_fields(df.columns)
+            if field in df.columns and field != self.date_field_name
+        ]
+        data = np.empty(
+            len(df),
+            dtype=[(self.date_field_name, "<M8[ns]")] + [(field, "<f") for field in fields],
+        )
+        data[self.date_field_name] = df[self.date_field_name].values
+        for field in fields:
+            data[field] = df[field].values
+        intermediate_path = self._get_intermediate_path(file_path)
+        tmp_path = intermediate_path.with_suffix(".tmp.npy")
+        np.save(tmp_path, data)
+        tmp_path.replace(intermediate_path)
+
+    def _remove_intermediate(self):
+        """delete the ``.npy`` files of the date scan, and their directory if nothing else is in it"""
+        for file_path in self.csv_files:
+            self._get_intermediate_path(file_path).unlink(missing_ok=True)
+        try:
+            self.intermediate_dir.rmdir()
+        except OSError:
+            pass
+
+    def _read_intermediate(self, file_path: Path) -> pd.DataFrame:
+        data = np.load(self._get_intermediate_path(file_path), mmap_mode="r")
+        return pd.DataFrame({name: data[name] for name in data.dtype.names})
+
+    def _scan_dates(self, file_or_df: [Path, pd.DataFrame]):
+        """
+        Returns
+        -------
+        ((begin, end), dates): the dates are a set of Timestamp for daily data, and the
+        unique dates as int64 epoch nanoseconds otherwise
+        """
+        if not self._high_freq:
+            return self._get_date(file_or_df, is_begin_end=True, as_set=True)
+        if not isinstance(file_or_df, pd.DataFrame):
+            file_or_df = self._get_source_data(file_or_df)
+        if file_or_df.empty or self.date_field_name not in file_or_df.columns:
+            return (np.nan, np.nan), np.empty(0, dtype=np.int64)
+        dates = np.unique(
+            file_or_df[self.date_field_name].values.astype("<M8[ns]").view(np.int64)
+        )
+        return (pd.Timestamp(dates[0]), pd.Timestamp(dates[-1])), dates
+
+    def _get_date_and_save_intermediate(self, file_path: Path):
+        df = self._get_source_data(file_path)
+        self._save_intermediate(file_path, df)
+        return self._scan_dates(df)
+
     @staticmethod
-    def _read_calendars(calendar_path: Path) -> List[pd.Timestamp]:
+    def _read_calendars(
+        calendar_path: Path, high_freq: bool = False
+    ) -> Union[List[pd.Timestamp], np.ndarray]:
+        if high_freq:
+            return np.sort(
+                pd.read_csv(calendar_path, header=None, dtype=str)
+                .loc[:, 0]
+                .values.astype("<M8[ns]")
+            )
         return sorted(
             map(
                 pd.Timestamp,
@@ -194,9 +350,20 @@ class DumpDataBase:
         calendars_path = str(
             self._calendars_dir.joinpath(f"{self.freq}.txt").expanduser().resolve()
         )
-        result_calendars_list = list(
-            map(lambda x: self._format_datetime(x), calendars_data)
-        )
+        if isinstance(calendars_data, np.ndarray):
+            # vectorized strftime of DAILY_FORMAT / HIGH_FREQ_FORMAT
+            result_calendars_list = np.char.replace(
+                np.datetime_as_string(
+                    calendars_data.astype("<M8[ns]"),
+                    unit="D" if self.freq == "day" else "s",
+                ),
+                "T",
+                " ",
+            )
+        else:
+            result_calendars_list = list(
+                map(lambda x: self._format_datetime(x), calendars_data)
+            )
         np.savetxt(calendars_path, result_calendars_list, fmt="%s", encoding="utf-8")
 
     def save_instruments(self, instruments_data: Union[list, pd.DataFrame]):
@@ -220,61 +387,93 @@ class DumpDataBase:
         else:
             np.savetxt(instruments_path, instruments_data, fmt="%s", encoding="utf-8")
 
-    def data_merge_calendar(
-        self, df: pd.DataFrame, calendars_list: List[pd.Timestamp]
-    ) -> pd.DataFrame:
-        # calendars
-        calendars_df = pd.DataFrame(data=calendars_list, columns=[self.date_field_name])
-        calendars_df[self.date_field_name] = calendars_df[self.date_field_name].astype(
-            np.datetime64
-        )
-        cal_df = calendars_df[
-            (calendars_df[self.date_field_name] >= df[self.date_field_name].min())
-            & (calendars_df[self.date_field_name] <= df[self.date_field_name].max())
-        ]
-        # align index
-        cal_df.set_index(self.date_field_name, inplace=True)
-        df.set_index(self.date_field_name, inplace=True)
-        r_df = df.reindex(cal_df.index)
-        return r_df
-
     @staticmethod
-    def get_datetime_index(df: pd.DataFrame, calendar_list: List[pd.Timestamp]) -> int:
-        return calendar_list.index(df.index.min())
+    def _calendar_array(calendar_list: Union[list, np.ndarray]) -> np.ndarray:
+        """sorted ``datetime64[ns]`` array of the calendar, the array itself if it is one already"""
+        if isinstance(calendar_list, np.ndarray) and calendar_list.dtype == "<M8[ns]":
+            return calendar_list
+        return pd.DatetimeIndex(calendar_list).values
+
+    def calendar_positions(self, df: pd.DataFrame, calendar: np.ndarray):
+        """
+        locate the rows of ``df`` in ``calendar``
+
+        Returns
+        -------
+        (start, end, rows, positions): the symbol spans ``calendar[start:end]``, row ``rows[i]``
+        of ``df`` goes to ``positions[i]`` in that span; dates missing from the calendar are dropped
+        """
+        dates = df[self.date_field_name].values.astype("<M8[ns]")
+        start = calendar.searchsorted(dates.min(), side="left")
+        end = calendar.searchsorted(dates.max(), side="right")
+        positions = calendar.searchsorted(dates, side="left")
+        found = positions < len(calendar)
+        found[found] = calendar[positions[found]] == dates[found]
+        return start, end, np.flatnonzero(found), positions[found] - start
 
     def _data_to_bin(
-        self, df: pd.DataFrame, calendar_list: List[pd.Timestamp], features_dir: Path
+        self,
+        df: pd.DataFrame,
+        calendar_list: Union[List[pd.Timestamp], np.ndarray],
+        features_dir: Path,
     ):
         if df.empty:
             logger.warning(f"{features_dir.name} data is None or empty")
             return
-        if not calendar_list:
+        if len(calendar_list) == 0:
             logger.warning("calendar_list is empty")
             return
-        # align index
-        _df = self.data_merge_calendar(df, calendar_list)
-        # used when creating a bin file
-        date_index = self.get_datetime_index(_df, calendar_list)
-        for field in self.get_dump_fields(_df.columns):
-            bin_path = features_dir.joinpath(
-                f"{field.lower()}.{self.freq}{self.DUMP_FILE_SUFFIX}"
-            )
-            if field not in _df.columns:
+        calendar = self._calendar_array(calendar_list)
+        # align index: scatter the values into a NaN buffer spanning the calendar
+        date_index, end_index, rows, positions = self.calendar_positions(df, calendar)
+        if end_index <= date_index:
+            logger.warning(f"{features_dir.name} has no date in the calendar")
+            return
+        for field in self.get_dump_fields(df.columns):
+            if field not in df.columns or field == self.date_field_name:
                 continue
+            bin_path = self.get_feature_path(features_dir, field)
+            values = np.full(end_index - date_index, np.nan, dtype="<f")
+            values[positions] = df[field].values[rows]
             if bin_path.exists() and self._mode == self.UPDATE_MODE:
                 # update
-                with bin_path.open("ab") as fp:
-                    np.array(_df[field]).astype("<f").tofile(fp)
+                self._write_feature(bin_path, values)
             else:
                 # append; self._mode == self.ALL_MODE or not bin_path.exists()
-                np.hstack([date_index, _df[field]]).astype("<f").tofile(
-                    str(bin_path.resolve())
-                )
+                self._write_feature(bin_path, values, date_index)
+
+    def get_feature_path(self, features_dir: Path, field: str) -> Path:
+        suffix = (
+            self.CHUNKED_FILE_SUFFIX
+            if self.feature_format == "chunked"
+            else self.DUMP_FILE_SUFFIX
+        )
+        return features_dir.joinpath(f"{field.lower()}.{self.freq}{suffix}")
+
+    def _write_feature(self, bin_path: Path, values: np.ndarray, date_index: int = None):
+        """write ``values`` starting at calendar index ``date_index``, or append them if it is None"""
+        if self.feature_format == "chunked":
+            if date_index is None:
+                # only the last chunk, the offset table and the header are rewritten
+                append_chunked(bin_path, values)
+            else:
+                write_chunked(bin_path, date_index, values, self.chunk_size, self.codec)
+        elif date_index is None:
+            with bin_path.open("ab") as fp:
+                values.tofile(fp)
+        else:
+            with bin_path.open("wb") as fp:
+                np.array([date_index], dtype="<f").tofile(fp)
+                values.tofile(fp)
 
     def _dump_bin(
-        self, file_or_data: [Path, pd.DataFrame], calendar_list: List[pd.Timestamp]
+        self,
+        file_or_data: [Path, pd.DataFrame],
+        calendar_list: Union[List[pd.Timestamp], np.ndarray] = None,
     ):
-        if not calendar_list:
+        if calendar_list is None:
+            calendar_list = _worker_calendar
+        if calendar_list is None or len(calendar_list) == 0:
             logger.warning("calendar_list is empty")
             return
         if isinstance(file_or_data, pd.DataFrame):
@@ -286,7 +485,11 @@ class DumpDataBase:
             df = file_or_data
         elif isinstance(file_or_data, Path):
             code = self.get_symbol_from_file(file_or_data)
-            df = self._get_source_data(file_or_data)
+            df = (
+                self._read_intermediate(file_or_data)
+                if self._kwargs.get("use_intermediate", False)
+                else self._get_source_data(file_or_data)
+            )
         else:
             raise ValueError(f"not support {type(file_or_data)}")
         if df is None or df.empty:
@@ -313,14 +516,22 @@ class DumpDataAll(DumpDataBase):
     def _get_all_date(self):
         logger.info("start get all date......")
         all_datetime = set()
+        all_datetime_arrays = []
         date_range_list = []
-        _fun = partial(self._get_date, as_set=True, is_begin_end=True)
+        if self.intermediate_dir is not None:
+            self.intermediate_dir.mkdir(parents=True, exist_ok=True)
+            _fun = self._get_date_and_save_intermediate
+        else:
+            _fun = self._scan_dates
         with tqdm(total=len(self.csv_files)) as p_bar:
             with ProcessPoolExecutor(max_workers=self.works) as executor:
                 for file_path, ((_begin_time, _end_time), _set_calendars) in zip(
                     self.csv_files, executor.map(_fun, self.csv_files)
                 ):
-                    all_datetime = all_datetime | _set_calendars
+                    if self._high_freq:
+                        all_datetime_arrays.append(_set_calendars)
+                    else:
+                        all_datetime = all_datetime | _set_calendars
                     if isinstance(_begin_time, pd.Timestamp) and isinstance(
                         _end_time, pd.Timestamp
                     ):
@@ -333,14 +544,22 @@ class DumpDataAll(DumpDataBase):
                         )
                     p_bar.update()
         self._kwargs["all_datetime_set"] = all_datetime
+        self._kwargs["all_datetime_arrays"] = all_datetime_arrays
         self._kwargs["date_range_list"] = date_range_list
+        self._kwargs["use_intermediate"] = self.intermediate_dir is not None
         logger.info("end of get all date.\n")
 
     def _dump_calendars(self):
         logger.info("start dump calendars......")
-        self._calendars_list = sorted(
-            map(pd.Timestamp, self._kwargs["all_datetime_set"])
-        )
+        if self._high_freq:
+            arrays = self._kwargs["all_datetime_arrays"]
+            self._calendars_list = np.unique(
+                np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+            ).view("<M8[ns]")
+        else:
+            self._calendars_list = sorted(
+                map(pd.Timestamp, self._kwargs["all_datetime_set"])
+            )
         self.save_calendars(self._calendars_list)
         logger.info("end of calendars dump.\n")
 
@@ -351,11 +570,17 @@ class DumpDataAll(DumpDataBase):
 
     def _dump_features(self):
         logger.info("start dump features......")
-        _dump_func = partial(self._dump_bin, calendar_list=self._calendars_list)
+        calendar = self._calendar_array(self._calendars_list)
         with tqdm(total=len(self.csv_files)) as p_bar:
-            with ProcessPoolExecutor(max_workers=self.works) as executor:
-                for _ in executor.map(_dump_func, self.csv_files):
+            with ProcessPoolExecutor(
+                max_workers=self.works,
+                initializer=_init_worker_calendar,
+                initargs=(calendar,),
+            ) as executor:
+                for _ in executor.map(self._dump_bin, self.csv_files):
                     p_bar.update()
+        if self._kwargs.get("use_intermediate", False) and not self.keep_intermediate:
+            self._remove_intermediate()
 
         logger.info("end of features dump.\n")
 
@@ -405,7 +630,7 @@ class DumpDataFix(DumpDataAll):
 
     def dump(self):
         self._calendars_list = self._read_calendars(
-            self._calendars_dir.joinpath(f"{self.freq}.txt")
+            self._calendars_dir.joinpath(f"{self.freq}.txt"), self._high_freq
         )
         # noinspection PyAttributeOutsideInit
         self._old_instruments = (
@@ -433,6 +658,10 @@ class DumpDataUpdate(DumpDataBase):
         exclude_fields: str = "",
         include_fields: str = "",
         limit_nums: int = None,
+        feature_format: str = "bin",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        codec: str = "zstd",
+        csv_engine: str = "auto",
     ):
         """
 
@@ -460,6 +689,14 @@ class DumpDataUpdate(DumpDataBase):
             fields not dumped
         limit_nums: int
             Use when debugging, default None
+        feature_format: str, default "bin"
+            "bin" or "chunked", see ``DumpDataBase``
+        chunk_size: int, default 4096
+            values per chunk of the "chunked" format
+        codec: str, default "zstd"
+            codec of the "chunked" format
+        csv_engine: str, default "auto"
+            "pyarrow", "pandas", or "auto" for pyarrow when it is installed
         """
         super().__init__(
             csv_path,
@@ -472,10 +709,14 @@ class DumpDataUpdate(DumpDataBase):
             symbol_field_name,
             exclude_fields,
             include_fields,
+            feature_format=feature_format,
+            chunk_size=chunk_size,
+            codec=codec,
+            csv_engine=csv_engine,
         )
         self._mode = self.UPDATE_MODE
         self._old_calendar_list = self._read_calendars(
-            self._calendars_dir.joinpath(f"{self.freq}.txt")
+            self._calendars_dir.joinpath(f"{self.freq}.txt"), self._high_freq
         )
         # NOTE: all.txt only exists once for each stock
         # NOTE: if a stock corresponds to multiple different time ranges, user need to modify self._update_instruments
@@ -489,12 +730,23 @@ class DumpDataUpdate(DumpDataBase):
 
         # load all csv files
         self._all_data = self._load_all_source_data()  # type: pd.DataFrame
-        self._new_calendar_list = self._old_calendar_list + sorted(
-            filter(
-                lambda x: x > self._old_calendar_list[-1],
-                self._all_data[self.date_field_name].unique(),
+        if self._high_freq:
+            _new_dates = np.unique(
+                self._all_data[self.date_field_name].values.astype("<M8[ns]")
+            )
+            self._new_calendar_list = np.concatenate(
+                [
+                    self._old_calendar_list,
+                    _new_dates[_new_dates > self._old_calendar_list[-1]],
+                ]
+            )
+        else:
+            self._new_calendar_list = self._old_calendar_list + sorted(
+                filter(
+                    lambda x: x > self._old_calendar_list[-1],
+                    self._all_data[self.date_field_name].unique(),
+                )
             )
-        )
 
     def _load_all_source_data(self):
         # NOTE: Need more memory
@@ -502,7 +754,7 @@ class DumpDataUpdate(DumpDataBase):
         all_df = []
 
         def _read_csv(file_path: Path):
-            _df = pd.read_csv(file_path, parse_dates=[self.date_field_name])
+            _df = self._read_csv(file_path)
             if self.symbol_field_name not in _df.columns:
                 _df[self.symbol_field_name] = self.get_symbol_from_file(file_path)
             return _df
@@ -526,7 +778,11 @@ class DumpDataUpdate(DumpDataBase):
     def _dump_features(self):
         logger.info("start dump features......")
         error_code = {}
-        with ProcessPoolExecutor(max_workers=self.works) as executor:
+        with ProcessPoolExecutor(
+            max_workers=self.works,
+            initializer=_init_worker_calendar,
+            initargs=(self._calendar_array(self._new_calendar_list),),
+        ) as executor:
             futures = {}
             for _code, _df in self._all_data.groupby(self.symbol_field_name):
                 _code = fname_to_code(str(_code).lower()).upper()
@@ -561,9 +817,7 @@ class DumpDataUpdate(DumpDataBase):
                         _start
                     )
                     _dt_range[self.INSTRUMENTS_END_FIELD] = self._format_datetime(_end)
-                    futures[
-                        executor.submit(self._dump_bin, _df, self._new_calendar_list)
-                    ] = _code
+                    futures[executor.submit(self._dump_bin, _df)] = _code
 
             with tqdm(total=len(futures)) as p_bar:
                 for _future in as_completed(futures):
@@ -584,11 +838,319 @@ class DumpDataUpdate(DumpDataBase):
         self.save_instruments(df.reset_index())
 
 
+class DumpDataIncremental(DumpDataAll):
+    """
+    redo only the symbols whose csv changed since the last dump, as recorded in ``manifest.json``
+    of ``qlib_dir``: size, mtime and content hash of each source file and the calendar index
+    where its bin files end. A file whose old content is an unchanged prefix only gets the new
+    rows appended; any other change rewrites the bin files of that symbol. Without an existing
+    calendar, everything is dumped as in ``dump_all``.
+    """
+
+    MANIFEST_FILE_NAME = "manifest.json"
+    HASH_CHUNK_SIZE = 1 << 20
+
+    UNCHANGED = "unchanged"
+    APPEND = "append"
+    REWRITE = "rewrite"
+
+    def _read_manifest(self) -> dict:
+        manifest_path = self.qlib_dir.joinpath(self.MANIFEST_FILE_NAME)
+        if not manifest_path.exists():
+            return {}
+        with manifest_path.open() as fp:
+            return json.load(fp)
+
+    def _save_manifest(self, manifest: dict):
+        manifest_path = self.qlib_dir.joinpath(self.MANIFEST_FILE_NAME)
+        tmp_path = manifest_path.with_suffix(".tmp")
+        with tmp_path.open("w") as fp:
+            json.dump(manifest, fp, indent=1, sort_keys=True)
+        tmp_path.replace(manifest_path)
+
+    @classmethod
+    def _hash_file(cls, file_path: Path, prefix_size: int = None):
+        """
+        Returns
+        -------
+        (hash, prefix_hash, eol): hash of the file, hash of its first ``prefix_size`` bytes
+        (None if the file is not longer than that) and whether it ends with a newline
+        """
+        _hash = hashlib.blake2b(digest_size=20)
+        prefix_hash = None
+        last = b""
+        size = 0
+        with file_path.open("rb") as fp:
+            while True:
+                n = cls.HASH_CHUNK_SIZE
+                if prefix_size is not None and size < prefix_size:
+                    n = min(n, prefix_size - size)
+                chunk = fp.read(n)
+                if not chunk:
+                    break
+                _hash.update(chunk)
+                size += len(chunk)
+                last = chunk[-1:]
+                if size == prefix_size:
+                    prefix_hash = _hash.hexdigest()
+        if size == prefix_size:
+            prefix_hash = None
+        return _hash.hexdigest(), prefix_hash, last == b"\n"
+
+    def _classify(self, file_path: Path, entry: dict = None):
+        """compare ``file_path`` with its manifest ``entry``, hashing only if size or mtime differ"""
+        stat = file_path.stat()
+        if (
+            entry is not None
+            and entry["size"] == stat.st_size
+            and entry["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return self.UNCHANGED, entry
+        old_size = None if entry is None else entry["size"]
+        _hash, prefix_hash, eol = self._hash_file(file_path, old_size)
+        new_entry = dict(
+            entry or {},
+            file=file_path.name,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            hash=_hash,
+            eol=eol,
+        )
+        if entry is None:
+            return self.REWRITE, new_entry
+        if _hash == entry["hash"]:
+            return self.UNCHANGED, new_entry
+        if prefix_hash == entry["hash"] and entry["eol"] and entry.get("end_index"):
+            return self.APPEND, new_entry
+        return self.REWRITE, new_entry
+
+    def _get_tail_data(self, file_path: Path, offset: int) -> pd.DataFrame:
+        """parse only the rows after the first ``offset`` bytes of ``file_path``"""
+        with file_path.open("rb") as fp:
+            header = fp.readline()
+            fp.seek(offset)
+            tail = fp.read()
+        if not tail.strip():
+            return pd.DataFrame(columns=[self.date_field_name])
+        return self._get_source_data(io.BytesIO(header + tail))
+
+    def _scan_changed(self, file_path: Path, action: str, offset: int):
+        if action == self.APPEND:
+            return self._scan_dates(self._get_tail_data(file_path, offset))
+        return self._scan_dates(file_path)
+
+    def _append_bin(
+        self, df: pd.DataFrame, calendar: np.ndarray, features_dir: Path, end_index: int
+    ):
+        """append the values of ``df`` to bin files ending at ``calendar[end_index]``"""
+        start_index, new_end_index, rows, positions = self.calendar_positions(
+            df, calendar
+        )
+        if new_end_index <= end_index:
+            return
+        positions = positions + (start_index - end_index)
+        for field in self.get_dump_fields(df.columns):
+            if field not in df.columns or field == self.date_field_name:
+                continue
+            bin_path = self.get_feature_path(features_dir, field)
+            values = np.full(new_end_index - end_index, np.nan, dtype="<f")
+            values[positions] = df[field].values[rows]
+            self._write_feature(bin_path, values)
+
+    def _dump_changed(self, file_path: Path, action: str, offset: int, end_index: int):
+        """dump one changed symbol with ``_worker_calendar``, return the date range of the dumped rows"""
+        code = self.get_symbol_from_file(file_path)
+        features_dir = self._features_dir.joinpath(code_to_fname(code).lower())
+        if action == self.APPEND:
+            df = self._get_tail_data(file_path, offset)
+        else:
+            df = self._get_source_data(file_path)
+        if df.empty:
+            return self._get_date(df, is_begin_end=True)
+        df = df.drop_duplicates(self.date_field_name)
+        if action == self.APPEND:
+            self._append_bin(df, _worker_calendar, features_dir, end_index)
+        else:
+            # drop the bin files of fields which are not in the csv any more
+            for bin_path in features_dir.glob(f"*.{self.freq}.*"):
+                if bin_path.suffix in (self.DUMP_FILE_SUFFIX, self.CHUNKED_FILE_SUFFIX):
+                    bin_path.unlink()
+            features_dir.mkdir(parents=True, exist_ok=True)
+            self._data_to_bin(df, _worker_calendar, features_dir)
+        return self._get_date(df, is_begin_end=True)
+
+    def _classify_all(self, entries: dict) -> dict:
+        """symbol -> (file_path, action, new manifest entry)"""
+        symbols = [self.get_symbol_from_file(f).upper() for f in self.csv_files]
+        result = {}
+        with tqdm(total=len(self.csv_files)) as p_bar:
+            with ThreadPoolExecutor(max_workers=self.works) as executor:
+                for symbol, file_path, (action, entry) in zip(
+                    symbols,
+                    self.csv_files,
+                    executor.map(
+                        lambda x: self._classify(x[1], entries.get(x[0])),
+                        zip(symbols, self.csv_files),
+                    ),
+                ):
+                    result[symbol] = (file_path, action, entry)
+                    p_bar.update()
+        return result
+
+    def _set_end_index(self, entries: dict, instruments: dict, calendar: np.ndarray):
+        for symbol, entry in entries.items():
+            if symbol in instruments:
+                end = np.datetime64(
+                    pd.Timestamp(instruments[symbol][self.INSTRUMENTS_END_FIELD])
+                )
+                entry["end_index"] = int(calendar.searchsorted(end, side="right"))
+
+    def _read_instruments_dict(self) -> dict:
+        instruments_path = self._instruments_dir.joinpath(self.INSTRUMENTS_FILE_NAME)
+        if not instruments_path.exists():
+            return {}
+        return (
+            self._read_instruments(instruments_path)
+            .set_index([self.symbol_field_name])
+            .to_dict(orient="index")
+        )
+
+    def dump(self):
+        manifest = self._read_manifest()
+        entries = manifest.get(self.freq, {})
+        calendar_path = self._calendars_dir.joinpath(f"{self.freq}.txt")
+        if not calendar_path.exists():
+            logger.info("no calendar found, dump all......")
+            super().dump()
+            changes = self._classify_all({})
+            entries = {symbol: entry for symbol, (_, _, entry) in changes.items()}
+            self._set_end_index(
+                entries,
+                self._read_instruments_dict(),
+                self._calendar_array(self._calendars_list),
+            )
+            manifest[self.freq] = entries
+            self._save_manifest(manifest)
+            return
+
+        logger.info("start check source files......")
+        changes = self._classify_all(entries)
+        # bytes already dumped, the tail after them is parsed for appends
+        old_size = {
+            symbol: entries.get(symbol, {}).get("size", 0) for symbol in changes
+        }
+        for symbol, (_, _, entry) in changes.items():
+            entries[symbol] = entry
+        changed = {
+            symbol: (file_path, action, entry)
+            for symbol, (file_path, action, entry) in changes.items()
+            if action != self.UNCHANGED
+        }
+        if not changed:
+            manifest[self.freq] = entries
+            self._save_manifest(manifest)
+            logger.info("no source file changed.\n")
+            return
+        logger.info(
+            f"{sum(a == self.APPEND for _, a, _ in changed.values())} to append, "
+            f"{sum(a == self.REWRITE for _, a, _ in changed.values())} to rewrite"
+        )
+
+        # extend the calendar with the dates after its end
+        calendar = self._calendar_array(
+            self._read_calendars(calendar_path, self._high_freq)
+        )
+        new_dates = []
+        with ProcessPoolExecutor(max_workers=self.works) as executor:
+            futures = {
+                executor.submit(
+                    self._scan_changed, file_path, action, old_size[symbol]
+                ): symbol
+                for symbol, (file_path, action, _) in changed.items()
+            }
+            for _future in as_completed(futures):
+                symbol = futures[_future]
+                file_path, action, entry = changed[symbol]
+                (_begin, _end), _dates = _future.result()
+                if self._high_freq:
+                    _dates = np.asarray(_dates, dtype=np.int64).view("<M8[ns]")
+                else:
+                    _dates = self._calendar_array(sorted(_dates))
+                new_dates.append(_dates[_dates > calendar[-1]])
+                if action == self.APPEND and not (
+                    isinstance(_begin, pd.Timestamp)
+                    and _begin.to_datetime64() > calendar[entry["end_index"] - 1]
+                ):
+                    # the new rows go back into the dumped history
+                    changed[symbol] = (file_path, self.REWRITE, entry)
+        calendar = np.concatenate([calendar, np.unique(np.concatenate(new_dates))])
+        self._calendars_list = calendar
+        self.save_calendars(calendar)
+
+        # dump the changed symbols
+        instruments = self._read_instruments_dict()
+        error_code = {}
+        with ProcessPoolExecutor(
+            max_workers=self.works,
+            initializer=_init_worker_calendar,
+            initargs=(calendar,),
+        ) as executor:
+            futures = {
+                executor.submit(
+                    self._dump_changed,
+                    file_path,
+                    action,
+                    old_size[symbol],
+                    entry.get("end_index"),
+                ): symbol
+                for symbol, (file_path, action, entry) in changed.items()
+            }
+            with tqdm(total=len(futures)) as p_bar:
+                for _future in as_completed(futures):
+                    symbol = futures[_future]
+                    _, action, entry = changed[symbol]
+                    try:
+                        _begin, _end = _future.result()
+                    except Exception:
+                        error_code[symbol] = traceback.format_exc()
+                        # dump it again next time
+                        entries.pop(symbol, None)
+                        continue
+                    finally:
+                        p_bar.update()
+                    if not (
+                        isinstance(_begin, pd.Timestamp)
+                        and isinstance(_end, pd.Timestamp)
+                    ):
+                        continue
+                    _dt_range = instruments.setdefault(symbol, dict())
+                    if action == self.REWRITE or not _dt_range:
+                        _dt_range[self.INSTRUMENTS_START_FIELD] = self._format_datetime(
+                            _begin
+                        )
+                    _dt_range[self.INSTRUMENTS_END_FIELD] = self._format_datetime(_end)
+        if error_code:
+            logger.info(f"dump bin errors: {error_code}")
+
+        _inst_df = pd.DataFrame.from_dict(instruments, orient="index")
+        _inst_df.index.names = [self.symbol_field_name]
+        self.save_instruments(_inst_df.reset_index())
+        self._set_end_index(
+            {symbol: entries[symbol] for symbol in changed if symbol in entries},
+            instruments,
+            calendar,
+        )
+        manifest[self.freq] = entries
+        self._save_manifest(manifest)
+        logger.info("end of incremental dump.\n")
+
+
 if __name__ == "__main__":
     fire.Fire(
         {
             "dump_all": DumpDataAll,
             "dump_fix": DumpDataFix,
             "dump_update": DumpDataUpdate,
+            "dump_incremental": DumpDataIncremental,
         }
     )
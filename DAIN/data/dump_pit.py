@@ -8,7 +8,8 @@ TODO:
 
 import shutil
 import struct
-from concurrent.futures import ProcessPoolExecutor
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from functools import partial
 from pathlib import Path
 from typing import Iterable
@@ -20,6 +21,8 @@ from qlib.config import C
 from qlib.utils import fname_to_code, get_period_offset
 from tqdm import tqdm
 
+from csv_reader import read_csv, resolve_engine
+
 
 class DumpPitData:
     PIT_DIR_NAME = "financial"
@@ -65,6 +68,7 @@ class DumpPitData:
         exclude_fields: str = "",
         include_fields: str = "",
         limit_nums: int = None,
+        csv_engine: str = "auto",
     ):
         """
 
@@ -90,6 +94,8 @@ class DumpPitData:
             fields not dumped
         limit_nums: int
             Use when debugging, default None
+        csv_engine: str, default "auto"
+            "pyarrow", "pandas", or "auto" for pyarrow when it is installed
         """
         csv_path = Path(csv_path).expanduser()
         if isinstance(exclude_fields, str):
@@ -120,17 +126,36 @@ class DumpPitData:
         self.period_column_name = period_column_name
         self.value_column_name = value_column_name
         self.field_column_name = field_column_name
+        self.csv_engine = resolve_engine(csv_engine)
 
         self._mode = self.ALL_MODE
 
+    def __getstate__(self):
+        # the tasks sent to the workers pickle ``self``, the file list is only used in the parent
+        state = self.__dict__.copy()
+        state["csv_files"] = []
+        return state
+
     def _backup_qlib_dir(self, target_dir: Path):
         shutil.copytree(str(self.qlib_dir.resolve()), str(target_dir.resolve()))
 
     def get_source_data(self, file_path: Path) -> pd.DataFrame:
-        df = pd.read_csv(str(file_path.resolve()), low_memory=False)
-        df[self.value_column_name] = df[self.value_column_name].astype("float32")
-        df[self.date_column_name] = (
-            df[self.date_column_name].str.replace("-", "").astype("int32")
+        df = read_csv(
+            file_path,
+            date_column=self.date_column_name,
+            date_as_int=True,
+            columns=[
+                self.date_column_name,
+                self.period_column_name,
+                self.value_column_name,
+                self.field_column_name,
+            ],
+            dtypes={
+                self.period_column_name: "int32",
+                self.value_column_name: "float32",
+                self.field_column_name: "str",
+            },
+            engine=self.csv_engine,
         )
         # df.drop_duplicates([self.date_field_name], inplace=True)
         return df
@@ -182,131 +207,223 @@ class DumpPitData:
         overwrite: bool
             whether overwrite existing data or update only
         """
+        start = time.perf_counter()
+        symbol, fields = self._group_fields(file_path)
+        timings = [(symbol, "", 0, time.perf_counter() - start)]
+        for field, df_sub in fields:
+            start = time.perf_counter()
+            self._dump_field(symbol, field, df_sub, interval, overwrite)
+            timings.append((symbol, field, len(df_sub), time.perf_counter() - start))
+        return timings
+
+    def _group_fields(self, file_path: Path):
+        """parse ``file_path`` and split it by field once, each part sorted by date"""
         symbol = self.get_symbol_from_file(file_path)
         df = self.get_source_data(file_path)
         if df.empty:
             logger.warning(f"{symbol} file is empty")
-            return
-        for field in self.get_dump_fields(df):
-            df_sub = df.query(f'{self.field_column_name}=="{field}"').sort_values(
-                self.date_column_name
+            return symbol, []
+        dump_fields = self.get_dump_fields(df)
+        fields = []
+        for field, df_sub in df.groupby(self.field_column_name, sort=False):
+            if field in dump_fields:
+                df_sub = df_sub[
+                    [
+                        self.date_column_name,
+                        self.period_column_name,
+                        self.value_column_name,
+                    ]
+                ]
+                fields.append(
+                    (field, df_sub.sort_values(self.date_column_name, kind="stable"))
+                )
+        for field in set(dump_fields) - set(f for f, _ in fields):
+            logger.warning(f"field {field} of {symbol} is empty")
+        return symbol, fields
+
+    def _dump_field(
+        self,
+        symbol: str,
+        field: str,
+        df_sub: pd.DataFrame,
+        interval: str = "quarterly",
+        overwrite: bool = False,
+    ):
+        """dump the rows ``df_sub`` of one field, sorted by date, see ``_dump_pit``"""
+        data_file, index_file = self.get_filenames(symbol, field, interval)
+
+        # calculate first & last period
+        start_year = df_sub[self.period_column_name].min()
+        end_year = df_sub[self.period_column_name].max()
+        if interval == self.INTERVAL_quarterly:
+            start_year  # = 100
+            end_year  # = 100
+
+        # adjust `first_year` if existing data found
+        if not overwrite and index_file.exists():
+            with open(index_file, "rb") as fi:
+                (first_year,) = struct.unpack(
+                    self.PERIOD_DTYPE, fi.read(self.PERIOD_DTYPE_SIZE)
+                )
+                n_years = len(fi.read()) // self.INDEX_DTYPE_SIZE
+                if interval == self.INTERVAL_quarterly:
+                    n_years //= 4
+                start_year = first_year + n_years
+        else:
+            with open(index_file, "wb") as f:
+                f.write(struct.pack(self.PERIOD_DTYPE, start_year))
+            first_year = start_year
+
+        # if data already exists, continue to the next field
+        if start_year > end_year:
+            logger.warning(
+                f"{symbol}-{field} data already exists, continue to the next field"
             )
-            if df_sub.empty:
-                logger.warning(f"field {field} of {symbol} is empty")
-                continue
-            data_file, index_file = self.get_filenames(symbol, field, interval)
-
-            # calculate first & last period
-            start_year = df_sub[self.period_column_name].min()
-            end_year = df_sub[self.period_column_name].max()
-            if interval == self.INTERVAL_quarterly:
-                start_year  # = 100
-                end_year  # = 100
-
-            # adjust `first_year` if existing data found
-            if not overwrite and index_file.exists():
-                with open(index_file, "rb") as fi:
-                    (first_year,) = struct.unpack(
-                        self.PERIOD_DTYPE, fi.read(self.PERIOD_DTYPE_SIZE)
+            return
+
+        # dump index filled with NA
+        with open(index_file, "ab") as fi:
+            for year in range(start_year, end_year + 1):
+                if interval == self.INTERVAL_quarterly:
+                    fi.write(
+                        struct.pack(self.INDEX_DTYPE * 4, *[self.NA_INDEX] * 4)
                     )
-                    n_years = len(fi.read()) // self.INDEX_DTYPE_SIZE
-                    if interval == self.INTERVAL_quarterly:
-                        n_years //= 4
-                    start_year = first_year + n_years
-            else:
-                with open(index_file, "wb") as f:
-                    f.write(struct.pack(self.PERIOD_DTYPE, start_year))
-                first_year = start_year
-
-            # if data already exists, continue to the next field
-            if start_year > end_year:
-                logger.warning(
-                    f"{symbol}-{field} data already exists, continue to the next field"
+                else:
+                    fi.write(struct.pack(self.INDEX_DTYPE, self.NA_INDEX))
+
+        # if data already exists, remove overlapped data
+        if not overwrite and data_file.exists():
+            with open(data_file, "rb") as fd:
+                fd.seek(-self.DATA_DTYPE_SIZE, 2)
+                last_date, _, _, _ = struct.unpack(self.DATA_DTYPE, fd.read())
+            df_sub = df_sub.query(f"{self.date_column_name}>{last_date}")
+        # otherwise,
+        # 1) truncate existing file or create a new file with `wb+` if overwrite,
+        # 2) or append existing file or create a new file with `ab+` if not overwrite
+        else:
+            with open(data_file, "wb+" if overwrite else "ab+"):
+                pass
+
+        with open(data_file, "rb+") as fd, open(index_file, "rb+") as fi:
+
+            # update index if needed
+            # columns are date, period, value; itertuples keeps the int columns as ints
+            for date, period, value in df_sub.itertuples(index=False):
+                date, period = int(date), int(period)
+                # get index
+                offset = get_period_offset(
+                    first_year, period, interval == self.INTERVAL_quarterly
                 )
-                continue
-
-            # dump index filled with NA
-            with open(index_file, "ab") as fi:
-                for year in range(start_year, end_year + 1):
-                    if interval == self.INTERVAL_quarterly:
-                        fi.write(
-                            struct.pack(self.INDEX_DTYPE * 4, *[self.NA_INDEX] * 4)
-                        )
-                    else:
-                        fi.write(struct.pack(self.INDEX_DTYPE, self.NA_INDEX))
-
-            # if data already exists, remove overlapped data
-            if not overwrite and data_file.exists():
-                with open(data_file, "rb") as fd:
-                    fd.seek(-self.DATA_DTYPE_SIZE, 2)
-                    last_date, _, _, _ = struct.unpack(self.DATA_DTYPE, fd.read())
-                df_sub = df_sub.query(f"{self.date_column_name}>{last_date}")
-            # otherwise,
-            # 1) truncate existing file or create a new file with `wb+` if overwrite,
-            # 2) or append existing file or create a new file with `ab+` if not overwrite
-            else:
-                with open(data_file, "wb+" if overwrite else "ab+"):
-                    pass
-
-            with open(data_file, "rb+") as fd, open(index_file, "rb+") as fi:
-
-                # update index if needed
-                for i, row in df_sub.iterrows():
-                    # get index
-                    offset = get_period_offset(
-                        first_year, row.period, interval == self.INTERVAL_quarterly
-                    )
 
-                    fi.seek(self.PERIOD_DTYPE_SIZE + self.INDEX_DTYPE_SIZE * offset)
-                    (cur_index,) = struct.unpack(
-                        self.INDEX_DTYPE, fi.read(self.INDEX_DTYPE_SIZE)
-                    )
+                fi.seek(self.PERIOD_DTYPE_SIZE + self.INDEX_DTYPE_SIZE * offset)
+                (cur_index,) = struct.unpack(
+                    self.INDEX_DTYPE, fi.read(self.INDEX_DTYPE_SIZE)
+                )
 
-                    # Case I: new data => update `_next` with current index
-                    if cur_index == self.NA_INDEX:
-                        fi.seek(self.PERIOD_DTYPE_SIZE + self.INDEX_DTYPE_SIZE * offset)
-                        fi.write(struct.pack(self.INDEX_DTYPE, fd.tell()))
-                    # Case II: previous data exists => find and update the last `_next`
-                    else:
-                        _cur_fd = fd.tell()
-                        prev_index = self.NA_INDEX
-                        while (
-                            cur_index != self.NA_INDEX
-                        ):  # NOTE: first iter always != NA_INDEX
-                            fd.seek(
-                                cur_index + self.DATA_DTYPE_SIZE - self.INDEX_DTYPE_SIZE
-                            )
-                            prev_index = cur_index
-                            (cur_index,) = struct.unpack(
-                                self.INDEX_DTYPE, fd.read(self.INDEX_DTYPE_SIZE)
-                            )
+                # Case I: new data => update `_next` with current index
+                if cur_index == self.NA_INDEX:
+                    fi.seek(self.PERIOD_DTYPE_SIZE + self.INDEX_DTYPE_SIZE * offset)
+                    fi.write(struct.pack(self.INDEX_DTYPE, fd.tell()))
+                # Case II: previous data exists => find and update the last `_next`
+                else:
+                    _cur_fd = fd.tell()
+                    prev_index = self.NA_INDEX
+                    while (
+                        cur_index != self.NA_INDEX
+                    ):  # NOTE: first iter always != NA_INDEX
                         fd.seek(
-                            prev_index + self.DATA_DTYPE_SIZE - self.INDEX_DTYPE_SIZE
+                            cur_index + self.DATA_DTYPE_SIZE - self.INDEX_DTYPE_SIZE
                         )
-                        fd.write(
-                            struct.pack(self.INDEX_DTYPE, _cur_fd)
-                        )  # NOTE: add _next pointer
-                        fd.seek(_cur_fd)
-
-                    # dump data
-                    fd.write(
-                        struct.pack(
-                            self.DATA_DTYPE,
-                            row.date,
-                            row.period,
-                            row.value,
-                            self.NA_INDEX,
+                        prev_index = cur_index
+                        (cur_index,) = struct.unpack(
+                            self.INDEX_DTYPE, fd.read(self.INDEX_DTYPE_SIZE)
                         )
+                    fd.seek(
+                        prev_index + self.DATA_DTYPE_SIZE - self.INDEX_DTYPE_SIZE
+                    )
+                    fd.write(
+                        struct.pack(self.INDEX_DTYPE, _cur_fd)
+                    )  # NOTE: add _next pointer
+                    fd.seek(_cur_fd)
+
+                # dump data
+                fd.write(
+                    struct.pack(
+                        self.DATA_DTYPE,
+                        date,
+                        period,
+                        value,
+                        self.NA_INDEX,
                     )
+                )
 
-    def dump(self, interval="quarterly", overwrite=False):
-        logger.info("start dump pit data......")
-        _dump_func = partial(self._dump_pit, interval=interval, overwrite=overwrite)
+    def _parse_fields(self, file_path: Path):
+        """parse one file, the rows of each field as a record array which keeps the int columns"""
+        start = time.perf_counter()
+        symbol, fields = self._group_fields(file_path)
+        fields = [(field, df_sub.to_records(index=False)) for field, df_sub in fields]
+        return symbol, fields, time.perf_counter() - start
 
-        with tqdm(total=len(self.csv_files)) as p_bar:
-            with ProcessPoolExecutor(max_workers=self.works) as executor:
-                for _ in executor.map(_dump_func, self.csv_files):
+    def _dump_field_rows(self, symbol: str, field: str, rows, interval: str, overwrite: bool):
+        start = time.perf_counter()
+        self._dump_field(symbol, field, pd.DataFrame.from_records(rows), interval, overwrite)
+        return symbol, field, len(rows), time.perf_counter() - start
+
+    def dump(self, interval="quarterly", overwrite=False, timings_path: str = None):
+        """
+
+        Parameters
+        ----------
+        interval: str, default "quarterly"
+            data interval
+        overwrite: bool, default False
+            whether overwrite existing data or update only
+        timings_path: str, default None
+            if not None, save the seconds spent on each symbol and field as csv
+        """
+        logger.info("start dump pit data......")
+        wall_start = time.perf_counter()
+        timings = []
+        # each file is parsed once by a worker, then each of its fields is dumped as its own task,
+        # so the fields of a large symbol are spread over the workers
+        _dump_func = partial(self._dump_field_rows, interval=interval, overwrite=overwrite)
+        # largest files first; only ``works`` files are parsed ahead to bound the rows in memory
+        files = sorted(self.csv_files, key=lambda f: Path(f).stat().st_size)
+        with ProcessPoolExecutor(max_workers=self.works) as executor, tqdm(
+            total=len(files)
+        ) as p_bar:
+            futures = {}
+
+            def _parse_next():
+                if files:
+                    futures[executor.submit(self._parse_fields, files.pop())] = "parse"
+
+            for _ in range(self.works):
+                _parse_next()
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for _future in done:
+                    if futures.pop(_future) == "dump":
+                        timings.append(_future.result())
+                        continue
+                    symbol, fields, seconds = _future.result()
+                    timings.append((symbol, "", 0, seconds))
+                    for field, rows in fields:
+                        futures[executor.submit(_dump_func, symbol, field, rows)] = "dump"
                     p_bar.update()
+                    _parse_next()
+
+        wall = time.perf_counter() - wall_start
+        df_timings = pd.DataFrame(timings, columns=["symbol", "field", "rows", "seconds"])
+        self.symbol_timings = (
+            df_timings.groupby("symbol")["seconds"].sum().sort_values(ascending=False)
+        )
+        logger.info(
+            f"{df_timings['seconds'].sum():.1f}s of work in {wall:.1f}s with {self.works} workers, "
+            f"slowest symbols: {self.symbol_timings.head(10).round(3).to_dict()}"
+        )
+        if timings_path is not None:
+            df_timings.to_csv(timings_path, index=False)
 
     def __call__(self, *args, **kwargs):
         self.dump()
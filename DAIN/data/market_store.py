@@ -0,0 +1,165 @@
+"""
+Local cache of market data series (OHLCV bars, metrics such as stock-to-flow).
+
+Each series is identified by (kind, source, symbol, interval), eg. ("ohlcv", "gdax", "btc_usd", "days"),
+and stored as one Parquet file under ``root`` with a json sidecar listing the time ranges already
+fetched. ``MarketStore.get`` fetches only the missing ranges, split into chunks which are requested
+concurrently, merges them into the file and returns the requested range as a DataFrame indexed by
+timestamp, ready for ``backtrader.feeds.PandasData``.
+
+    store = MarketStore()
+    df = store.get("ohlcv", "gdax", "btc_usd", "days", "2015-01-20", "2020-05-09", fetch)
+
+``fetch(start, end)`` downloads the half-open range [start, end) and returns a DataFrame indexed by
+timestamp. Reading and writing Parquet needs ``pyarrow`` or ``fastparquet``.
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Tuple, Union
+
+import pandas as pd
+from loguru import logger
+
+DEFAULT_ROOT = "~/.qbot/market_store"
+DEFAULT_CHUNK = pd.DateOffset(years=1)
+
+Range = Tuple[pd.Timestamp, pd.Timestamp]
+
+
+def _timestamp(value) -> pd.Timestamp:
+    ts = pd.Timestamp(value)
+    return ts.tz_convert(None) if ts.tzinfo is not None else ts
+
+
+def merge_ranges(ranges: List[Range]) -> List[Range]:
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def missing_ranges(covered: List[Range], start: pd.Timestamp, end: pd.Timestamp) -> List[Range]:
+    """parts of [start, end) not in the ``covered`` ranges"""
+    missing = []
+    cursor = start
+    for lo, hi in merge_ranges(covered):
+        if hi <= cursor:
+            continue
+        if lo >= end:
+            break
+        if lo > cursor:
+            missing.append((cursor, lo))
+        cursor = max(cursor, hi)
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+
+def split_range(start: pd.Timestamp, end: pd.Timestamp, chunk: pd.DateOffset) -> List[Range]:
+    chunks = []
+    while start < end:
+        chunks.append((start, min(start + chunk, end)))
+        start = chunks[-1][1]
+    return chunks
+
+
+class MarketStore:
+    def __init__(
+        self,
+        root: Union[str, Path] = DEFAULT_ROOT,
+        max_workers: int = 4,
+        chunk: pd.DateOffset = DEFAULT_CHUNK,
+    ):
+        """
+
+        Parameters
+        ----------
+        root: str or Path
+            directory of the cached series
+        max_workers: int
+            number of chunks fetched concurrently
+        chunk: pd.DateOffset
+            length of the ranges requested by one ``fetch`` call, default one year
+        """
+        self.root = Path(root).expanduser()
+        self.max_workers = max_workers
+        self.chunk = chunk
+
+    def path(self, kind: str, source: str, symbol: str, interval: str) -> Path:
+        return self.root.joinpath(kind, source, symbol, f"{interval}.parquet")
+
+    def _coverage_path(self, path: Path) -> Path:
+        return path.with_suffix(".json")
+
+    def load(self, kind: str, source: str, symbol: str, interval: str) -> Tuple[pd.DataFrame, List[Range]]:
+        """cached series and the ranges it covers"""
+        path = self.path(kind, source, symbol, interval)
+        if not path.exists():
+            return pd.DataFrame(), []
+        ranges = json.loads(self._coverage_path(path).read_text())["ranges"]
+        return pd.read_parquet(path), [(_timestamp(lo), _timestamp(hi)) for lo, hi in ranges]
+
+    def _save(self, path: Path, df: pd.DataFrame, covered: List[Range]):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        df.to_parquet(tmp_path)
+        tmp_path.replace(path)
+        ranges = [[lo.isoformat(), hi.isoformat()] for lo, hi in covered]
+        self._coverage_path(path).write_text(json.dumps({"ranges": ranges}))
+
+    def get(
+        self,
+        kind: str,
+        source: str,
+        symbol: str,
+        interval: str,
+        start,
+        end,
+        fetch: Callable[[pd.Timestamp, pd.Timestamp], pd.DataFrame],
+    ) -> pd.DataFrame:
+        """
+        the series between ``start`` (included) and ``end`` (excluded), the ranges missing in the cache
+        are fetched and stored first
+        """
+        start, end = _timestamp(start), _timestamp(end)
+        path = self.path(kind, source, symbol, interval)
+        df, covered = self.load(kind, source, symbol, interval)
+
+        chunks = [c for r in missing_ranges(covered, start, end) for c in split_range(*r, self.chunk)]
+        if chunks:
+            logger.info(f"fetch {len(chunks)} ranges of {kind}/{source}/{symbol}/{interval}")
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                frames = list(executor.map(lambda c: self._fetch(fetch, *c), chunks))
+            frames = [f for f in [df] + frames if not f.empty]
+            if frames:
+                df = pd.concat(frames)
+                df = df[~df.index.duplicated(keep="last")].sort_index()
+            # ranges reaching into the future are fetched again next time
+            now = _timestamp(pd.Timestamp.utcnow())
+            fetched = [(lo, min(hi, now)) for lo, hi in chunks if lo < now]
+            self._save(path, df, merge_ranges(covered + fetched))
+
+        if df.empty:
+            return df
+        return df[(df.index >= start) & (df.index < end)]
+
+    @staticmethod
+    def _fetch(fetch, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        df = fetch(start, end)
+        if df is None or df.empty:
+            return pd.DataFrame()
+        df.index = pd.DatetimeIndex(df.index)
+        if df.index.tz is not None:
+            df.index = df.index.tz_convert(None)
+        return df[(df.index >= start) & (df.index < end)]
+
+    def ohlcv(self, exchange: str, symbol: str, interval: str, start, end, fetch) -> pd.DataFrame:
+        return self.get("ohlcv", exchange, symbol, interval, start, end, fetch)
+
+    def metric(self, source: str, symbol: str, name: str, start, end, fetch) -> pd.DataFrame:
+        return self.get("metric", source, symbol, name, start, end, fetch)
@@ -0,0 +1,40 @@
+# coding:utf-8
+import numpy as np
+from pandas import DataFrame
+
+from backtest_base import IncrementalStrategyTemplate, RollingWindow
+
+
+class BOLLStrategy(IncrementalStrategyTemplate):
+    """long below the lower band, flat above the upper band"""
+
+    name = "BOLLStrategy"
+
+    def __init__(self, stock_code, bars: DataFrame, days=250, period=20, width=2):
+        super(BOLLStrategy, self).__init__(stock_code, bars, days)
+        self.period = period
+        self.width = width
+
+    def signals_from_frame(self, df: DataFrame):
+        close = df["close"]
+        mid = close.rolling(self.period).mean()
+        std = close.rolling(self.period).std(ddof=0)
+        return np.select(
+            [close < mid - self.width * std, close > mid + self.width * std], [1, 0], -1
+        )
+
+    def on_start(self, history: DataFrame):
+        self.window = RollingWindow(self.period)
+        for bar in history.itertuples(index=False):
+            self.on_bar(bar)
+
+    def on_bar(self, bar):
+        self.window.update(bar.close)
+        if not self.window.full:
+            return -1
+        mid, std = self.window.mean(), self.window.std()
+        if bar.close < mid - self.width * std:
+            return 1
+        if bar.close > mid + self.width * std:
+            return 0
+        return -1
@@ -0,0 +1,49 @@
+# coding:utf-8
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from pandas import DataFrame
+
+from backtest_base import IncrementalStrategyTemplate, RollingWindow
+
+
+class CCIStrategy(IncrementalStrategyTemplate):
+    """long above +100, flat below -100"""
+
+    name = "CCIStrategy"
+
+    def __init__(self, stock_code, bars: DataFrame, days=250, period=14, bound=100):
+        super(CCIStrategy, self).__init__(stock_code, bars, days)
+        self.period = period
+        self.bound = bound
+
+    def signals_from_frame(self, df: DataFrame):
+        tp = ((df["high"] + df["low"] + df["close"]) / 3).to_numpy(dtype=float)
+        cci = np.full(len(tp), np.nan)
+        if len(tp) >= self.period:
+            windows = sliding_window_view(tp, self.period)
+            ma = windows.mean(axis=1)
+            md = np.abs(windows - ma[:, None]).mean(axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cci[self.period - 1 :] = (tp[self.period - 1 :] - ma) / (0.015 * md)
+        return np.select([cci > self.bound, cci < -self.bound], [1, 0], -1)
+
+    def on_start(self, history: DataFrame):
+        self.window = RollingWindow(self.period)
+        for bar in history.itertuples(index=False):
+            self.on_bar(bar)
+
+    def on_bar(self, bar):
+        tp = (bar.high + bar.low + bar.close) / 3
+        self.window.update(tp)
+        if not self.window.full:
+            return -1
+        ma = self.window.mean()
+        md = sum(abs(v - ma) for v in self.window.values) / self.period
+        if md == 0:
+            return -1
+        cci = (tp - ma) / (0.015 * md)
+        if cci > self.bound:
+            return 1
+        if cci < -self.bound:
+            return 0
+        return -1
@@ -0,0 +1,38 @@
+# coding:utf-8
+import numpy as np
+from pandas import DataFrame
+
+from backtest_base import EMA, IncrementalStrategyTemplate
+
+
+class MACDStrategy(IncrementalStrategyTemplate):
+    """long while DIF is above DEA"""
+
+    name = "MACDStrategy"
+
+    def __init__(self, stock_code, bars: DataFrame, days=250, fast=12, slow=26, signal=9):
+        super(MACDStrategy, self).__init__(stock_code, bars, days)
+        self.fast = fast
+        self.slow = slow
+        self.signal = signal
+
+    def signals_from_frame(self, df: DataFrame):
+        close = df["close"]
+        dif = (
+            close.ewm(span=self.fast, adjust=False).mean()
+            - close.ewm(span=self.slow, adjust=False).mean()
+        )
+        dea = dif.ewm(span=self.signal, adjust=False).mean()
+        return np.where(dif > dea, 1, 0)
+
+    def on_start(self, history: DataFrame):
+        self.ema_fast = EMA(span=self.fast)
+        self.ema_slow = EMA(span=self.slow)
+        self.dea = EMA(span=self.signal)
+        for bar in history.itertuples(index=False):
+            self.on_bar(bar)
+
+    def on_bar(self, bar):
+        dif = self.ema_fast.update(bar.close) - self.ema_slow.update(bar.close)
+        dea = self.dea.update(dif)
+        return 1 if dif > dea else 0
@@ -0,0 +1,48 @@
+# coding:utf-8
+import numpy as np
+from pandas import DataFrame
+
+from backtest_base import EMA, IncrementalStrategyTemplate
+
+
+class RSIStrategy(IncrementalStrategyTemplate):
+    name = "RSIStrategy"
+
+    def __init__(self, stock_code, bars: DataFrame, days=250, period=14, low=30, high=70):
+        super(RSIStrategy, self).__init__(stock_code, bars, days)
+        self.period = period
+        self.low = low
+        self.high = high
+
+    def signals_from_frame(self, df: DataFrame):
+        delta = df["close"].diff()
+        up = delta.clip(lower=0).ewm(alpha=1.0 / self.period, adjust=False).mean()
+        down = (-delta).clip(lower=0).ewm(alpha=1.0 / self.period, adjust=False).mean()
+        rsi = 100 - 100 / (1 + up / down)
+        return np.select([rsi < self.low, rsi > self.high], [1, 0], -1)
+
+    def on_start(self, history: DataFrame):
+        self.up = EMA(alpha=1.0 / self.period)
+        self.down = EMA(alpha=1.0 / self.period)
+        self.prev_close = None
+        for bar in history.itertuples(index=False):
+            self.on_bar(bar)
+
+    def on_bar(self, bar):
+        prev_close, self.prev_close = self.prev_close, bar.close
+        if prev_close is None:
+            return -1
+        delta = bar.close - prev_close
+        up = self.up.update(max(delta, 0.0))
+        down = self.down.update(max(-delta, 0.0))
+        if down == 0:
+            if up == 0:
+                return -1
+            rsi = 100.0
+        else:
+            rsi = 100 - 100 / (1 + up / down)
+        if rsi < self.low:
+            return 1
+        if rsi > self.high:
+            return 0
+        return -1
@@ -1,6 +1,14 @@
 # coding:utf-8
+from collections import deque
+
 import matplotlib.pyplot as plt
-from pandas import DataFrame
+import numpy as np
+from pandas import DataFrame, Series
+
+try:
+    from xalpha.metrics import metrics as _metrics
+except ImportError:
+    _metrics = None
 
 
 class BacktestStrategyTemplate:
@@ -14,13 +22,25 @@ class BacktestStrategyTemplate:
         self.signals = []
 
     def output_earning_rate(self):
-        df = self.bars[-self.days :]
+        df = self.bars[-self.days :].copy()
         df["signals"] = self.signals
         df["strategy"] = (1 + df.close.pct_change(1).fillna(0) * self.signals).cumprod()
-        df["base"] = df["close"] / df["close"][0]
+        df["base"] = df["close"] / df["close"].iloc[0]
         print(df["strategy"].values[-1:])
         return df
 
+    def metrics(self, riskfree=0.0):
+        """收益、夏普、回撤、换手等指标, 基准为持有不动, 需要 xalpha"""
+        if _metrics is None:
+            raise ImportError("xalpha is required for the strategy metrics")
+        df = self.output_earning_rate()
+        return _metrics(
+            equity=df["strategy"],
+            benchmark=df["base"],
+            positions=df["signals"],
+            riskfree=riskfree,
+        )
+
     def show_plt(self):
         df = self.output_earning_rate()
         fig, axes = plt.subplots(2, 1, sharex=True, figsize=(18, 12))
@@ -51,3 +71,100 @@ class BacktestStrategyTemplate:
 
     def get_scores(self, df: DataFrame):
         return 0
+
+
+class EMA:
+    """exponential moving average updated bar by bar, same values as ``Series.ewm(adjust=False)``"""
+
+    def __init__(self, span=None, alpha=None):
+        self.alpha = alpha if alpha is not None else 2.0 / (span + 1)
+        self.value = None
+
+    def update(self, x):
+        if self.value is None:
+            self.value = x
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+
+class RollingWindow:
+    """last ``size`` values with their running sum and sum of squares"""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.sum = 0.0
+        self.sumsq = 0.0
+
+    def update(self, x):
+        if len(self.values) == self.size:
+            old = self.values[0]
+            self.sum -= old
+            self.sumsq -= old * old
+        self.values.append(x)
+        self.sum += x
+        self.sumsq += x * x
+        return self
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+    def mean(self):
+        return self.sum / len(self.values)
+
+    def std(self):
+        m = self.mean()
+        return max(self.sumsq / len(self.values) - m * m, 0.0) ** 0.5
+
+
+class IncrementalStrategyTemplate(BacktestStrategyTemplate):
+    """
+    strategy template computed in one pass over the bars
+
+    A strategy either implements ``signals_from_frame`` to compute the signal of every bar
+    on whole columns, or keeps rolling indicator state in ``on_start`` / ``on_bar``. A
+    signal is the position (1 long, 0 flat) decided after a bar, or -1 to keep the current
+    position. The positions are aligned as in ``BacktestStrategyTemplate.process``: the
+    position of a day is decided with the bars up to two days before it.
+    """
+
+    name = "IncrementalStrategyTemplate"
+    # use signals_from_frame when it returns the signals, on_bar otherwise
+    vectorized = True
+
+    def on_start(self, history: DataFrame):
+        """warm up the indicators with the bars before the first one passed to ``on_bar``"""
+        pass
+
+    def on_bar(self, bar) -> int:
+        """``bar`` is a namedtuple of the columns of ``bars``, return the signal after it"""
+        return -1
+
+    def signals_from_frame(self, df: DataFrame):
+        """signal of each row of ``df`` computed on whole columns, None if not supported"""
+        return None
+
+    def raw_signals(self):
+        n = len(self.bars)
+        raw = self.signals_from_frame(self.bars) if self.vectorized else None
+        if raw is not None:
+            return np.asarray(raw, dtype=np.int64)
+        raw = np.full(n, -1, dtype=np.int64)
+        first = max(n - self.days - 2, 0)
+        self.on_start(self.bars.iloc[:first])
+        bars = self.bars.iloc[first : n - 1].itertuples(index=False)
+        for k, bar in enumerate(bars, first):
+            raw[k] = self.on_bar(bar)
+        return raw
+
+    def process(self):
+        n = len(self.bars)
+        raw = self.raw_signals()
+        decided_by = np.arange(n - self.days, n) - 2
+        decided = np.where(decided_by >= 0, raw[np.clip(decided_by, 0, None)], -1)
+        # -1 keeps the previous position, starting flat
+        self.signals = (
+            Series(decided, dtype=float).where(decided != -1).ffill().fillna(0).astype(int).tolist()
+        )
@@ -1,4 +1,7 @@
+from BOLL import BOLLStrategy  # noqa: F401
+from CCI import CCIStrategy  # noqa: F401
 from easyquant.quotation import use_quotation
+from MACD import MACDStrategy  # noqa: F401
 from RSI import RSIStrategy
 
 print("backtest  ")
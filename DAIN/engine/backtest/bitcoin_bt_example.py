@@ -3,12 +3,12 @@
 # ======================================================================================================================
 
 import io
-from datetime import datetime
 
 import backtrader as bt
 import pandas as pd
 import requests
-from dateutil.relativedelta import relativedelta
+
+from qbot.data.market_store import MarketStore
 
 # ======================================================================================================================
 
@@ -30,6 +30,9 @@ PercTrail = 0.40
 start_date = "2015-01-20"
 end_date = "2020-05-09"
 
+# 本地缓存, 只下载缺少的区间
+store = MarketStore()
+
 
 # ======================================================================================================================
 
@@ -55,17 +58,10 @@ def amberdata(url, queryString, apiKey):
 
 def amberdata_ohlcv(exchange, symbol, startDate, endDate):
     format = "%Y-%m-%dT%H:%M:%S"
-    startTimestamp = datetime.strptime(startDate, "%Y-%m-%d")
-    endTimestamp = datetime.strptime(endDate, "%Y-%m-%d")
-
-    current = startTimestamp
-    next = current
     fields = "timestamp,open,high,low,close,volume"
-    payload = fields
-    while current < endTimestamp:
-        next += relativedelta(years=1)
-        if next > endTimestamp:
-            next = endTimestamp
+
+    # one range per call, the store requests the missing years concurrently
+    def fetch(current, next):
         print("Retrieving OHLCV between", current, " and ", next)
         result = amberdata(
             "https://web3api.io/api/v2/market/ohlcv/" + symbol + "/historical",
@@ -80,10 +76,9 @@ def amberdata_ohlcv(exchange, symbol, startDate, endDate):
             },
             Amberdata_API_KEY,
         )
-        payload += "\n" + result
-        current = next
+        return to_pandas(fields + "\n" + result)
 
-    return payload
+    return store.ohlcv(exchange, symbol, "days", startDate, endDate, fetch)
 
 def xirrcal(cftable, trades, date, startdate=None, guess=0.01):
     """
@@ -146,19 +141,24 @@ def bottleneck(cftable):
 
 
 def amberdata_stf(symbol, startDate, endDate):
-    print("Retrieving STF between", startDate, " and ", endDate)
-    return amberdata(
-        "https://web3api.io/api/v2/market/metrics/"
-        + symbol
-        + "/historical/stock-to-flow",
-        {
-            "format": "csv",
-            "timeFrame": "day",
-            "startDate": startDate,
-            "endDate": endDate,
-        },
-        Amberdata_API_KEY,
-    )
+    def fetch(start, end):
+        print("Retrieving STF between", start, " and ", end)
+        return to_pandas(
+            amberdata(
+                "https://web3api.io/api/v2/market/metrics/"
+                + symbol
+                + "/historical/stock-to-flow",
+                {
+                    "format": "csv",
+                    "timeFrame": "day",
+                    "startDate": start.strftime("%Y-%m-%d"),
+                    "endDate": end.strftime("%Y-%m-%d"),
+                },
+                Amberdata_API_KEY,
+            )
+        )
+
+    return store.metric("amberdata", symbol, "stock-to-flow", startDate, endDate, fetch)
 
 
 def to_pandas(csv):
@@ -240,10 +240,10 @@ cerebro.addsizer(bt.sizers.PercentSizer, percents=PercSize)
 cerebro.addstrategy(Strategy)
 
 
-btc = to_pandas(amberdata_ohlcv("gdax", "btc_usd", start_date, end_date))
+btc = amberdata_ohlcv("gdax", "btc_usd", start_date, end_date)
 btc.to_csv("btc_new.csv")
 
-btc_stf = to_pandas(amberdata_stf("btc", start_date, end_date))
+btc_stf = amberdata_stf("btc", start_date, end_date)
 
 btc["stf"] = btc_stf["price"]
 
@@ -1,10 +1,16 @@
+import argparse
 import datetime as dt
 
 import backtrader as bt
 from backtrader_binance import BinanceStore
 
+from qbot.common.logging.logger import LOGGER as logger
+from qbot.common.logging.logger import RateLimitedLogger
 from qbot.engine.tokens import binance_api
 
+# 每根K线都会触发, 限制为每秒最多一条
+bar_logger = RateLimitedLogger(logger, interval=1.0)
+
 # https://github.com/lindomar-oliveira/backtrader-binance
 
 
@@ -13,15 +19,14 @@ class RSIStrategy(bt.Strategy):
         self.rsi = bt.indicators.RSI(period=14)  # RSI indicator
 
     def next(self):
-        print(
-            "Open: {}, High: {}, Low: {}, Close: {}".format(
-                self.data.open[0],
-                self.data.high[0],
-                self.data.low[0],
-                self.data.close[0],
-            )
+        bar_logger.info(
+            "Open: %s, High: %s, Low: %s, Close: %s, RSI: %s",
+            self.data.open[0],
+            self.data.high[0],
+            self.data.low[0],
+            self.data.close[0],
+            self.rsi[0],
         )
-        print("RSI: {}".format(self.rsi[0]))
 
         if not self.position:
             if self.rsi < 30:  # Enter long
@@ -31,19 +36,41 @@ class RSIStrategy(bt.Strategy):
                 self.sell()  # Close long position
 
     def notify_order(self, order):
-        print(order)
+        logger.info("%s", order)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sim", action="store_true", help="run against the local SimExchange")
+    parser.add_argument("--klines", help="recorded klines csv for --sim, synthetic by default")
+    parser.add_argument("--bars", type=int, default=5000, help="number of synthetic klines")
+    parser.add_argument("--speed", type=float, default=0.0, help="replay speed, 0 in lockstep with the strategy")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
     cerebro = bt.Cerebro(quicknotify=True)
 
-    store = BinanceStore(
-        api_key=binance_api["apikey"],
-        api_secret=binance_api["secretkey"],
-        coin_refer="BTC",
-        coin_target="USDT",
-        testnet=True,
-    )
+    if args.sim:
+        from sim_exchange import LatencyModel, SimExchange, load_klines, synthetic_klines
+        from sim_store import SimStore
+
+        klines = load_klines(args.klines) if args.klines else synthetic_klines(args.bars, interval_minutes=5)
+        exchange = SimExchange(
+            klines,
+            speed=args.speed,
+            lockstep=args.speed == 0,
+            latency=LatencyModel(args.latency_ms, args.jitter_ms, seed=0),
+        )
+        store = SimStore(exchange)
+    else:
+        store = BinanceStore(
+            api_key=binance_api["apikey"],
+            api_secret=binance_api["secretkey"],
+            coin_refer="BTC",
+            coin_target="USDT",
+            testnet=True,
+        )
 
     broker = store.getbroker()
     cerebro.setbroker(broker)
@@ -54,3 +81,7 @@ if __name__ == "__main__":
     cerebro.addstrategy(RSIStrategy)
     cerebro.adddata(data)
     cerebro.run()
+
+    if args.sim:
+        exchange.stop()
+        logger.info(f"SimExchange stats: {exchange.stats()}")
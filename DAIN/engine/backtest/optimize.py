@@ -0,0 +1,282 @@
+# coding:utf-8
+"""
+Parameter search for backtrader strategies on a process pool.
+
+The bars are copied once into shared memory, every worker maps them as a DataFrame without
+copying and runs one ``bt.Cerebro`` per parameter set. The analyzers (returns, drawdown,
+Sharpe, trades) of all the runs are collected into one DataFrame. With ``checkpoint`` set,
+each finished run is appended to a json lines file and skipped when the search is run again.
+
+    from optimize import Optimizer, SmaCross
+
+    opt = Optimizer(SmaCross, df, feed_kwargs={"openinterest": -1},
+                    checkpoint="sma_sweep.jsonl")
+    results = opt.grid(fast=[5, 10, 15], slow=[20, 30, 60])
+    results = opt.random(100, seed=0, fast=(3, 20), slow=(20, 120))
+    results = opt.bayes(100, fast=(3, 20), slow=(20, 120))  # needs optuna
+
+``df`` holds the open, high, low, close and volume columns indexed by date. The strategy class
+must be importable by the workers, from a module which does not run a backtest at import, as
+``SmaCross`` below. Bayesian searches are not resumed from the checkpoint.
+"""
+import itertools
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.shared_memory import SharedMemory
+
+import backtrader as bt
+import numpy as np
+import pandas as pd
+
+from qbot.common.logging.logger import LOGGER as logger
+
+try:
+    import optuna
+except ImportError:
+    optuna = None
+
+# state of a worker process, set by _init_worker
+_worker = {}
+
+
+def _init_worker(strategy, shm_name, shape, columns, index, settings):
+    shm = SharedMemory(name=shm_name)
+    values = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    _worker["shm"] = shm
+    _worker["data"] = pd.DataFrame(values, index=index, columns=columns, copy=False)
+    _worker["strategy"] = strategy
+    _worker["settings"] = settings
+
+
+def _metrics(strat, value):
+    returns = strat.analyzers.returns.get_analysis()
+    drawdown = strat.analyzers.drawdown.get_analysis()
+    trades = strat.analyzers.trades.get_analysis()
+    return {
+        "final_value": value,
+        "total_return": returns.get("rtot"),
+        "annual_return": returns.get("rnorm"),
+        "max_drawdown": drawdown.max.drawdown,
+        "max_drawdown_len": drawdown.max.len,
+        "sharpe": strat.analyzers.sharpe.get_analysis().get("sharperatio"),
+        "trades": trades.get("total", {}).get("closed", 0),
+        "won": trades.get("won", {}).get("total", 0),
+        "lost": trades.get("lost", {}).get("total", 0),
+    }
+
+
+def _run_one(params):
+    settings = _worker["settings"]
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.adddata(settings["feed"](dataname=_worker["data"], **settings["feed_kwargs"]))
+    cerebro.addstrategy(_worker["strategy"], **params)
+    cerebro.broker.setcash(settings["cash"])
+    cerebro.broker.setcommission(commission=settings["commission"])
+    if settings["sizer"] is not None:
+        cerebro.addsizer(settings["sizer"], **settings["sizer_kwargs"])
+    cerebro.addanalyzer(bt.analyzers.Returns, _name="returns")
+    cerebro.addanalyzer(bt.analyzers.DrawDown, _name="drawdown")
+    cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name="sharpe")
+    cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name="trades")
+    try:
+        strat = cerebro.run()[0]
+        result = _metrics(strat, cerebro.broker.getvalue())
+    except Exception as e:
+        result = {"error": repr(e)}
+    return dict(params, **result)
+
+
+def _key(params):
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def grid_space(**params):
+    """all the combinations of the values of each parameter"""
+    names = list(params)
+    return [dict(zip(names, values)) for values in itertools.product(*params.values())]
+
+
+def _sample(rng, space):
+    """a list is sampled uniformly, a (low, high) tuple of ints or floats in the range"""
+    if isinstance(space, tuple):
+        low, high = space
+        if isinstance(low, int) and isinstance(high, int):
+            return rng.randint(low, high)
+        return rng.uniform(low, high)
+    return rng.choice(list(space))
+
+
+def random_space(n, seed=None, **space):
+    rng = random.Random(seed)
+    return [{name: _sample(rng, s) for name, s in space.items()} for _ in range(n)]
+
+
+class SmaCross(bt.Strategy):
+    """long when the fast moving average is above the slow one"""
+
+    params = (
+        ("fast", 5),
+        ("slow", 20),
+        ("target", 0.95),
+    )
+
+    def __init__(self):
+        self.crossover = bt.indicators.CrossOver(
+            bt.indicators.SMA(self.data.close, period=self.params.fast),
+            bt.indicators.SMA(self.data.close, period=self.params.slow),
+        )
+
+    def next(self):
+        if not self.position and self.crossover > 0:
+            self.order_target_percent(target=self.params.target)
+        elif self.position and self.crossover < 0:
+            self.close()
+
+
+class Optimizer:
+    def __init__(
+        self,
+        strategy,
+        data: pd.DataFrame,
+        feed=bt.feeds.PandasData,
+        feed_kwargs=None,
+        cash=1000000.0,
+        commission=0.001,
+        sizer=None,
+        sizer_kwargs=None,
+        max_workers=None,
+        checkpoint=None,
+    ):
+        """
+        :param strategy: bt.Strategy subclass, importable by the worker processes
+        :param data: bars indexed by datetime, the numeric columns are used
+        :param feed: data feed class built from the bars in each run
+        :param checkpoint: json lines file of the finished runs, None to disable
+        """
+        self.strategy = strategy
+        self.data = data.select_dtypes("number").astype(np.float64)
+        self.settings = {
+            "feed": feed,
+            "feed_kwargs": feed_kwargs or {},
+            "cash": cash,
+            "commission": commission,
+            "sizer": sizer,
+            "sizer_kwargs": sizer_kwargs or {},
+        }
+        self.max_workers = max_workers or os.cpu_count()
+        self.checkpoint = checkpoint
+
+    def _load_checkpoint(self):
+        done = {}
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            with open(self.checkpoint) as f:
+                for line in f:
+                    if line.strip():
+                        result = json.loads(line)
+                        done[result.pop("_key")] = result
+        return done
+
+    def _pool(self, shm):
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(
+                self.strategy,
+                shm.name,
+                self.data.shape,
+                list(self.data.columns),
+                self.data.index,
+                self.settings,
+            ),
+        )
+
+    def _shared_data(self):
+        values = np.ascontiguousarray(self.data.to_numpy())
+        shm = SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype=np.float64, buffer=shm.buf)[:] = values
+        return shm
+
+    def _evaluate(self, param_list, done, checkpoint_file, executor):
+        """results of ``param_list`` in its order, runs not in ``done`` are submitted once"""
+        todo = {}
+        for params in param_list:
+            key = _key(params)
+            if key not in done and key not in todo:
+                todo[key] = params
+        futures = {executor.submit(_run_one, params): key for key, params in todo.items()}
+        for i, future in enumerate(as_completed(futures), 1):
+            key = futures[future]
+            result = done[key] = future.result()
+            if checkpoint_file is not None:
+                checkpoint_file.write(json.dumps(dict(result, _key=key), default=str) + "\n")
+                checkpoint_file.flush()
+            logger.info(f"[Optimizer] {i}/{len(todo)} {result}")
+        return [done[_key(params)] for params in param_list]
+
+    def _search(self, batches, sort_by="sharpe"):
+        """run the parameter sets of each batch, ``batches`` gets the results of the previous ones"""
+        done = self._load_checkpoint()
+        shm = self._shared_data()
+        checkpoint_file = open(self.checkpoint, "a") if self.checkpoint else None
+        results = []
+        try:
+            with self._pool(shm) as executor:
+                for param_list in batches(results):
+                    results.extend(self._evaluate(param_list, done, checkpoint_file, executor))
+        finally:
+            if checkpoint_file is not None:
+                checkpoint_file.close()
+            shm.close()
+            shm.unlink()
+        df = pd.DataFrame(results)
+        if sort_by in df.columns:
+            df = df.sort_values(sort_by, ascending=False, na_position="last")
+        return df.reset_index(drop=True)
+
+    def run(self, param_list, sort_by="sharpe"):
+        return self._search(lambda results: [param_list], sort_by)
+
+    def grid(self, sort_by="sharpe", **params):
+        return self.run(grid_space(**params), sort_by)
+
+    def random(self, n, seed=None, sort_by="sharpe", **space):
+        return self.run(random_space(n, seed, **space), sort_by)
+
+    def bayes(self, n, metric="sharpe", seed=None, **space):
+        """
+        TPE search with optuna, ``max_workers`` parameter sets are evaluated at a time;
+        a list is a categorical parameter, a (low, high) tuple an int or float range
+        """
+        if optuna is None:
+            raise ImportError("optuna is required for the bayesian search")
+        study = optuna.create_study(
+            direction="maximize", sampler=optuna.samplers.TPESampler(seed=seed)
+        )
+
+        def suggest(trial):
+            params = {}
+            for name, s in space.items():
+                if not isinstance(s, tuple):
+                    params[name] = trial.suggest_categorical(name, list(s))
+                elif isinstance(s[0], int) and isinstance(s[1], int):
+                    params[name] = trial.suggest_int(name, *s)
+                else:
+                    params[name] = trial.suggest_float(name, *s)
+            return params
+
+        def batches(results):
+            told = 0
+            while told < n:
+                trials = [study.ask() for _ in range(min(self.max_workers, n - told))]
+                yield [suggest(trial) for trial in trials]
+                for trial, result in zip(trials, results[-len(trials) :]):
+                    value = result.get(metric)
+                    if value is None or "error" in result:
+                        study.tell(trial, state=optuna.trial.TrialState.FAIL)
+                    else:
+                        study.tell(trial, value)
+                told += len(trials)
+
+        return self._search(batches, sort_by=metric)
@@ -0,0 +1,482 @@
+# coding:utf-8
+"""
+Local stand-in for a spot exchange, to run and time live strategies on one machine.
+
+``SimExchange`` replays recorded or synthetic klines at a configurable speed, publishes each one
+to the subscribed feeds and matches the orders it receives against them:
+
+- market orders fill at the price of the last kline (on arrival) or at the open of the next
+  ones, moved by ``slippage_bps`` against the order
+- limit orders fill at their price, or better at the open, once the kline trades through it
+- each kline can fill at most ``participation`` of its volume, the rest of an order waits
+- fees are ``fee`` of the traded quote amount
+
+Orders and market data both go through an injectable ``LatencyModel``. For every order the
+exchange records the tick-to-order latency, from the publication of the kline the order was
+decided on (``kline_seq``, the ``seq`` of the published klines) to the arrival of the order,
+see ``SimExchange.stats``. With ``lockstep`` the replay waits for the consumer instead of a
+clock: the next kline is published once ``advance`` is called and the orders sent before it
+have reached the exchange.
+
+The exchange thread runs until ``stop``, orders sent after the last kline are still matched.
+
+``serve`` exposes the exchange over HTTP: Binance-like REST endpoints for orders, account and
+klines, and ``/stream`` as a newline-delimited json stream of the published klines.
+"""
+import heapq
+import itertools
+import json
+import queue
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import numpy as np
+import pandas as pd
+
+from qbot.common.logging.logger import LOGGER as logger
+
+NEW = "NEW"
+PARTIALLY_FILLED = "PARTIALLY_FILLED"
+FILLED = "FILLED"
+CANCELED = "CANCELED"
+REJECTED = "REJECTED"
+
+
+class LatencyModel:
+    """one-way network latency, normal with ``mean_ms`` and ``jitter_ms``, never negative"""
+
+    def __init__(self, mean_ms=0.0, jitter_ms=0.0, seed=None):
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+
+    def sample(self):
+        if not self.jitter_ms:
+            return self.mean_ms / 1000
+        return max(self._random.gauss(self.mean_ms, self.jitter_ms), 0.0) / 1000
+
+
+def synthetic_klines(n=1000, start="2023-01-01", interval_minutes=1, price=20000.0, seed=0):
+    """random walk klines with open, high, low, close and volume, indexed by open time"""
+    rng = np.random.default_rng(seed)
+    close = price * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    open_ = np.concatenate([[price], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.0005, n)) * close
+    return pd.DataFrame(
+        {
+            "open": open_,
+            "high": np.maximum(open_, close) + spread,
+            "low": np.minimum(open_, close) - spread,
+            "close": close,
+            "volume": rng.gamma(2.0, 5.0, n),
+        },
+        index=pd.date_range(start, periods=n, freq=f"{interval_minutes}min"),
+    )
+
+
+def load_klines(path):
+    """recorded klines, a csv with a time column and open, high, low, close, volume"""
+    df = pd.read_csv(path)
+    time_col = next(c for c in ("open_time", "timestamp", "datetime", "date") if c in df.columns)
+    index = df.pop(time_col)
+    unit = "ms" if pd.api.types.is_integer_dtype(index) else None
+    df.index = pd.to_datetime(index, unit=unit)
+    return df[["open", "high", "low", "close", "volume"]].astype(float)
+
+
+class SimExchange:
+    def __init__(
+        self,
+        klines: pd.DataFrame,
+        symbol="BTCUSDT",
+        base="BTC",
+        quote="USDT",
+        speed=0.0,
+        latency=None,
+        fee=0.001,
+        slippage_bps=1.0,
+        participation=0.1,
+        balances=None,
+        lockstep=False,
+    ):
+        """
+        :param klines: bars indexed by time, see ``synthetic_klines`` and ``load_klines``
+        :param speed: replay speed, 1.0 for the interval of the klines in real time, 0 for as fast
+            as possible
+        :param lockstep: publish each kline after ``advance`` instead of after the interval
+        :param latency: LatencyModel of both directions, default no latency
+        :param balances: dict asset -> free amount, default 100000 of the quote asset
+        """
+        self.klines = klines
+        self.symbol = symbol
+        self.base = base
+        self.quote = quote
+        self.speed = speed
+        self.latency = latency or LatencyModel()
+        self.fee = fee
+        self.slippage = slippage_bps / 10000
+        self.participation = participation
+        self.lockstep = lockstep
+        self.balances = dict(balances or {quote: 100000.0})
+        self.balances.setdefault(base, 0.0)
+        self.balances.setdefault(quote, 0.0)
+
+        if len(klines) > 1:
+            self.interval = (klines.index[1] - klines.index[0]).total_seconds()
+        else:
+            self.interval = 60.0
+        self.orders = {}
+        self.published = []  # klines published so far
+        self.last = None  # last kline published
+        self._available = 0.0  # volume of the last kline still available for fills
+        self._resting = []  # ids of the open orders, in arrival order
+        self._subscribers = []
+        self._events = []  # heap of (due time, seq, callback, args)
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._cv = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self._done = False
+        self._next_kline = None  # index of the kline waiting for ``advance`` in lockstep
+
+        self._publish_times = []  # perf_counter of the publication of each kline
+        self._tick_to_order = []
+        self._started = None
+        self._finished = None
+
+    # ---------------------------------------------------------------- client side
+
+    def subscribe(self):
+        """queue receiving the published klines as dicts, then None at the end of the replay"""
+        q = queue.Queue()
+        with self._cv:
+            self._subscribers.append(q)
+        return q
+
+    def submit_order(
+        self, side, type="MARKET", quantity=0.0, price=None, client_id=None, on_update=None, kline_seq=None
+    ):
+        """
+        send an order, it reaches the matching engine after the latency; ``on_update`` is called
+        from the exchange thread with {"order": snapshot, "fill": (qty, price, fee) or None}
+        after the latency back, for the acceptance, each fill and the final status.
+        ``kline_seq`` is the ``seq`` of the kline the order reacts to, default the last published
+        """
+        order = {
+            "id": next(self._ids),
+            "client_id": client_id,
+            "symbol": self.symbol,
+            "side": side.upper(),
+            "type": type.upper(),
+            "price": price,
+            "quantity": float(quantity),
+            "filled": 0.0,
+            "quote_filled": 0.0,
+            "status": NEW,
+            "submit_time": time.perf_counter(),
+            "kline_seq": kline_seq,
+            "_on_update": on_update,
+        }
+        with self._cv:
+            self.orders[order["id"]] = order
+        self._schedule(self.latency.sample(), self._on_order, order["id"])
+        return order["id"]
+
+    def cancel_order(self, order_id):
+        self._schedule(self.latency.sample(), self._on_cancel, order_id)
+
+    def get_order(self, order_id):
+        with self._cv:
+            return self._snapshot(self.orders[order_id])
+
+    def get_account(self):
+        with self._cv:
+            return dict(self.balances)
+
+    def advance(self):
+        """lockstep only: the consumer is done with the last kline, publish the next one"""
+        with self._cv:
+            if self._next_kline is None:
+                return
+            i, self._next_kline = self._next_kline, None
+            now = time.perf_counter()
+            # after the orders and cancels still on their way to the exchange
+            due = max(
+                [e[0] for e in self._events if e[2] in (self._on_order, self._on_cancel)],
+                default=now,
+            )
+            self._push(due - now, self._on_kline, i)
+            self._cv.notify_all()
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._schedule(0.0, self._on_kline, 0)
+        self._thread = threading.Thread(target=self._run, name="sim-exchange", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cv:
+            self._stopped = True
+            self._cv.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        """tick-to-order latency in ms and throughput of the replay"""
+        elapsed = (self._finished or time.perf_counter()) - (self._started or time.perf_counter())
+        lat = np.array(self._tick_to_order) * 1000
+        stats = {
+            "klines": len(self.published),
+            "orders": len(self.orders),
+            "elapsed": elapsed,
+            "klines_per_sec": len(self.published) / elapsed if elapsed > 0 else None,
+            "orders_per_sec": len(self.orders) / elapsed if elapsed > 0 else None,
+        }
+        if len(lat):
+            stats.update(
+                {
+                    "tick_to_order_mean_ms": lat.mean(),
+                    "tick_to_order_p50_ms": np.percentile(lat, 50),
+                    "tick_to_order_p90_ms": np.percentile(lat, 90),
+                    "tick_to_order_p99_ms": np.percentile(lat, 99),
+                    "tick_to_order_max_ms": lat.max(),
+                }
+            )
+        return stats
+
+    # ---------------------------------------------------------------- exchange thread
+
+    def _schedule(self, delay, callback, *args):
+        with self._cv:
+            self._push(delay, callback, *args)
+            self._cv.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cv:
+                while not self._stopped:
+                    if self._events:
+                        wait = self._events[0][0] - time.perf_counter()
+                        if wait <= 0:
+                            break
+                        self._cv.wait(wait)
+                    else:
+                        # after the replay, orders can still come until stop()
+                        self._cv.wait()
+                if self._stopped:
+                    break
+                _, _, callback, args = heapq.heappop(self._events)
+                callback(*args)
+        self._finished = self._finished or time.perf_counter()
+
+    # the callbacks below run in the exchange thread with self._cv held
+
+    def _on_kline(self, i):
+        if i >= len(self.klines):
+            for q in self._subscribers:
+                self._deliver_locked(q.put, None)
+            self._done = True
+            self._finished = time.perf_counter()
+            return
+        row = self.klines.iloc[i]
+        kline = {
+            "seq": i,
+            "symbol": self.symbol,
+            "time": self.klines.index[i].isoformat(),
+            "open": float(row["open"]),
+            "high": float(row["high"]),
+            "low": float(row["low"]),
+            "close": float(row["close"]),
+            "volume": float(row["volume"]),
+        }
+        self.last = kline
+        self.published.append(kline)
+        self._available = kline["volume"] * self.participation
+        for order_id in list(self._resting):
+            self._match(self.orders[order_id], kline, at_open=True)
+        self._publish_times.append(time.perf_counter())
+        for q in self._subscribers:
+            self._deliver_locked(q.put, kline)
+        if self.lockstep:
+            self._next_kline = i + 1
+        else:
+            delay = self.interval / self.speed if self.speed else 0.0
+            self._push(delay, self._on_kline, i + 1)
+
+    def _push(self, delay, callback, *args):
+        heapq.heappush(self._events, (time.perf_counter() + delay, next(self._seq), callback, args))
+
+    def _deliver_locked(self, callback, data):
+        self._push(self.latency.sample(), callback, data)
+
+    def _on_order(self, order_id):
+        order = self.orders[order_id]
+        seq = order["kline_seq"]
+        if seq is None and self._publish_times:
+            seq = len(self._publish_times) - 1
+        if seq is not None and 0 <= seq < len(self._publish_times):
+            self._tick_to_order.append(time.perf_counter() - self._publish_times[seq])
+        if order["quantity"] <= 0 or (order["type"] == "LIMIT" and not order["price"]):
+            self._finish(order, REJECTED)
+            return
+        self._update(order, None)
+        if self.last is not None:
+            self._match(order, self.last, at_open=False)
+        if order["status"] in (NEW, PARTIALLY_FILLED):
+            self._resting.append(order_id)
+
+    def _on_cancel(self, order_id):
+        order = self.orders.get(order_id)
+        if order is not None and order["status"] in (NEW, PARTIALLY_FILLED):
+            self._finish(order, CANCELED)
+
+    def _match(self, order, kline, at_open):
+        buy = order["side"] == "BUY"
+        if order["type"] == "MARKET":
+            ref = kline["open"] if at_open else kline["close"]
+            price = ref * (1 + self.slippage if buy else 1 - self.slippage)
+        else:
+            limit = order["price"]
+            if at_open:
+                if buy and kline["low"] > limit or not buy and kline["high"] < limit:
+                    return
+                price = min(limit, kline["open"]) if buy else max(limit, kline["open"])
+            else:
+                if buy and kline["close"] > limit or not buy and kline["close"] < limit:
+                    return
+                price = kline["close"]
+
+        qty = min(order["quantity"] - order["filled"], self._available)
+        if buy:
+            qty = min(qty, self.balances[self.quote] / (price * (1 + self.fee)))
+        else:
+            qty = min(qty, self.balances[self.base])
+        if qty <= 0:
+            if order["filled"] == 0 and (
+                buy and self.balances[self.quote] <= 0 or not buy and self.balances[self.base] <= 0
+            ):
+                self._finish(order, REJECTED)
+            return
+        self._available -= qty
+        fee = qty * price * self.fee
+        if buy:
+            self.balances[self.base] += qty
+            self.balances[self.quote] -= qty * price + fee
+        else:
+            self.balances[self.base] -= qty
+            self.balances[self.quote] += qty * price - fee
+        order["filled"] += qty
+        order["quote_filled"] += qty * price
+        if order["quantity"] - order["filled"] <= 1e-12:
+            order["status"] = FILLED
+            if order["id"] in self._resting:
+                self._resting.remove(order["id"])
+        else:
+            order["status"] = PARTIALLY_FILLED
+        self._update(order, (qty, price, fee))
+
+    def _finish(self, order, status):
+        order["status"] = status
+        if order["id"] in self._resting:
+            self._resting.remove(order["id"])
+        self._update(order, None)
+
+    def _update(self, order, fill):
+        if order["_on_update"] is not None:
+            self._deliver_locked(order["_on_update"], {"order": self._snapshot(order), "fill": fill})
+
+    @staticmethod
+    def _snapshot(order):
+        snapshot = {k: v for k, v in order.items() if not k.startswith("_")}
+        snapshot["avg_price"] = order["quote_filled"] / order["filled"] if order["filled"] else None
+        return snapshot
+
+
+class _Handler(BaseHTTPRequestHandler):
+    exchange = None
+
+    def log_message(self, format, *args):
+        logger.debug("[SimExchange] " + format % args)
+
+    def _send(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _params(self):
+        url = urlparse(self.path)
+        params = dict(parse_qsl(url.query))
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            params.update(parse_qsl(self.rfile.read(length).decode()))
+        return url.path, params
+
+    def do_GET(self):
+        path, params = self._params()
+        if path == "/api/v3/klines":
+            limit = int(params.get("limit", 500))
+            self._send(self.exchange.published[-limit:])
+        elif path == "/api/v3/account":
+            self._send({"balances": self.exchange.get_account()})
+        elif path == "/api/v3/order":
+            self._send(self.exchange.get_order(int(params["orderId"])))
+        elif path == "/stream":
+            self._stream()
+        else:
+            self._send({"msg": "not found"}, 404)
+
+    def do_POST(self):
+        path, params = self._params()
+        if path != "/api/v3/order":
+            return self._send({"msg": "not found"}, 404)
+        price = params.get("price")
+        seq = params.get("klineSeq")
+        order_id = self.exchange.submit_order(
+            params["side"],
+            params.get("type", "MARKET"),
+            float(params["quantity"]),
+            float(price) if price else None,
+            params.get("newClientOrderId"),
+            kline_seq=int(seq) if seq is not None else None,
+        )
+        self._send({"orderId": order_id})
+
+    def do_DELETE(self):
+        path, params = self._params()
+        if path != "/api/v3/order":
+            return self._send({"msg": "not found"}, 404)
+        self.exchange.cancel_order(int(params["orderId"]))
+        self._send({"orderId": int(params["orderId"])})
+
+    def _stream(self):
+        q = self.exchange.subscribe()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        while True:
+            kline = q.get()
+            if kline is None:
+                break
+            try:
+                self.wfile.write((json.dumps(kline) + "\n").encode())
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                break
+
+
+def serve(exchange, host="127.0.0.1", port=8765):
+    """serve ``exchange`` over HTTP in a background thread, return the server"""
+    handler = type("SimExchangeHandler", (_Handler,), {"exchange": exchange})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="sim-exchange-http", daemon=True).start()
+    logger.info(f"[SimExchange] serving {exchange.symbol} on http://{host}:{port}")
+    return server
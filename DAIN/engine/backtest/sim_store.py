@@ -0,0 +1,214 @@
+# coding:utf-8
+"""
+backtrader store over ``SimExchange``, a drop-in for ``backtrader_binance.BinanceStore``
+
+    exchange = SimExchange(synthetic_klines(5000), latency=LatencyModel(5, 1))
+    store = SimStore(exchange)
+    cerebro.setbroker(store.getbroker())
+    cerebro.adddata(store.getdata(timeframe_in_minutes=1))
+    cerebro.run()
+    print(exchange.stats())
+"""
+import collections
+import queue
+
+import backtrader as bt
+import pandas as pd
+
+from sim_exchange import CANCELED, FILLED, REJECTED
+
+
+class SimData(bt.feed.DataBase):
+    params = (("store", None), ("timeout", 0.1))
+
+    def start(self):
+        super(SimData, self).start()
+        self._klines = self.p.store.exchange.subscribe()
+        self.kline_seq = None  # seq of the last kline loaded, the one the strategy reacts to
+        self._ack = False
+        self.p.store.start()
+
+    def islive(self):
+        return True
+
+    def haslivedata(self):
+        return not self._klines.empty()
+
+    def _load(self):
+        if self._ack:
+            # the strategy is done with the last kline, lockstep exchanges publish the next one
+            self._ack = False
+            self.p.store.exchange.advance()
+        try:
+            kline = self._klines.get(timeout=self.p.timeout)
+        except queue.Empty:
+            return None
+        if kline is None:
+            return False
+        self.kline_seq = kline["seq"]
+        self._ack = True
+        self.lines.datetime[0] = bt.date2num(pd.Timestamp(kline["time"]).to_pydatetime())
+        self.lines.open[0] = kline["open"]
+        self.lines.high[0] = kline["high"]
+        self.lines.low[0] = kline["low"]
+        self.lines.close[0] = kline["close"]
+        self.lines.volume[0] = kline["volume"]
+        self.lines.openinterest[0] = 0.0
+        return True
+
+
+class SimBroker(bt.BrokerBase):
+    def __init__(self, store):
+        super(SimBroker, self).__init__()
+        self.store = store
+        self.exchange = store.exchange
+        self.notifs = collections.deque()
+        self.positions = collections.defaultdict(bt.Position)
+        self.open_orders = {}  # exchange order id -> bt order
+        self.updates = queue.Queue()
+        self.startingcash = self.getcash()
+        self.startingvalue = self.getvalue()
+
+    def getcash(self):
+        return self.exchange.get_account()[self.exchange.quote]
+
+    def getvalue(self, datas=None):
+        balances = self.exchange.get_account()
+        last = self.exchange.last
+        price = last["close"] if last is not None else 0.0
+        return balances[self.exchange.quote] + balances[self.exchange.base] * price
+
+    def getposition(self, data, clone=True):
+        position = self.positions[data]
+        return position.clone() if clone else position
+
+    def get_notification(self):
+        return self.notifs.popleft() if self.notifs else None
+
+    def notify(self, order):
+        self.notifs.append(order.clone())
+
+    def _submit(self, order_class, owner, data, size, price, exectype, side):
+        order = order_class(owner=owner, data=data, size=size, price=price, exectype=exectype)
+        order.addcomminfo(self.getcommissioninfo(data))
+        order.submit(self)
+        self.notify(order)
+        order_type = "MARKET" if exectype in (None, bt.Order.Market) else "LIMIT"
+        order_id = self.exchange.submit_order(
+            side,
+            order_type,
+            abs(size),
+            price,
+            client_id=order.ref,
+            on_update=self.updates.put,
+            kline_seq=getattr(data, "kline_seq", None),
+        )
+        self.open_orders[order_id] = order
+        return order
+
+    def buy(
+        self,
+        owner,
+        data,
+        size,
+        price=None,
+        plimit=None,
+        exectype=None,
+        valid=None,
+        tradeid=0,
+        oco=None,
+        trailamount=None,
+        trailpercent=None,
+        **kwargs,
+    ):
+        return self._submit(bt.BuyOrder, owner, data, size, price, exectype, "BUY")
+
+    def sell(
+        self,
+        owner,
+        data,
+        size,
+        price=None,
+        plimit=None,
+        exectype=None,
+        valid=None,
+        tradeid=0,
+        oco=None,
+        trailamount=None,
+        trailpercent=None,
+        **kwargs,
+    ):
+        return self._submit(bt.SellOrder, owner, data, size, price, exectype, "SELL")
+
+    def cancel(self, order):
+        for order_id, o in self.open_orders.items():
+            if o is order:
+                self.exchange.cancel_order(order_id)
+                return
+
+    def next(self):
+        while True:
+            try:
+                update = self.updates.get_nowait()
+            except queue.Empty:
+                break
+            snapshot, fill = update["order"], update["fill"]
+            order = self.open_orders.get(snapshot["id"])
+            if order is None:
+                continue
+            if fill is None and snapshot["status"] not in (CANCELED, REJECTED):
+                if order.status == bt.Order.Submitted:
+                    order.accept(self)
+                    self.notify(order)
+                continue
+            if fill is not None:
+                qty, price, fee = fill
+                size = qty if order.isbuy() else -qty
+                position = self.positions[order.data]
+                psize, pprice, opened, closed = position.update(size, price)
+                order.execute(
+                    order.data.datetime[0],
+                    size,
+                    price,
+                    closed,
+                    0.0,
+                    0.0,
+                    opened,
+                    0.0,
+                    fee,
+                    0.0,
+                    0.0,
+                    psize,
+                    pprice,
+                )
+                order.partial()
+            if snapshot["status"] == FILLED:
+                order.completed()
+            elif snapshot["status"] == CANCELED:
+                order.cancel()
+            elif snapshot["status"] == REJECTED:
+                order.reject(self)
+            if not order.alive():
+                del self.open_orders[snapshot["id"]]
+            self.notify(order)
+
+
+class SimStore:
+    def __init__(self, exchange):
+        self.exchange = exchange
+        self._broker = None
+        self._started = False
+
+    def start(self):
+        if not self._started:
+            self._started = True
+            self.exchange.start()
+
+    def getbroker(self):
+        if self._broker is None:
+            self._broker = SimBroker(self)
+        return self._broker
+
+    def getdata(self, timeframe_in_minutes=None, start_date=None, **kwargs):
+        """same signature as BinanceStore.getdata, the data is whatever the exchange replays"""
+        return SimData(store=self, **kwargs)
@@ -1,24 +1,169 @@
+"""
+Description: event bus between the data / backtest side and the panels
+
+``notify`` can be called from any thread at any rate. Messages are queued per topic and
+drained on the UI thread at most ``MAX_FPS`` times per second; messages of the same topic
+(and key) queued between two drains are coalesced, the last value wins or, for topics
+with a ``merge`` function, the values are merged. Observers can also ask for a minimum
+interval between two of their ``handle_data`` calls, the skipped values are coalesced
+and delivered later, so the last value is never lost.
+
+Copyright (c) 2023 by Charmve, All Rights Reserved.
+Licensed under the MIT License.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import wx
+
 from qbot.common.logging.logger import LOGGER as logger
 
+# payload_type: type checked in ``notify``, None for any
+# key: payload -> key, payloads with different keys are not coalesced, None for one key
+# merge: (old, new) -> payload, None to keep the new payload only
+Topic = namedtuple("Topic", ["name", "payload_type", "key", "merge"])
+
+
+def merge_dict(old, new):
+    merged = dict(old)
+    merged.update(new)
+    return merged
+
+
+class _Subscription:
+    def __init__(self, observer, min_interval):
+        self.observer = observer
+        self.min_interval = min_interval
+        self.last_call = float("-inf")
+        self.pending = OrderedDict()
+
+    def offer(self, key, data, merge):
+        if merge is not None and key in self.pending:
+            data = merge(self.pending[key], data)
+        self.pending[key] = data
+
+    def deliver(self, now, throttle=True):
+        """call the observer with its pending values, return the seconds to wait if throttled"""
+        if not self.pending:
+            return None
+        wait = self.last_call + self.min_interval - now
+        if throttle and wait > 0:
+            return wait
+        pending, self.pending = self.pending, OrderedDict()
+        self.last_call = now
+        for data in pending.values():
+            self.observer.handle_data(data)
+        return None
+
 
 class GlobalEvent:
     MSG_TYPE_SERIES = 1
+    MSG_TYPE_JOB = 2  # qbot.gui.job_runner.Job 的进度与结果
+    # xalpha.realtime.rtwatcher 的估值与策略提醒, 如
+    # watcher.subscribe(lambda e: GlobalEvent.notify(GlobalEvent.MSG_TYPE_FUND_ESTIMATE, e))
+    MSG_TYPE_FUND_ESTIMATE = 3
+
+    # max number of drains of the queue per second
+    MAX_FPS = 20
 
     def __init__(self):
         self.observers = {}
+        self.topics = {}
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_scheduled = False
+        self._last_flush = float("-inf")
 
-    def add_observer(self, msg_type, observer):
+        # 结果面板的数据, {"raw": df, "features": df, ...}, 合并为最新的各个键
+        self.register_topic(self.MSG_TYPE_SERIES, "series", dict, merge=merge_dict)
+        # 每个任务只保留最新的状态
+        self.register_topic(self.MSG_TYPE_JOB, "job", key=lambda job: job.id)
+        # 每个基金的估值和每个策略的提醒只保留最新的一条
+        self.register_topic(
+            self.MSG_TYPE_FUND_ESTIMATE,
+            "fund_estimate",
+            dict,
+            key=lambda event: (event["type"], event["code"], event.get("name")),
+        )
+
+    def register_topic(self, msg_type, name, payload_type=None, key=None, merge=None):
+        self.topics[msg_type] = Topic(name, payload_type, key, merge)
+
+    def add_observer(self, msg_type, observer, min_interval=0):
+        """
+        observer.handle_data(data) is called on the UI thread, at most once per
+        ``min_interval`` seconds and key of the topic
+        """
+        subscription = _Subscription(observer, min_interval)
         if msg_type in self.observers.keys():
-            self.observers[msg_type].append(observer)
+            self.observers[msg_type].append(subscription)
         else:
-            self.observers[msg_type] = [observer]
+            self.observers[msg_type] = [subscription]
+
+    def remove_observer(self, msg_type, observer):
+        self.observers[msg_type] = [
+            s for s in self.observers.get(msg_type, []) if s.observer is not observer
+        ]
 
     def notify(self, msg_type, data):
-        logger.info("[GlobalEvent] get a notify ...")
-        # print("data: ", data)
-        if msg_type in self.observers.keys():
-            for observer in self.observers[msg_type]:
-                observer.handle_data(data)
+        topic = self.topics.get(msg_type) or Topic(str(msg_type), None, None, None)
+        if topic.payload_type is not None and not isinstance(data, topic.payload_type):
+            raise TypeError(
+                f"[GlobalEvent] {topic.name} expects {topic.payload_type.__name__}, "
+                f"got {type(data).__name__}"
+            )
+        logger.debug(f"[GlobalEvent] get a notify of {topic.name}")
+        slot = (msg_type, None if topic.key is None else topic.key(data))
+        with self._lock:
+            if topic.merge is not None and slot in self._pending:
+                data = topic.merge(self._pending[slot], data)
+            self._pending[slot] = data
+
+        if wx.GetApp() is None:
+            # no event loop, eg. scripts and tests: deliver everything right away
+            self._flush(throttle=False)
+            return
+        with self._lock:
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        wx.CallAfter(self._schedule_flush)
+
+    def _schedule_flush(self, delay=0.0):
+        # UI thread
+        delay = max(delay, self._last_flush + 1.0 / self.MAX_FPS - time.monotonic())
+        if delay > 0:
+            wx.CallLater(int(delay * 1000) + 1, self._flush)
+        else:
+            self._flush()
+
+    def _flush(self, throttle=True):
+        with self._lock:
+            pending, self._pending = self._pending, OrderedDict()
+            self._flush_scheduled = False
+        now = time.monotonic()
+        self._last_flush = now
+
+        for (msg_type, key), data in pending.items():
+            merge = self.topics[msg_type].merge if msg_type in self.topics else None
+            for subscription in self.observers.get(msg_type, []):
+                subscription.offer(key, data, merge)
+
+        retry = None
+        for subscriptions in list(self.observers.values()):
+            for subscription in subscriptions:
+                wait = subscription.deliver(now, throttle)
+                if wait is not None:
+                    retry = wait if retry is None else min(retry, wait)
+
+        if retry is not None:
+            # throttled observers still hold values, drain again once they are due
+            with self._lock:
+                if self._flush_scheduled:
+                    return
+                self._flush_scheduled = True
+            self._schedule_flush(retry)
 
 
 GlobalEvent = GlobalEvent()
@@ -0,0 +1,219 @@
+"""
+Description: background jobs for the GUI
+
+Backtests, data loads and trading sessions run in a pool of worker threads instead of
+the wx event handlers. Progress, partial results and completion are sent back to the UI
+thread with ``wx.CallAfter`` and published on ``GlobalEvent`` as ``MSG_TYPE_JOB``.
+
+Copyright (c) 2023 by Charmve, All Rights Reserved.
+Licensed under the MIT License.
+"""
+import itertools
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import wx
+
+from qbot.common.logging.logger import LOGGER as logger
+from qbot.gui.global_event import GlobalEvent
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    # seconds between two progress updates sent to the UI
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, job_id, name, func, args, kwargs, on_progress, on_done):
+        self.id = job_id
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.status = self.PENDING
+        self.progress = 0.0
+        self.partial = None
+        self.result = None
+        self.error = None
+        self.future = None
+        self._cancel_event = threading.Event()
+        self._last_report = 0.0
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED, self.CANCELLED)
+
+    def cancel(self):
+        """cancel a pending job, or ask a running one to stop at its next ``check``/``report``"""
+        self._cancel_event.set()
+        if self.future is not None and self.future.cancel():
+            self.status = self.CANCELLED
+            _post(self.on_done, self)
+
+    def check(self):
+        """raise ``JobCancelled`` in the job function once the job is cancelled"""
+        if self.cancelled:
+            raise JobCancelled(self.name)
+
+    def wait(self, seconds):
+        """sleep ``seconds`` in the job function, raise ``JobCancelled`` as soon as the job is cancelled"""
+        self._cancel_event.wait(seconds)
+        self.check()
+
+    def loop(self, step, interval, *args, **kwargs):
+        """
+        call ``step(*args, **kwargs)`` every ``interval`` seconds until the job is cancelled,
+        for engines which only expose one round of work, eg. one trading pass
+        """
+        while True:
+            self.check()
+            step(*args, **kwargs)
+            self.wait(interval)
+
+    def report(self, progress=None, partial=None, force=False):
+        """
+        called by the job function with a progress in [0, 1] and optional partial results,
+        updates are rate limited to one per ``PROGRESS_INTERVAL`` unless ``force``
+        """
+        self.check()
+        if progress is not None:
+            self.progress = progress
+        if partial is not None:
+            self.partial = partial
+        now = time.monotonic()
+        if force or now - self._last_report >= self.PROGRESS_INTERVAL:
+            self._last_report = now
+            _post(self.on_progress, self)
+
+    def __repr__(self):
+        return f"Job({self.id}, {self.name}, {self.status}, {self.progress:.0%})"
+
+
+def _post(callback, job):
+    """run ``callback(job)`` on the UI thread and notify the observers"""
+    if callback is not None:
+        if wx.GetApp() is None:
+            callback(job)
+        else:
+            wx.CallAfter(callback, job)
+    GlobalEvent.notify(GlobalEvent.MSG_TYPE_JOB, job)
+
+
+class JobRunner:
+    """
+    run jobs in ``max_workers`` background threads, jobs submitted while all workers are
+    busy wait in the queue of the pool
+
+    the job function gets the ``Job`` as its ``job`` keyword argument, it reports progress
+    with ``job.report`` and returns early with ``JobCancelled`` when the job is cancelled
+    """
+
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="qbot-job"
+        )
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.jobs = {}  # unfinished jobs, removed once done or cancelled
+
+    def submit(self, func, *args, name=None, on_progress=None, on_done=None, **kwargs):
+        job = Job(
+            next(self._ids),
+            name or getattr(func, "__name__", "job"),
+            func,
+            args,
+            kwargs,
+            on_progress,
+            on_done,
+        )
+        with self._lock:
+            self.jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job)
+        job.future.add_done_callback(lambda _: self._forget(job.id))
+        logger.debug(f"[JobRunner] submit {job}")
+        return job
+
+    def _run(self, job):
+        if job.cancelled:
+            job.status = Job.CANCELLED
+            _post(job.on_done, job)
+            return
+        job.status = Job.RUNNING
+        _post(job.on_progress, job)
+        try:
+            job.result = job.func(*job.args, job=job, **job.kwargs)
+            job.progress = 1.0
+            job.status = Job.DONE
+        except JobCancelled:
+            job.status = Job.CANCELLED
+        except Exception as e:
+            job.error = e
+            job.status = Job.FAILED
+            logger.error(f"[JobRunner] {job} failed: {traceback.format_exc()}")
+        _post(job.on_done, job)
+
+    def _forget(self, job_id):
+        with self._lock:
+            self.jobs.pop(job_id, None)
+
+    def _jobs(self):
+        with self._lock:
+            return list(self.jobs.values())
+
+    def pending(self):
+        return [job for job in self._jobs() if job.status == Job.PENDING]
+
+    def running(self):
+        return [job for job in self._jobs() if job.status == Job.RUNNING]
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is not None:
+            job.cancel()
+
+    def cancel_all(self):
+        for job in self._jobs():
+            if not job.finished:
+                job.cancel()
+
+    def shutdown(self, wait=False):
+        self.cancel_all()
+        self._executor.shutdown(wait=wait)
+
+
+class CallAfterProxy:
+    """forward method calls of a wx object, eg. the log of a panel, to the UI thread"""
+
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def _call(*args, **kwargs):
+            wx.CallAfter(attr, *args, **kwargs)
+
+        return _call
+
+
+# shared by the panels of the main window
+job_runner = JobRunner()
@@ -4,16 +4,55 @@ Description:
 Copyright (c) 2023 by Charmve, All Rights Reserved. 
 Licensed under the MIT License.
 """
+import importlib
+import sys
+from pathlib import Path
+
+import pandas as pd
 import wx
 
 from qbot.common.file_utils import extract_content
 from qbot.common.logging.logger import LOGGER as logger
 from qbot.common.macros import strategy_choices
+from qbot.data.market_store import MarketStore
 from qbot.gui import gui_utils
 from qbot.gui.config import DATA_DIR_BKT_RESULT
 from qbot.gui.elements.def_dialog import MessageDialog
+from qbot.gui.global_event import GlobalEvent
+from qbot.gui.job_runner import Job, job_runner
 from qbot.gui.widgets.widget_web import WebPanel
 
+try:
+    import xalpha as xa
+except ImportError:
+    xa = None
+
+# 回测引擎的策略脚本之间是同目录导入, 加载前把目录加入 sys.path
+ENGINE_BKT_DIR = Path(__file__).resolve().parents[2].joinpath("engine", "backtest")
+# 策略名中的关键字: (模块, 策略类)
+BKT_STRATEGIES = {
+    "MACD": ("MACD", "MACDStrategy"),
+    "BOLL": ("BOLL", "BOLLStrategy"),
+    "CCI": ("CCI", "CCIStrategy"),
+    "RSI": ("RSI", "RSIStrategy"),
+}
+
+
+def _xalpha_code(code):
+    """399006.SZ -> SZ399006"""
+    if "." not in code:
+        return code
+    num, market = code.split(".", 1)
+    return market.upper() + num
+
+
+def _load_strategy(select_strategy):
+    key = next((k for k in BKT_STRATEGIES if k in (select_strategy or "").upper()), "RSI")
+    module, cls = BKT_STRATEGIES[key]
+    if str(ENGINE_BKT_DIR) not in sys.path:
+        sys.path.append(str(ENGINE_BKT_DIR))
+    return getattr(importlib.import_module(module), cls)
+
 
 
 def OnBkt(event):
@@ -29,7 +68,7 @@ class PanelBacktest(wx.Panel):
             "end_time": "20211231",
             "benchmark": "000300.SH",
             "code": "399006.SZ",
-            "select_strategy": ,
+            "select_strategy": "",
         }
 
         self.backtest_config = {
@@ -57,6 +96,9 @@ class PanelBacktest(wx.Panel):
         self.M1S3_length = int(self.M1_length * 0.6)
 
         self.BackWebPanel = WebPanel(self)
+        # 日线行情的本地缓存, 只下载缺少的区间
+        self.store = MarketStore()
+        self.bkt_jobs = []  # 排队或进行中的回测任务
 
         
         self.vbox_sizer_b = wx.BoxSizer(wx.VERTICAL)  # 
@@ -452,6 +494,10 @@ class PanelBacktest(wx.Panel):
         # self.start_back_but.Bind(wx.EVT_BUTTON, self._ev_start_run)  # 绑定按钮事件
         self.start_back_but.Bind(wx.EVT_BUTTON, self.StartBacktest)  # 绑定按钮事件
 
+        # 取消排队和进行中的回测
+        self.cancel_back_but = wx.Button(sub_panel, -1, "取消回测")
+        self.cancel_back_but.Bind(wx.EVT_BUTTON, self.CancelBacktest)
+
         # 交易日志
         self.trade_log_but = wx.Button(sub_panel, -1, "交易日志")
         # self.trade_log_but.Bind(wx.EVT_BUTTON, self._ev_trade_log)  # 绑定按钮事件
@@ -506,6 +552,12 @@ class PanelBacktest(wx.Panel):
             flag=wx.EXPAND | wx.ALL | wx.CENTER,
             border=5,
         )
+        back_para_sizer.Add(
+            self.cancel_back_but,
+            proportion=0,
+            flag=wx.EXPAND | wx.ALL | wx.CENTER,
+            border=5,
+        )
         back_para_sizer.Add(
             self.trade_log_but,
             proportion=0,
@@ -582,12 +634,97 @@ class PanelBacktest(wx.Panel):
         pass
 
     def StartBacktest(self, event):
-        MessageDialog(msg)
-        print(msg)
-        pass
+        # 回测在后台任务中执行, 多次点击的回测排队执行, 界面不阻塞
+        opts = dict(self.backtest_opts)
+        opts["select_strategy"] = self.stock_strategy_cbox.GetStringSelection()
+        job = job_runner.submit(
+            self._run_backtest,
+            opts,
+            name=f"回测{opts['code']}",
+            on_progress=self._on_backtest_progress,
+            on_done=self._on_backtest_done,
+        )
+        self.bkt_jobs.append(job)
+        logger.info(f"回测任务 {job.id}: {opts}")
+
+    def CancelBacktest(self, event):
+        for job in self.bkt_jobs:
+            job.cancel()
 
     def LoadData(self, event):
-        msg = "请联系微信：Yida_Zhang2 开通功能"
-        MessageDialog(msg)
-        print(msg)
-        pass
+        opts = dict(self.backtest_opts)
+        job_runner.submit(
+            self._run_load_data,
+            opts,
+            name=f"加载行情{opts['code']}",
+            on_done=self._on_load_done,
+        )
+        self.load_data_but.SetLabel("加载中...")
+
+    def _load_bars(self, opts, job):
+        """日线行情, 下载每个区间前检查任务是否取消"""
+        code = opts["code"]
+
+        def fetch(start, end):
+            job.check()
+            if xa is None:
+                raise ImportError("xalpha is required to load the daily bars")
+            df = xa.get_daily(
+                _xalpha_code(code),
+                start=start.strftime("%Y%m%d"),
+                end=(end - pd.Timedelta(days=1)).strftime("%Y%m%d"),
+            )
+            return df.set_index("date")
+
+        end = pd.Timestamp(opts["end_time"]) + pd.Timedelta(days=1)
+        return self.store.ohlcv("xalpha", code, "1d", opts["start_time"], end, fetch)
+
+    def _run_load_data(self, opts, job):
+        bars = self._load_bars(opts, job)
+        GlobalEvent.notify(
+            GlobalEvent.MSG_TYPE_SERIES, {"raw": bars.rename_axis("date").reset_index()}
+        )
+        return bars
+
+    def _run_backtest(self, opts, job):
+        bars = self._load_bars(opts, job)
+        job.report(0.5, partial={"raw": bars})
+        strategy = _load_strategy(opts["select_strategy"])(
+            opts["code"], bars, days=max(len(bars) - 2, 0)
+        )
+        strategy.process()
+        job.report(0.8)
+        df = strategy.output_earning_rate()
+        result = {
+            "raw": bars.rename_axis("date").reset_index(),
+            "plot": df[["strategy", "base"]],
+        }
+        try:
+            result["metrics"] = strategy.metrics()
+        except ImportError as e:
+            logger.warning(f"回测指标: {e}")
+        job.check()
+        GlobalEvent.notify(GlobalEvent.MSG_TYPE_SERIES, result)
+        return result
+
+    def _on_backtest_progress(self, job):
+        running = [j for j in self.bkt_jobs if j.status == Job.RUNNING]
+        if running:
+            self.start_back_but.SetLabel(
+                f"回测中 {running[0].progress:.0%} (排队 {len(self.bkt_jobs) - 1})"
+            )
+
+    def _on_backtest_done(self, job):
+        if job in self.bkt_jobs:
+            self.bkt_jobs.remove(job)
+        if job.status == Job.FAILED:
+            MessageDialog(f"回测失败: {job.error}")
+        elif job.status == Job.CANCELLED:
+            logger.info(f"回测任务 {job.id} 已取消")
+        if not self.bkt_jobs:
+            self.start_back_but.SetLabel("开始回测")
+
+    def _on_load_done(self, job):
+        self.load_data_but.SetLabel("加载行情数据")
+        if job.status == Job.FAILED:
+            MessageDialog(f"加载行情失败: {job.error}")
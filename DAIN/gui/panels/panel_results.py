@@ -17,7 +17,8 @@ import wx
 
 from qbot.common.logging.logger import LOGGER as logger
 from qbot.gui.widgets.widget_web import WebPanel
-from qbot.gui.widgets.widgets import MatplotlibPanel, PandasGrid
+from qbot.gui.widgets.widget_pandas_grid import PandasGrid
+from qbot.gui.widgets.widgets import MatplotlibPanel
 
 
 class ResultsPanel(wx.Panel):
@@ -42,6 +43,12 @@ class ResultsPanel(wx.Panel):
         if "ratio" in data_dict.keys():
             self.pd.show_df(data_dict["ratio"])
 
+        if "metrics" in data_dict.keys():
+            metrics = data_dict["metrics"]
+            # 指标为行, 策略为列
+            metrics = metrics.to_frame("value") if metrics.ndim == 1 else metrics.T
+            self.pd_metrics.show_df(metrics.rename_axis("metric").reset_index())
+
         if "corr" in data_dict.keys():
             # print("corr: ", corr)
             self.pd_corr.show_df(data_dict["corr"])
@@ -81,6 +88,7 @@ class ResultsPanel(wx.Panel):
 
         panel_tab = wx.Panel(self.tabs)
         panel_yearly = wx.Panel(self.tabs)
+        panel_metrics = wx.Panel(self.tabs)
         panel_corr = wx.Panel(self.tabs)
         panel_plot = wx.Panel(self.tabs)
         panel_kline_plot = wx.Panel(self.tabs)
@@ -93,19 +101,24 @@ class ResultsPanel(wx.Panel):
 
         self.tabs.AddPage(panel_plot, "序列绘图")
         self.tabs.AddPage(panel_tab, "风险收益")
+        self.tabs.AddPage(panel_metrics, "策略指标")
         self.tabs.AddPage(panel_yearly, "年度收益")
         self.tabs.AddPage(panel_corr, "相关性分析")
 
         self.pd = PandasGrid(panel_tab, nrow=30, ncol=20)
         self.pd_yearly = PandasGrid(panel_yearly, nrow=30, ncol=20)
+        self.pd_metrics = PandasGrid(panel_metrics, nrow=30, ncol=20)
 
         vbox_panel = wx.BoxSizer(wx.VERTICAL)
         vbox_panel.Add(self.pd, 1, wx.EXPAND)
 
         vbox_yearly = wx.BoxSizer(wx.VERTICAL)
         vbox_yearly.Add(self.pd_yearly, 1, wx.EXPAND)
+        vbox_metrics = wx.BoxSizer(wx.VERTICAL)
+        vbox_metrics.Add(self.pd_metrics, 1, wx.EXPAND)
         panel_tab.SetSizer(vbox_panel)
         panel_yearly.SetSizer(vbox_yearly)
+        panel_metrics.SetSizer(vbox_metrics)
 
         self.init_corr(panel_corr)
         self.init_plot(panel_plot)
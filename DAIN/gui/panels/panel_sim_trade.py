@@ -27,6 +27,7 @@ from qbot.gui.common.PrintLog import SysLogIf
 from qbot.gui.elements.def_dialog import MessageDialog, UserDialog
 from qbot.gui.elements.def_grid import GridTable
 from qbot.gui.elements.def_treelist import CollegeTreeListCtrl
+from qbot.gui.job_runner import CallAfterProxy, Job, job_runner
 from qbot.gui.widgets.widget_web import WebPanel
 
 # from qbot.strategy.strategy_gath.StrategyGath import Base_Strategy_Group
@@ -37,12 +38,15 @@ plt.rcParams["axes.unicode_minus"] = False  # 用来正常显示负号
 
 
 class SimTradePanel(wx.Panel):
+    TRADE_INTERVAL = 60  # 两轮交易之间的秒数
+
     def __init__(
         self, parent=None, trader_opts={}, displaySize=(1600, 900), Fun_SwFrame=None
     ):
         super(SimTradePanel, self).__init__(parent)
 
         self.ClickNum = 0  # OnClickTrade
+        self.trade_job = None  # 后台交易任务
 
         # trade_class = ("虚拟盘")
         # trade_type = ("股票")
@@ -85,26 +89,7 @@ class SimTradePanel(wx.Panel):
         self.multi_facts_config = "ROC(20)动量信号周频Top1"
         self.multi_facts_list = list()
         self.init_ui()
-    def __init__(self, parent, id=-1):
-        super(MatplotlibPanel, self).__init__(parent, id)
-        self.TopBoxSizer = wx.BoxSizer(wx.VERTICAL)
-        self.SetSizer(self.TopBoxSizer)
-
-        self.btn_bkt = wx.Button(self, label="", pos=(100, 10))
-
-        self.figure = matplotlib.figure.Figure(figsize=(4, 3))
-        self.figure = plt.figure(figsize=(4, 3))
-        self.canvas = FigureCanvas(self, -1, self.figure)
-        self.TopBoxSizer.Add(
-            self.canvas, proportion=-10, border=2, flag=wx.ALL | wx.EXPAND
-        )
- def output_earning_rate(self):
-        df = self.bars[-self.days :]
-        df["signals"] = self.signals
-        df["strategy"] = (1 + df.close.pct_change(1).fillna(0) * self.signals).cumprod()
-        df["base"] = df["close"] / df["close"][0]
-        print(df["strategy"].values[-1:])
-        return df
+
     def init_ui(self):
 
         # 添加参数布局
@@ -441,18 +426,19 @@ class SimTradePanel(wx.Panel):
 
         # MessageDialog("请联系微信：Yida_Zhang2")
 
-        self.start_trade_butt.SetLabel("暂停交易")
-        self.ClickNum += 1
-        if self.ClickNum % 2 == 1:
-            self.start_trade_butt.SetLabel("开始交易")
-            self.syslog.re_print("开始虚拟盘交易...\n")
-        else:
-            self.start_trade_butt.SetLabel("暂停交易")
-            self.ClickNum = 0
-            logger.info(self.start_trade_butt.GetLabel())
-            self.syslog.re_print("暂停虚拟盘交易...\n")
+        if self.trade_job is not None and not self.trade_job.finished:
+            # 交易任务未结束前不能再次开始, 避免两个交易任务重复下单
+            if self.trade_job.cancelled:
+                self.syslog.re_print("虚拟盘交易正在停止, 请稍候...\n")
+            else:
+                self.syslog.re_print("暂停虚拟盘交易...\n")
+                self.trade_job.cancel()
             return
 
+        self.start_trade_butt.SetLabel("暂停交易")
+        logger.info(self.start_trade_butt.GetLabel())
+        self.syslog.re_print("开始虚拟盘交易...\n")
+
         sim_trade_opts = {
             "class": "虚拟盘",
             "platform": "东方财富",
@@ -463,12 +449,33 @@ class SimTradePanel(wx.Panel):
         # logger.info(self.trader_opts)
 
         # ######## 开始虚拟盘交易 #########
-        self.trade_engine = TradeEngine(self.trader_opts, self.syslog)
+        # 登录、查询持仓和交易在后台线程中执行, 不阻塞界面
+        self.trade_job = job_runner.submit(
+            self._run_trade,
+            dict(self.trader_opts),
+            name=f"{self.trader_class}交易",
+            on_done=self._on_trade_done,
+        )
+
+    def _run_trade(self, trader_opts, job):
+        # 后台线程中只能通过 wx.CallAfter 更新日志框
+        self.trade_engine = TradeEngine(trader_opts, CallAfterProxy(self.syslog))
         self.trade_engine.login()
+        job.report(1 / 3)
         self.trade_engine.get_positions()
-        self.trade_engine.start_trade()
+        job.report(2 / 3)
+        # 每轮交易之间检查任务是否取消, 暂停后任务在本轮交易结束时停止
+        job.loop(self.trade_engine.start_trade, self.TRADE_INTERVAL)
         # self.trade_engine.close()
 
+    def _on_trade_done(self, job):
+        if job.status == Job.FAILED:
+            self.syslog.re_print(f"虚拟盘交易失败: {job.error}\n")
+        elif job.status == Job.CANCELLED:
+            self.syslog.re_print("虚拟盘交易已停止\n")
+        if job is self.trade_job:
+            self.start_trade_butt.SetLabel("开始交易")
+
     def show_trade_boardview(self):
         print(
             "$$$$$$$$$$$$\n####",
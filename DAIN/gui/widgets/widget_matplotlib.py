@@ -1,11 +1,22 @@
 import matplotlib
+import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
 import wx
 from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
 
+try:
+    from xalpha.downsample import POINTS_PER_PIXEL, lttb_indices
+except ImportError:
+    lttb_indices = None
+
 
 class MatplotlibPanel(wx.ScrolledWindow):
-    def __init__(self, parent, id=-1):
+    # 回测结果默认绘制的列, 缺少时绘制全部数值列
+    DEFAULT_COLUMNS = ["strategy", "base", "signals"]
+
+    def __init__(self, parent, id=-1, exact=False):
         super(MatplotlibPanel, self).__init__(parent, id)
         self.TopBoxSizer = wx.BoxSizer(wx.VERTICAL)
         self.SetSizer(self.TopBoxSizer)
@@ -18,37 +29,68 @@ class MatplotlibPanel(wx.ScrolledWindow):
         self.TopBoxSizer.Add(
             self.canvas, proportion=-10, border=2, flag=wx.ALL | wx.EXPAND
         )
- def output_earning_rate(self):
-        df = self.bars[-self.days :]
-        df["signals"] = self.signals
-        df["strategy"] = (1 + df.close.pct_change(1).fillna(0) * self.signals).cumprod()
-        df["base"] = df["close"] / df["close"][0]
-        print(df["strategy"].values[-1:])
-        return df
-
-    def show_plt(self):
-        df = self.output_earning_rate()
-        fig, axes = plt.subplots(2, 1, sharex=True, figsize=(18, 12))
-        df[["strategy", "base", "signals"]].plot(
-            ax=axes[0], grid=True, title="收益", figsize=(20, 10)
-        )
-        self.show_score(df, axes[1])
-        plt.show()
 
-    def show_score(self, df, ax):
-        df["score"] = self.get_scores(df)
-        df.score.plot(ax=ax, grid=True, title="score", figsize=(20, 10))
+        # exact: 绘制全部数据点, 否则按可见区域的像素宽度用 LTTB 降采样
+        self.exact = exact or lttb_indices is None
+        self.x = None
+        self.lines = {}
+        self.ax = None
 
-    def process(self):
-        position = 0
-        for i in range(self.days):
+    def show_data(self, data, columns=None):
+        if isinstance(data, pd.Series):
+            data = data.to_frame()
+        if columns is None:
+            columns = [c for c in self.DEFAULT_COLUMNS if c in data.columns]
+        if not columns:
+            columns = [c for c in data.columns if pd.api.types.is_numeric_dtype(data[c])]
 
-            singal = self.get_singal(self.bars[: -self.days + i - 1])
-            if singal == -1:
+        if isinstance(data.index, pd.DatetimeIndex):
+            self.x = mdates.date2num(data.index.to_pydatetime())
+        else:
+            self.x = np.arange(len(data), dtype=float)
 
-                self.signals.append(position)
+        self.figure.clf()
+        self.ax = self.figure.add_subplot(111)
+        self.lines = {}
+        for c in columns:
+            y = data[c].to_numpy(dtype=float)
+            (line,) = self.ax.plot([], [], label=str(c))
+            self.lines[c] = (line, y)
+        if isinstance(data.index, pd.DatetimeIndex):
+            self.ax.xaxis_date()
+        self.ax.grid(True)
+        self.ax.legend(loc="upper left")
+
+        if len(self.x):
+            self.ax.set_xlim(self.x[0], self.x[-1])
+            values = np.concatenate([y for _, y in self.lines.values()])
+            values = values[np.isfinite(values)]
+            if len(values):
+                pad = (values.max() - values.min()) * 0.05 or 1
+                self.ax.set_ylim(values.min() - pad, values.max() + pad)
+        self._update_lines()
+        self.ax.callbacks.connect("xlim_changed", self._on_xlim_changed)
+        self.canvas.draw_idle()
+
+    def _on_xlim_changed(self, ax):
+        # 缩放或平移后按新的可见区域重新降采样
+        self._update_lines()
+        self.canvas.draw_idle()
+
+    def _update_lines(self):
+        if self.ax is None or self.x is None:
+            return
+        lo, hi = self.ax.get_xlim()
+        start = max(np.searchsorted(self.x, lo, side="left") - 1, 0)
+        end = min(np.searchsorted(self.x, hi, side="right") + 1, len(self.x))
+        x = self.x[start:end]
+        n_out = int(max(self.ax.bbox.width, 100) * POINTS_PER_PIXEL) if not self.exact else 0
+        for line, y in self.lines.values():
+            if self.exact or len(x) <= n_out:
+                line.set_data(x, y[start:end])
             else:
-                position = singal
-                self.signals.append(singal)
+                idx = lttb_indices(x, y[start:end], n_out)
+                line.set_data(x[idx], y[start:end][idx])
+
     def show(self):
         plt.show()
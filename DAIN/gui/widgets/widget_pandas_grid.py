@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import wx.grid as gridlib
+
+
+def _formatter(values, precision):
+    kind = values.dtype.kind
+    if kind == "f":
+        return lambda v: "" if v != v else f"{v:.{precision}f}"
+    if kind == "M":
+        return lambda v: "" if np.isnat(v) else np.datetime_as_string(v, unit="s")
+    return lambda v: "" if v is None else str(v)
+
+
+class DataFrameTable(gridlib.GridTableBase):
+    """
+    read only grid table over the column arrays of a DataFrame, cells are formatted only
+    when the grid draws them, sorting and filtering permute the row order
+    """
+
+    def __init__(self, df=None, precision=4):
+        super(DataFrameTable, self).__init__()
+        self.precision = precision
+        self.set_df(pd.DataFrame() if df is None else df)
+
+    def set_df(self, df):
+        self.df = df
+        self.columns = [str(c) for c in df.columns]
+        self.values = [df.iloc[:, i].to_numpy() for i in range(df.shape[1])]
+        self.formats = [_formatter(v, self.precision) for v in self.values]
+        self.index = df.index.to_numpy()
+        self.index_format = _formatter(self.index, self.precision)
+        self.order = np.arange(len(df))
+
+    def GetNumberRows(self):
+        return len(self.order)
+
+    def GetNumberCols(self):
+        return len(self.columns)
+
+    def GetValue(self, row, col):
+        return self.formats[col](self.values[col][self.order[row]])
+
+    def SetValue(self, row, col, value):
+        pass
+
+    def IsEmptyCell(self, row, col):
+        return False
+
+    def GetColLabelValue(self, col):
+        return self.columns[col]
+
+    def GetRowLabelValue(self, row):
+        return self.index_format(self.index[self.order[row]])
+
+    def sort(self, col, ascending=True):
+        values = pd.Series(self.values[col][self.order])
+        positions = values.sort_values(
+            ascending=ascending, kind="stable", na_position="last"
+        ).index.to_numpy()
+        self.order = self.order[positions]
+
+    def filter(self, mask=None):
+        """
+        keep the rows where ``mask`` is True, ``mask`` is a boolean array or a
+        ``DataFrame.eval`` expression, None shows all the rows
+        """
+        if mask is None:
+            self.order = np.arange(len(self.df))
+            return
+        if isinstance(mask, str):
+            mask = self.df.eval(mask)
+        self.order = np.flatnonzero(np.asarray(mask, dtype=bool))
+
+
+class PandasGrid(gridlib.Grid):
+    def __init__(self, parent, nrow=0, ncol=0, precision=4):
+        # nrow / ncol: kept for the callers, the virtual table sizes itself to the data
+        super(PandasGrid, self).__init__(parent, -1)
+        self.table = DataFrameTable(precision=precision)
+        self.SetTable(self.table, True)
+        self.EnableEditing(False)
+        self.sort_col = None
+        self.sort_ascending = True
+        self.Bind(gridlib.EVT_GRID_LABEL_LEFT_CLICK, self._on_label_click)
+
+    def show_df(self, df):
+        self._update(lambda: self.table.set_df(df))
+        self.sort_col = None
+        self.UnsetSortingColumn()
+
+    def filter(self, mask=None):
+        self._update(lambda: self.table.filter(mask))
+        if self.sort_col is not None:
+            self.sort(self.sort_col, self.sort_ascending)
+
+    def sort(self, col, ascending=True):
+        self.table.sort(col, ascending)
+        self.sort_col, self.sort_ascending = col, ascending
+        self.SetSortingColumn(col, ascending)
+        self.ForceRefresh()
+
+    def _on_label_click(self, event):
+        col = event.GetCol()
+        if col < 0 or event.GetRow() >= 0:
+            event.Skip()
+            return
+        ascending = not self.sort_ascending if col == self.sort_col else True
+        self.sort(col, ascending)
+
+    def _update(self, change):
+        rows, cols = self.table.GetNumberRows(), self.table.GetNumberCols()
+        change()
+        self.BeginBatch()
+        for before, after, deleted, appended in [
+            (
+                rows,
+                self.table.GetNumberRows(),
+                gridlib.GRIDTABLE_NOTIFY_ROWS_DELETED,
+                gridlib.GRIDTABLE_NOTIFY_ROWS_APPENDED,
+            ),
+            (
+                cols,
+                self.table.GetNumberCols(),
+                gridlib.GRIDTABLE_NOTIFY_COLS_DELETED,
+                gridlib.GRIDTABLE_NOTIFY_COLS_APPENDED,
+            ),
+        ]:
+            if after < before:
+                msg = gridlib.GridTableMessage(self.table, deleted, after, before - after)
+                self.ProcessTableMessage(msg)
+            elif after > before:
+                msg = gridlib.GridTableMessage(self.table, appended, after - before)
+                self.ProcessTableMessage(msg)
+        self.EndBatch()
+        self.ForceRefresh()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+import time benchmark for xalpha
+
+``import xalpha`` only sets up lazy attributes, the submodules and their heavy
+dependencies (pandas, scipy, pyecharts, bs4, sqlalchemy) are imported on first use.
+The budget below is the wall time of ``import xalpha`` on top of a bare interpreter
+start, it is checked by running this script::
+
+    python benchmarks/bench_import.py
+
+which exits with non-zero status when the budget is exceeded or some heavy
+dependency is imported eagerly again.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+# seconds, ``import xalpha`` on top of interpreter startup
+IMPORT_BUDGET = 0.05
+
+# modules which must not be loaded by a bare ``import xalpha``
+DEFERRED = ["pandas", "scipy", "pyecharts", "bs4", "lxml", "sqlalchemy", "requests"]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(code):
+    t = time.perf_counter()
+    r = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    )
+    return time.perf_counter() - t, r.stdout
+
+
+def import_time(repeat=7):
+    """
+    best of ``repeat`` subprocess runs, minus the interpreter startup
+
+    :return: float, seconds
+    """
+    bare = min(_run("pass")[0] for _ in range(repeat))
+    full = min(_run("import xalpha")[0] for _ in range(repeat))
+    return max(full - bare, 0.0)
+
+
+def eager_modules():
+    """
+    :return: List[str], the heavy dependencies loaded by a bare ``import xalpha``
+    """
+    _, out = _run(
+        "import sys, xalpha; print(' '.join(m for m in %r if m in sys.modules))"
+        % DEFERRED
+    )
+    return out.split()
+
+
+def main():
+    t = import_time()
+    eager = eager_modules()
+    print("import xalpha: %.1f ms (budget %.1f ms)" % (t * 1e3, IMPORT_BUDGET * 1e3))
+    if eager:
+        print("eagerly imported: %s" % ", ".join(eager))
+    return int(t > IMPORT_BUDGET or bool(eager))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+offline benchmarks for the xalpha hot paths on synthetic data
+
+.. code-block:: bash
+
+    python benchmarks/bench_xalpha.py                      # 1y-10f and 10y-10f scales
+    python benchmarks/bench_xalpha.py --scale all -k trade  # every scale, scenarios matching "trade"
+    python benchmarks/bench_xalpha.py --compare benchmarks/results/old.json
+
+Each scenario reports the best and median wall time over ``--repeat`` runs and the
+peak memory traced by ``tracemalloc`` in a separate run. Scenarios import the modules they
+time themselves, those whose modules fail to import are reported as skipped. Results are written as json
+into ``benchmarks/results``, ``--compare`` flags scenarios slower than ``--threshold``
+times the given baseline and exits with non-zero status.
+"""
+
+import argparse
+import datetime as dt
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import pandas as pd
+
+import xalpha as xa
+import xalpha.remain as rm
+
+from synthetic import (
+    install_calendar,
+    synthetic_calendar,
+    synthetic_funds,
+    synthetic_status,
+)
+
+# name: (years, number of funds)
+SCALES = {
+    "1y-10f": (1, 10),
+    "10y-10f": (10, 10),
+    "1y-1000f": (1, 1000),
+    "10y-1000f": (10, 1000),
+}
+DEFAULT_SCALES = ["1y-10f", "10y-10f"]
+
+_scenarios = []
+
+
+def scenario(max_funds=None):
+    """
+    register a benchmark scenario
+
+    :param max_funds: Optional[int]. cap on the number of funds used from the scale,
+        for scenarios whose cost per fund is too large for the biggest scales
+    """
+
+    def wrapper(f):
+        _scenarios.append((f.__name__, f, max_funds))
+        return f
+
+    return wrapper
+
+
+class Universe:
+    """
+    synthetic calendar, funds and status table for one scale
+    """
+
+    def __init__(self, years, nfunds, seed=0):
+        self.years = years
+        self.nfunds = nfunds
+        self.dates = synthetic_calendar(years, seed=seed)
+        install_calendar(self.dates)
+        self.funds = synthetic_funds(nfunds, self.dates, seed=seed)
+        self.codes = [f.code for f in self.funds]
+        self.status = synthetic_status(self.codes, self.dates, seed=seed)
+        self._trades = None
+
+    @property
+    def trades(self):
+        if self._trades is None:
+            from xalpha.trade import trade
+
+            self._trades = [trade(f, self.status) for f in self.funds]
+        return self._trades
+
+
+@scenario()
+def trade_construction(u, n):
+    """
+    ``trade`` construction from status table, including dividends and splits
+    """
+    from xalpha.trade import trade
+
+    funds = u.funds[:n]
+    return lambda: [trade(f, u.status) for f in funds]
+
+
+@scenario(max_funds=100)
+def remain_sell(u, n):
+    """
+    ``remain.sell`` FIFO on long rem lists, one buy per open day
+    """
+    rems = []
+    for f in u.funds[:n]:
+        rem = []
+        for d in f.price["date"]:
+            rem = rm.buy(rem, 100, d)
+        rems.append(rem)
+    last = u.dates[-1]
+    return lambda: [rm.sell(rem, 100 * len(rem) / 2, last) for rem in rems]
+
+
+@scenario(max_funds=10)
+def indicator_max_drawdown(u, n):
+    funds = u.funds[:n]
+    return lambda: [f.max_drawdown() for f in funds]
+
+
+@scenario()
+def indicator_rsi(u, n):
+    funds = u.funds[:n]
+    return lambda: [f.rsi(14) for f in funds]
+
+
+@scenario()
+def policy_status(u, n):
+    """
+    status generation of a weekly ``scheduled`` policy
+    """
+    from xalpha.policy import scheduled
+
+    funds = u.funds[:n]
+    times = pd.date_range(u.dates[0], u.dates[-1], freq="W-MON")
+    return lambda: [scheduled(f, 1000, times) for f in funds]
+
+
+@scenario(max_funds=10)
+def bte_backtest(u, n):
+    """
+    ``BTE.backtest`` with monthly purchases of each fund
+    """
+    from xalpha.backtest import Scheduled
+
+    infos = {"F" + f.code: f for f in u.funds[:n]}
+    date_range = pd.date_range(u.dates[0], u.dates[-1], freq="MS")
+
+    class MultiScheduled(Scheduled):
+        def prepare(self):
+            self.infos.update(infos)
+            self.date_range = date_range
+
+        def run(self, date):
+            if date in self.date_range:
+                for code in infos:
+                    self.buy(code, 1000, date)
+
+    return lambda: MultiScheduled(start=u.dates[0], end=u.dates[-1]).backtest()
+
+
+@scenario()
+def xirr(u, n):
+    from xalpha.trade import xirrcal
+
+    trades = u.trades[:n]
+    date = u.dates[-1]
+    return lambda: [xirrcal(t.cftable, [t], date) for t in trades]
+
+
+@scenario()
+def cachedio_hit(u, n):
+    """
+    ``cachedio`` lookups fully served by the memory backend
+    """
+    import xalpha.universal as xu
+
+    tables = {f.code: f.price.rename(columns={"netvalue": "close"}) for f in u.funds}
+
+    def fetch(code, start=None, end=None, **kws):
+        return tables[code]
+
+    get = xu.cachedio(backend="memory", prefix="bench-")(fetch)
+    start = u.dates[0].strftime("%Y%m%d")
+    end = u.dates[-1].strftime("%Y%m%d")
+    mid = u.dates[len(u.dates) // 2].strftime("%Y%m%d")
+    codes = u.codes[:n]
+    for code in codes:
+        get(code, start=start, end=end)
+    return lambda: [get(code, start=mid, end=end) for code in codes]
+
+
+def measure(f, repeat):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        t = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - t)
+    gc.collect()
+    tracemalloc.start()
+    f()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return times, peak
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=HERE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales, keyword=None, repeat=3):
+    results = []
+    for scale in scales:
+        years, nfunds = SCALES[scale]
+        u = Universe(years, nfunds)
+        for name, setup, max_funds in _scenarios:
+            if keyword and keyword not in name:
+                continue
+            n = nfunds if max_funds is None else min(nfunds, max_funds)
+            try:
+                f = setup(u, n)
+            except ImportError as e:
+                print("%-24s %-10s skipped: %s" % (name, scale, e))
+                continue
+            times, peak = measure(f, repeat)
+            r = {
+                "scenario": name,
+                "scale": scale,
+                "years": years,
+                "funds": n,
+                "best": min(times),
+                "median": statistics.median(times),
+                "repeat": repeat,
+                "peak_memory": peak,
+            }
+            print(
+                "%-24s %-10s %5d funds  best %9.4fs  median %9.4fs  peak %8.1f MB"
+                % (name, scale, n, r["best"], r["median"], peak / 2 ** 20)
+            )
+            results.append(r)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    :return: List[str], descriptions of the scenarios slower than ``threshold`` times the baseline
+    """
+    base = {(r["scenario"], r["scale"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        b = base.get((r["scenario"], r["scale"]))
+        if b is None or b["best"] <= 0:
+            continue
+        ratio = r["best"] / b["best"]
+        if ratio > threshold:
+            regressions.append(
+                "%s [%s]: %.4fs -> %.4fs (x%.2f)"
+                % (r["scenario"], r["scale"], b["best"], r["best"], ratio)
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument(
+        "--scale",
+        nargs="+",
+        default=DEFAULT_SCALES,
+        help="scales to run, any of %s or all" % ", ".join(SCALES),
+    )
+    parser.add_argument("-k", dest="keyword", help="only scenarios containing this")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=os.path.join(HERE, "results"))
+    parser.add_argument("--compare", help="json result file as the baseline")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args(argv)
+    scales = list(SCALES) if args.scale == ["all"] else args.scale
+
+    results = run(scales, keyword=args.keyword, repeat=args.repeat)
+    now = dt.datetime.now()
+    report = {
+        "version": xa.__version__,
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "time": now.isoformat(timespec="seconds"),
+        "results": results,
+    }
+    os.makedirs(args.output, exist_ok=True)
+    fname = os.path.join(
+        args.output,
+        "xalpha-%s-%s.json" % (xa.__version__, now.strftime("%Y%m%d%H%M%S")),
+    )
+    with open(fname, "w") as f:
+        json.dump(report, f, indent=2)
+    print("results saved in %s" % fname)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print("regression: " + line)
+        return int(bool(regressions))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
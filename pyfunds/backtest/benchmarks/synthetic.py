@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+synthetic data generators for offline benchmarks: trade calendars, fund nav tables
+with dividends and splits, and status tables, all reproducible from a seed
+"""
+
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+
+import xalpha.cons as xc
+from xalpha.info import fundinfo
+
+
+def synthetic_calendar(years=1, end=None, holidays=10, seed=0):
+    """
+    weekdays ending at ``end`` with some random holidays removed per year
+
+    :param years: int or float, length of the calendar
+    :param end: Optional[datetime], default yesterday
+    :param holidays: int, number of weekdays closed per year
+    :param seed: int.
+    :return: pd.DatetimeIndex of open dates
+    """
+    if end is None:
+        end = xc.yesterdayobj().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = end - dt.timedelta(days=int(365 * years))
+    days = pd.bdate_range(start, end)
+    rng = np.random.default_rng(seed)
+    n = min(int(holidays * years), len(days) // 10)
+    closed = rng.choice(len(days) - 1, size=n, replace=False)
+    # never close the last day so that the table always reaches ``end``
+    return days.delete(closed)
+
+
+def install_calendar(dates):
+    """
+    use ``dates`` as the trade calendar of xalpha, so that synthetic tables beyond
+    the range of caldate.csv are treated as trading days
+
+    :param dates: pd.DatetimeIndex of open dates
+    :return: None
+    """
+    alldays = pd.date_range(dates[0], dates[-1])
+    dstrs = set(dates.strftime("%Y-%m-%d"))
+    caldate = pd.DataFrame(
+        {
+            "cal_date": alldays.strftime("%Y-%m-%d"),
+            "is_open": [int(d in dstrs) for d in alldays.strftime("%Y-%m-%d")],
+        }
+    )
+    opendate = list(caldate[caldate["is_open"] == 1]["cal_date"])
+    calendar = (caldate, opendate, set(opendate))
+    xc._calendar = lambda: calendar
+    xc.caldate, xc.opendate, xc.opendate_set = calendar
+
+
+def synthetic_nav(dates, dividends=2, splits=1, vol=0.015, drift=0.0003, seed=0):
+    """
+    geometric random walk nav table in the format of ``fundinfo.price``,
+    dividends are positive cash per share and splits negative ratios in ``comment``
+
+    :param dates: pd.DatetimeIndex of open dates
+    :param dividends: int, number of dividends per year
+    :param splits: int, number of splits over the whole table
+    :param vol: float, daily volatility
+    :param drift: float, daily drift
+    :param seed: int.
+    :return: pd.DataFrame with date, netvalue, totvalue and comment columns
+    """
+    rng = np.random.default_rng(seed)
+    n = len(dates)
+    ret = rng.normal(drift, vol, size=n)
+    ret[0] = 0
+    totvalue = np.round(np.cumprod(1 + ret), 4)
+    netvalue = totvalue.copy()
+    comment = np.zeros(n)
+    years = max(1, int(round(n / 245)))
+    idx = rng.permutation(np.arange(1, n))
+    ndiv = min(dividends * years, n - 1)
+    split_idx = set(idx[ndiv : ndiv + splits])
+    for i in sorted(idx[: ndiv + splits]):
+        if i in split_idx:
+            ratio = float(rng.choice([1.5, 2.0]))
+            netvalue[i:] = netvalue[i:] / ratio
+            comment[i] = -ratio
+        else:
+            cash = round(float(netvalue[i]) * 0.02, 3)
+            netvalue[i:] = netvalue[i:] - cash
+            comment[i] = cash
+    return pd.DataFrame(
+        {
+            "date": dates,
+            "netvalue": np.round(netvalue, 4),
+            "totvalue": totvalue,
+            "comment": comment,
+        }
+    )
+
+
+class SyntheticFundInfo(fundinfo):
+    """
+    fundinfo built from a given nav table instead of the network
+
+    :param code: str, six digits
+    :param price: pd.DataFrame, from :func:`synthetic_nav`
+    :param rate: float, purchase fee in percent
+    """
+
+    def __init__(self, code, price, rate=0.15):
+        self._synthetic = price
+        self._synthetic_rate = rate
+        super().__init__(code)
+
+    def _basic_init(self):
+        self.name = "synthetic " + self.code
+        self.rate = self._synthetic_rate
+        self.price = self._synthetic.copy()
+        self.feeinfo = ["小于7天", "1.50%", "大于等于7天", "0.00%"]
+        self.segment = [[0, 7], [7]]
+
+
+def synthetic_funds(n, dates, seed=0):
+    """
+    :param n: int, number of funds
+    :param dates: pd.DatetimeIndex of open dates
+    :param seed: int.
+    :return: List[SyntheticFundInfo], with codes 900000, 900001, ...
+    """
+    return [
+        SyntheticFundInfo(str(900000 + i), synthetic_nav(dates, seed=seed + i))
+        for i in range(n)
+    ]
+
+
+def synthetic_status(codes, dates, freq=20, sell_every=6, value=1000, seed=0):
+    """
+    status table as generated by ``xa.record``: periodic purchases by value and
+    occasional redemptions by share (negative) or by ratio (-0.005 for selling out)
+
+    :param codes: List[str]
+    :param dates: pd.DatetimeIndex of open dates
+    :param freq: int, trade every ``freq`` open days
+    :param sell_every: int, every ``sell_every``-th trade is a redemption
+    :param value: float, purchase money
+    :param seed: int.
+    :return: pd.DataFrame with date column and one column per code
+    """
+    rng = np.random.default_rng(seed)
+    tdates = dates[::freq]
+    data = {"date": tdates}
+    for code in codes:
+        col = np.round(value * rng.uniform(0.5, 1.5, size=len(tdates)), 2)
+        for k, i in enumerate(range(sell_every - 1, len(tdates), sell_every)):
+            col[i] = -0.005 if k % 2 else -round(value * 0.3, 2)
+        data[code] = col
+    return pd.DataFrame(data)
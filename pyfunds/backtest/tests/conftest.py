@@ -0,0 +1,17 @@
+import os
+import sys
+
+sys.path.insert(0, "../")
+
+# run the suite offline against recorded responses, eg.
+# XALPHA_TRANSPORT=replay XALPHA_CASSETTE=./cassettes pytest
+# use XALPHA_TRANSPORT=record (or once) with network access to (re)build the cassettes,
+# XALPHA_LATENCY injects seconds per replayed request
+if os.environ.get("XALPHA_TRANSPORT"):
+    import xalpha.cons
+
+    xalpha.cons.set_transport(
+        os.environ["XALPHA_TRANSPORT"],
+        path=os.environ.get("XALPHA_CASSETTE", "cassettes"),
+        latency=float(os.environ.get("XALPHA_LATENCY", 0)),
+    )
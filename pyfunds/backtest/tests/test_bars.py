@@ -0,0 +1,77 @@
+import sys
+
+sys.path.insert(0, "../")
+import pandas as pd
+import xalpha as xa
+
+from xalpha.bars import BarAggregator, load_bars
+
+
+def _snap(time, price, volume):
+    return {"current": price, "time": "2020-08-19 " + time, "volume": volume}
+
+
+def _feed(agg, code="SH600000"):
+    ticks = [
+        ("09:30:20", 10.0, 100),
+        ("09:30:50", 10.3, 150),
+        ("09:31:10", 10.1, 170),
+        ("09:31:40", 9.9, 200),
+        ("09:32:05", 10.0, 260),
+        ("09:33:00", 10.2, 300),
+    ]
+    for t, p, v in ticks:
+        agg.update(code, _snap(t, p, v))
+
+
+def test_bar_aggregator():
+    agg = BarAggregator(intervals=[60, 300], persist=False)
+    _feed(agg)
+    bars = agg.bars("SH600000", 60)
+    assert list(bars["open"]) == [10.0, 10.1, 10.0, 10.2]
+    assert list(bars["high"]) == [10.3, 10.1, 10.0, 10.2]
+    assert list(bars["low"]) == [10.0, 9.9, 10.0, 10.2]
+    assert list(bars["volume"]) == [50, 50, 60, 40]
+    five = agg.bars("SH600000", 300)
+    assert len(five) == 1 and five.iloc[0]["high"] == 10.3
+    # out of order snapshots are dropped
+    agg.update("SH600000", _snap("09:31:00", 20.0, 400))
+    assert agg.bars("SH600000", 60)["high"].max() == 10.3
+
+
+def test_bar_aggregator_get_bar():
+    agg = BarAggregator(intervals=[60], persist=False)
+    _feed(agg)
+    now = "2020-08-19 09:33:30"
+    # the bar of 09:30 started before the first snapshot
+    assert agg.get_bar("SH600000", 4, 60, now=now) is None
+    assert len(agg.get_bar("SH600000", 3, 60, now=now)) == 3
+    assert agg.get_bar("SH600000", 3, 300, now=now) is None
+    # no quote for more than one interval
+    assert agg.get_bar("SH600000", 3, 60, now="2020-08-19 09:35:30") is None
+
+
+def test_bar_aggregator_install():
+    agg = BarAggregator(intervals=[60], persist=False)
+    t = pd.Timestamp.now().floor("60s")
+    for i, minutes in enumerate([-2, -1, 0]):
+        time = (t + pd.Timedelta(minutes=minutes)).strftime("%Y-%m-%d %H:%M:%S")
+        agg.update("SH600000", {"current": 10 + i, "time": time, "volume": 100 * i})
+    agg.install()
+    try:
+        assert len(xa.get_bar("SH600000", prev=2, interval=60)) == 2
+    finally:
+        agg.stop()
+    assert getattr(xa.universal, "bar_aggregator", None) is None
+
+
+def test_bar_aggregator_persist():
+    xa.set_backend(backend="memory", prefix="bars-test-")
+    agg = BarAggregator(intervals=[60])
+    _feed(agg, code="SZ000001")
+    agg.flush()
+    assert len(load_bars("SZ000001", 60)) == 3
+    agg.update("SZ000001", _snap("09:34:00", 10.4, 320))
+    agg.flush()
+    assert len(load_bars("SZ000001", 60)) == 4
+    xa.set_backend()
@@ -0,0 +1,83 @@
+import sys
+import time
+import pytest
+
+sys.path.insert(0, "../")
+import xalpha as xa
+from xalpha.exceptions import CassetteMissing
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {"Content-Type": "application/json"}
+    encoding = "utf-8"
+
+    def __init__(self, url):
+        self.content = ('{"url": "%s"}' % url).encode("utf-8")
+
+
+@pytest.fixture
+def live():
+    yield
+    xa.cons.set_transport()
+
+
+def test_cassette_record_replay(tmp_path, live):
+    calls = []
+
+    def inner(method, url, **kws):
+        calls.append(url)
+        return FakeResponse(url)
+
+    xa.cons.set_transport("record", path=str(tmp_path), inner=inner)
+    r = xa.cons.rget_json("http://example.com/a", params={"p": 1}, headers={"x": "y"})
+    assert r == {"url": "http://example.com/a"}
+    assert len(calls) == 1
+
+    xa.cons.set_transport("replay", path=str(tmp_path), latency=0.05)
+    t = time.time()
+    r = xa.cons.rget("http://example.com/a", params={"p": 1})
+    assert time.time() - t >= 0.05
+    assert r.status_code == 200 and r.json()["url"] == "http://example.com/a"
+    assert len(calls) == 1
+    with pytest.raises(CassetteMissing):
+        xa.cons.rget("http://example.com/a", params={"p": 2})
+
+
+def test_cassette_once(tmp_path, live):
+    calls = []
+
+    def inner(method, url, **kws):
+        calls.append(url)
+        return FakeResponse(url)
+
+    xa.cons.set_transport("once", path=str(tmp_path), inner=inner)
+    xa.cons.rpost("http://example.com/b", data={"q": 1})
+    xa.cons.rpost("http://example.com/b", data={"q": 1})
+    assert len(calls) == 1
+
+
+def test_cassette_cookies(tmp_path, live):
+    class CookieResponse(FakeResponse):
+        cookies = {"xq_a_token": "abc"}
+
+    def inner(method, url, **kws):
+        return CookieResponse(url)
+
+    xa.cons.set_transport("record", path=str(tmp_path), inner=inner)
+    r = xa.cons.rget("http://example.com/c")
+    assert r.cookies["xq_a_token"] == "abc" and r.json()["url"] == "http://example.com/c"
+    xa.cons.set_transport("replay", path=str(tmp_path))
+    assert xa.cons.rget("http://example.com/c").cookies["xq_a_token"] == "abc"
+
+
+def test_shadowed_names_after_submodule_import():
+    import xalpha.evaluate
+
+    assert not isinstance(xa.evaluate, type(sys))
+    assert sys.modules["xalpha.evaluate"].evaluate is xa.evaluate
+    # importing the submodule again binds it on the package again
+    del sys.modules["xalpha.evaluate"]
+    import xalpha.evaluate
+
+    assert xa.evaluate is sys.modules["xalpha.evaluate"].evaluate
@@ -0,0 +1,95 @@
+import sys
+
+sys.path.insert(0, "../")
+import numpy as np
+import pandas as pd
+
+from xalpha.downsample import (
+    downsample_df,
+    lttb,
+    lttb_indices,
+    ohlc_buckets,
+    target_points,
+)
+
+
+def test_target_points():
+    assert target_points(800, (0, 100)) == 1600
+    assert target_points(800, (50, 100)) == 3200
+    assert target_points(800, (0, 100), points_per_pixel=1) == 800
+
+
+def test_lttb_keeps_ends_and_extremes():
+    x = np.arange(10000)
+    y = np.sin(x / 500.0)
+    y[4321] = 10
+    y[7777] = -10
+    idx = lttb_indices(x, y, 200)
+    assert len(idx) == 200
+    assert idx[0] == 0 and idx[-1] == 9999
+    assert np.all(np.diff(idx) > 0)
+    assert 4321 in idx and 7777 in idx
+    xs, ys = lttb(x, y, 200)
+    assert ys.max() == 10 and ys.min() == -10
+
+
+def test_lttb_short_and_nan():
+    y = np.array([1.0, np.nan, 3.0, 4.0])
+    assert list(lttb_indices(np.arange(4), y, 10)) == [0, 2, 3]
+    y = np.random.RandomState(0).randn(1000)
+    y[100:200] = np.nan
+    idx = lttb_indices(np.arange(1000), y, 50)
+    assert not np.any((idx >= 100) & (idx < 200))
+
+
+def test_downsample_df():
+    df = pd.DataFrame(
+        {
+            "date": pd.date_range("2010-01-01", periods=5000),
+            "a": np.random.RandomState(1).randn(5000).cumsum(),
+            "b": np.random.RandomState(2).randn(5000).cumsum(),
+        }
+    )
+    small = downsample_df(df, 100, x="date")
+    assert 100 <= len(small) <= 200
+    assert small.iloc[0]["date"] == df.iloc[0]["date"]
+    assert small.iloc[-1]["date"] == df.iloc[-1]["date"]
+    assert len(downsample_df(df.iloc[:50], 100)) == 50
+
+
+def test_ohlc_buckets():
+    df = pd.DataFrame(
+        {
+            "date": pd.date_range("2020-01-01", periods=10),
+            "open": np.arange(10.0),
+            "close": np.arange(10.0) + 0.5,
+            "high": np.arange(10.0) + 1,
+            "low": np.arange(10.0) - 1,
+            "volume": np.ones(10),
+            "MA5": np.arange(10.0) * 2,
+        }
+    )
+    merged = ohlc_buckets(df, 5)
+    assert len(merged) == 5
+    assert list(merged.columns) == list(df.columns)
+    assert list(merged["open"]) == [0, 2, 4, 6, 8]
+    assert list(merged["close"]) == [1.5, 3.5, 5.5, 7.5, 9.5]
+    assert list(merged["high"]) == [2, 4, 6, 8, 10]
+    assert list(merged["low"]) == [-1, 1, 3, 5, 7]
+    assert list(merged["volume"]) == [2] * 5
+    assert list(merged["MA5"]) == [2, 6, 10, 14, 18]
+    assert merged["date"].iloc[1] == pd.Timestamp("2020-01-03")
+    assert ohlc_buckets(df, 20) is df
+
+
+def test_zoom_from_vopts():
+    from xalpha.indicator import _zoom, _default_zoom
+
+    class _DataZoom:
+        def __init__(self, start, end):
+            self.opts = {"start": start, "end": end}
+
+    assert _zoom({}) == (0, 100)
+    assert _zoom({"datazoom_opts": [_DataZoom(60, 100), _DataZoom(0, 100)]}) == (60, 100)
+    assert _zoom({"datazoom_opts": {"start": 20, "end": 80}}) == (20, 80)
+    assert _zoom({"datazoom_opts": [{"start": None, "end": None}]}) == _default_zoom
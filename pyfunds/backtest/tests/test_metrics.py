@@ -0,0 +1,45 @@
+import sys
+
+sys.path.insert(0, "../")
+import numpy as np
+import pandas as pd
+import pytest
+
+from xalpha.metrics import COLUMNS, drawdown, max_drawdown_duration, metrics
+
+
+def test_drawdown_duration():
+    equity = np.array([1.0, 1.2, 0.9, 1.0, 1.3, 1.1])[:, None]
+    dd = drawdown(equity)
+    assert dd.min() == pytest.approx(0.9 / 1.2 - 1)
+    assert max_drawdown_duration(dd)[0] == 2
+
+
+def test_metrics_series():
+    equity = pd.Series([1.0, 1.1, 0.99, 1.2, 1.32])
+    m = metrics(equity=equity, periods_per_year=4)
+    assert list(m.index) == COLUMNS
+    assert m["total_return"] == pytest.approx(0.32)
+    assert m["annual_return"] == pytest.approx(0.32)
+    assert m["max_drawdown"] == pytest.approx(-0.1)
+    assert m["hit_rate"] == pytest.approx(0.75)
+    assert np.isnan(m["beta"])
+
+
+def test_metrics_panel_matches_single():
+    rng = np.random.RandomState(0)
+    returns = pd.DataFrame(rng.normal(0.001, 0.01, size=(500, 3)), columns=list("abc"))
+    bench = pd.Series(rng.normal(0.0005, 0.01, size=500))
+    table = metrics(returns=returns, benchmark=bench, riskfree=0.02)
+    assert list(table.index) == ["a", "b", "c"]
+    single = metrics(returns=returns["b"], benchmark=bench, riskfree=0.02)
+    assert np.allclose(table.loc["b"].to_numpy(), single.to_numpy(), equal_nan=True)
+    beta = metrics(returns=bench, benchmark=bench)["beta"]
+    assert beta == pytest.approx(1)
+
+
+def test_metrics_turnover():
+    equity = pd.Series([1.0, 1.0, 1.1, 1.1, 1.0])
+    positions = pd.Series([0, 1, 1, 0, 0])
+    m = metrics(equity=equity, positions=positions, periods_per_year=4)
+    assert m["turnover"] == pytest.approx(2)
@@ -61,3 +61,57 @@ def test_review(capsys):
     check.notification(conf)
     captured = capsys.readouterr()
     assert captured.out == "The message failed to be sent\n"
+
+
+class _fakeinfo:
+    def __init__(self, code):
+        self.code = code
+        self.name = "fake"
+        dates = pd.bdate_range("2020-01-01", "2020-01-10")
+        self.price = pd.DataFrame(
+            {
+                "date": dates,
+                "netvalue": [1.0 + 0.01 * i for i in range(len(dates))],
+                "totvalue": [1.0 + 0.01 * i for i in range(len(dates))],
+                "comment": [0 for _ in dates],
+            }
+        )
+
+    def update(self):
+        pass
+
+
+def test_rtwatcher(monkeypatch):
+    import datetime as dt
+    import xalpha.realtime as xr
+
+    values = iter([1.2, 1.2, 1.3])
+
+    class _fakertdata:
+        def __init__(self, code):
+            self.code = code
+            self.name = "fake"
+            self.rtvalue = next(values)
+            self.time = dt.datetime(2020, 1, 13, 14, 30)
+
+    monkeypatch.setattr(xr, "rtdata", _fakertdata)
+    info = _fakeinfo("000001")
+    st = xa.policy.scheduled(
+        info, totmoney=1000, times=pd.date_range("2020-01-01", "2020-01-20")
+    )
+    w = xr.rtwatcher([info], threshold=0.01)
+    w.add_policy(st, "Plan A")
+    received = []
+    w.subscribe(received.append)
+
+    events = w.poll()
+    assert [e["type"] for e in events] == ["estimate", "policy"]
+    assert events[1]["action"] == 1000
+    assert len(info.price) == 9
+    assert info.price.iloc[-1].netvalue == 1.2
+    assert w.poll() == []
+    events = w.poll()
+    assert [e["type"] for e in events] == ["estimate"]
+    assert len(info.price) == 9
+    assert len(received) == 3
+    assert st.end == pd.Timestamp("2020-01-10")
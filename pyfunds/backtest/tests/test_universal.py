@@ -268,6 +268,22 @@ def test_get_bond_rates():
     assert df.iloc[-1]["close"] == 2.7743
 
 
+def test_range_by_date_only_fetches_missing(monkeypatch):
+    calls = []
+
+    def fake_teb(code, date):
+        calls.append(date)
+        return {"e": 1.0, "b": 2.0, "m": 3.0}
+
+    monkeypatch.setattr(xa.universal, "get_teb", fake_teb)
+    df = xa.universal.get_teb_range("SH000300", "2020-01-01", "2020-03-01")
+    assert len(df) == len(calls) == 9
+    df = xa.universal.get_teb_range("SH000300", "2020-01-01", "2020-03-08")
+    assert len(df) == 10
+    assert len(calls) == 10 and calls[-1] == "2020-03-06"
+    assert list(df.columns) == ["date", "e", "b", "m"]
+
+
 def test_get_ttjj_rt_oversea():
     r = xa.get_rt("F968012")
     assert r["name"] == "High-interest debt"
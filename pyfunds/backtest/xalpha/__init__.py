@@ -2,50 +2,125 @@ __version__ = "0.11.7"
 __author__ = "refraction-ray"
 __name__ = "xalpha"
 
-import xalpha.policy
-import xalpha.remain
-import xalpha.misc
-import xalpha.exceptions
-from xalpha.evaluate import evaluate
-from xalpha.info import (
-    fundinfo,
-    indexinfo,
-    cashinfo,
-    mfundinfo,
-    FundInfo,
-    IndexInfo,
-    CashInfo,
-    MFundInfo,
-    FundReport,
-    get_fund_holdings,
-)
-from xalpha.multiple import mul, mulfix, imul, Mul, MulFix, IMul
-from xalpha.realtime import rfundinfo, review  # deprecated
-from xalpha.record import record, irecord, Record, IRecord
-from xalpha.trade import trade, itrade, Trade, ITrade
-from xalpha.universal import (
-    get_daily,
-    get_rt,
-    get_bar,
-    set_backend,
-    set_handler,
-    vinfo,
-    VInfo,
-)
-from xalpha.provider import show_providers, set_proxy
-from xalpha.toolbox import (
-    PEBHistory,
-    IndexPEBHistory,
-    FundPEBHistory,
-    SWPEBHistory,
-    StockPEBHistory,
-    TEBHistory,
-    Compare,
-    OverPriced,
-    QDIIPredict,
-    RTPredict,
-    CBCalculator,
-    set_holdings,
-    set_display,
-)
-import xalpha.backtest
+import importlib
+import sys
+import types
+
+# public api -> the submodule defining it. Submodules are only imported on first
+# attribute access (PEP 562), so that ``import xalpha`` stays cheap for short-lived
+# scripts which only touch a small part of the api.
+_lazy_attrs = {
+    "evaluate": "xalpha.evaluate",
+    "fundinfo": "xalpha.info",
+    "indexinfo": "xalpha.info",
+    "cashinfo": "xalpha.info",
+    "mfundinfo": "xalpha.info",
+    "FundInfo": "xalpha.info",
+    "IndexInfo": "xalpha.info",
+    "CashInfo": "xalpha.info",
+    "MFundInfo": "xalpha.info",
+    "FundReport": "xalpha.info",
+    "get_fund_holdings": "xalpha.info",
+    "mul": "xalpha.multiple",
+    "mulfix": "xalpha.multiple",
+    "imul": "xalpha.multiple",
+    "Mul": "xalpha.multiple",
+    "MulFix": "xalpha.multiple",
+    "IMul": "xalpha.multiple",
+    "rfundinfo": "xalpha.realtime",  # deprecated
+    "review": "xalpha.realtime",  # deprecated
+    "rtwatcher": "xalpha.realtime",
+    "record": "xalpha.record",
+    "irecord": "xalpha.record",
+    "Record": "xalpha.record",
+    "IRecord": "xalpha.record",
+    "trade": "xalpha.trade",
+    "itrade": "xalpha.trade",
+    "Trade": "xalpha.trade",
+    "ITrade": "xalpha.trade",
+    "get_daily": "xalpha.universal",
+    "get_rt": "xalpha.universal",
+    "get_bar": "xalpha.universal",
+    "set_backend": "xalpha.universal",
+    "set_handler": "xalpha.universal",
+    "set_bar_aggregator": "xalpha.universal",
+    "vinfo": "xalpha.universal",
+    "VInfo": "xalpha.universal",
+    "show_providers": "xalpha.provider",
+    "set_proxy": "xalpha.provider",
+    "PEBHistory": "xalpha.toolbox",
+    "IndexPEBHistory": "xalpha.toolbox",
+    "FundPEBHistory": "xalpha.toolbox",
+    "SWPEBHistory": "xalpha.toolbox",
+    "StockPEBHistory": "xalpha.toolbox",
+    "TEBHistory": "xalpha.toolbox",
+    "Compare": "xalpha.toolbox",
+    "OverPriced": "xalpha.toolbox",
+    "QDIIPredict": "xalpha.toolbox",
+    "RTPredict": "xalpha.toolbox",
+    "CBCalculator": "xalpha.toolbox",
+    "set_holdings": "xalpha.toolbox",
+    "set_display": "xalpha.toolbox",
+}
+
+_lazy_modules = [
+    "backtest",
+    "bars",
+    "cons",
+    "downsample",
+    "evaluate",
+    "exceptions",
+    "indicator",
+    "info",
+    "metrics",
+    "misc",
+    "multiple",
+    "policy",
+    "provider",
+    "realtime",
+    "record",
+    "remain",
+    "toolbox",
+    "trade",
+    "universal",
+]
+
+__all__ = list(_lazy_attrs)
+
+
+# public names which are shadowed by the submodule of the same name, eg. ``xalpha.trade``
+# the class vs ``xalpha.trade`` the module
+_shadowed = ["evaluate", "record", "trade"]
+
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name, value):
+        # the import system binds the submodule on the package after any import of it,
+        # eg. ``from xalpha.trade import trade`` in realtime, keep the public api instead
+        if (
+            name in _shadowed
+            and isinstance(value, types.ModuleType)
+            and value.__name__ == "xalpha." + name
+        ):
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+
+sys.modules["xalpha"].__class__ = _Package
+
+
+def __getattr__(name):
+    if name in _lazy_attrs:
+        module = importlib.import_module(_lazy_attrs[name])
+        # importing a submodule may already bind the name here, eg. ``set_backend``
+        # in universal rebinds ``xalpha.get_daily`` to the cached version
+        if name not in globals():
+            globals()[name] = getattr(module, name)
+        return globals()[name]
+    if name in _lazy_modules:
+        return importlib.import_module("xalpha." + name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attrs) | set(_lazy_modules))
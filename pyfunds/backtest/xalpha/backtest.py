@@ -4,7 +4,8 @@ modules for dynamical backtesting framework
 """
 
 import pandas as pd
-from xalpha.cons import avail_dates, convert_date, opendate_set, yesterdayobj
+import xalpha.cons as xc
+from xalpha.cons import avail_dates, convert_date, yesterdayobj
 from xalpha.exceptions import FundTypeError, TradeBehaviorError
 from xalpha.info import cashinfo, fundinfo, mfundinfo
 from xalpha.multiple import mul, mulfix
@@ -67,7 +68,7 @@ class BTE:
         self.prepare()
         dates = pd.bdate_range(self.start, self.end)
         for d in dates:
-            if d.strftime("%Y-%m-%d") in opendate_set:
+            if d.strftime("%Y-%m-%d") in xc.opendate_set:
                 self.run(d)
 
     def get_current_mul(self):
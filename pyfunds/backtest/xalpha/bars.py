@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+intraday bars built in process from realtime quotes
+
+:class:`BarAggregator` takes the snapshots of :func:`xalpha.universal.get_rt` (or of any realtime
+feed giving ``current``, ``time`` and the cumulative ``volume`` of the day) and builds the OHLCV bars
+of several intervals at once. The last bars of each interval are kept in ring buffers, the completed
+ones are appended to the cache backend of :func:`xalpha.universal.set_backend`. Once installed,
+:func:`xalpha.universal.get_bar` is answered from the aggregator whenever the requested bars were all
+observed, eg.
+
+.. code-block:: python
+
+    agg = BarAggregator(intervals=[60, 300, 3600])
+    agg.install()
+    agg.start(["SH600519", "SZ000001"], period=3)
+    xa.get_bar("SH600519", prev=30, interval=60)  # served locally after half an hour of quotes
+"""
+
+import datetime as dt
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import xalpha.universal as xu
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+
+
+def _cache_key(code, interval):
+    return "bar-%s-%s" % (interval, code.replace("/", "_"))
+
+
+def load_bars(code, interval):
+    """
+    completed bars saved in the cache backend by :class:`BarAggregator`
+
+    :param code: str, the code given to the aggregator
+    :param interval: int, seconds
+    :return: pd.DataFrame or None if nothing is saved
+    """
+    key = _cache_key(code, interval)
+    if xu.ioconf.get("backend") in ["csv", "sql"]:
+        df = xu.fetch_backend(key)
+        if df is not None:
+            df["date"] = pd.to_datetime(df["date"])
+        return df
+    d = getattr(xu, "cached_dict", None) or {}
+    return d.get(xu.ioconf.get("prefix", "") + key)
+
+
+def _append_bars(key, df, header):
+    if xu.ioconf.get("backend") in ["csv", "sql"]:
+        xu.save_backend(key, df, mode="a", header=header)
+    else:
+        if not getattr(xu, "cached_dict", None):
+            setattr(xu, "cached_dict", {})
+        d = getattr(xu, "cached_dict")
+        key = xu.ioconf.get("prefix", "") + key
+        d[key] = pd.concat([d[key], df], ignore_index=True) if key in d else df
+
+
+class BarAggregator:
+    """
+    incremental OHLCV bars of several intervals from realtime snapshots
+
+    :param intervals: list of int, seconds, each one dividing a day, eg. 60, 300, 3600, 86400
+    :param maxlen: int, number of completed bars kept in memory for each code and interval
+    :param persist: bool, whether to append the completed bars to the cache backend
+    :param max_workers: int, number of quotes fetched at the same time in :meth:`poll`
+    """
+
+    def __init__(self, intervals=(60, 300, 3600), maxlen=2000, persist=True, max_workers=8):
+        self.intervals = sorted(int(i) for i in intervals)
+        for interval in self.intervals:
+            if interval <= 0 or 86400 % interval != 0:
+                raise ValueError("interval %s doesn't divide a day" % interval)
+        self.maxlen = maxlen
+        self.persist = persist
+        self.max_workers = max_workers
+        self._rings = {}  # (code, interval): deque of completed bars
+        self._partial = {}  # (code, interval): [date, open, high, low, close, volume] of the bar
+        self._since = {}  # code: time of the first snapshot
+        self._last = {}  # code: (time, cumulative volume) of the last snapshot
+        self._pending = []  # (code, interval, bar) completed and not saved yet
+        self._saved = set()  # cache keys already written by this aggregator
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def update(self, code, snapshot):
+        """
+        merge one realtime snapshot into the bars of the code
+
+        :param code: str
+        :param snapshot: dict as given by :func:`xalpha.universal.get_rt`, ``volume`` is optional
+        """
+        price = snapshot.get("current")
+        if price is None:
+            return
+        t = pd.Timestamp(snapshot.get("time") or dt.datetime.now())
+        volume = snapshot.get("volume")
+        with self._lock:
+            last = self._last.get(code)
+            if last is not None and t < last[0]:
+                return  # out of order
+            if volume is None:
+                delta = np.nan
+            elif last is None or last[1] is None:
+                delta = 0.0  # the volume before the first snapshot is not in any bar
+            elif t.date() > last[0].date() or volume < last[1]:
+                delta = float(volume)
+            else:
+                delta = float(volume - last[1])
+            self._last[code] = (t, volume)
+            self._since.setdefault(code, t)
+            for interval in self.intervals:
+                key = (code, interval)
+                start = t.floor("%ss" % interval)
+                bar = self._partial.get(key)
+                if bar is not None and start > bar[0]:
+                    self._complete(key, bar)
+                    bar = None
+                if bar is None:
+                    self._partial[key] = [start, price, price, price, price, delta]
+                else:
+                    bar[2] = max(bar[2], price)
+                    bar[3] = min(bar[3], price)
+                    bar[4] = price
+                    bar[5] += delta
+
+    def _complete(self, key, bar):
+        if key not in self._rings:
+            self._rings[key] = deque(maxlen=self.maxlen)
+        self._rings[key].append(tuple(bar))
+        if self.persist:
+            self._pending.append(key + (tuple(bar),))
+
+    def update_many(self, snapshots):
+        """
+        :param snapshots: dict of code: snapshot, eg. from a batch realtime feed
+        """
+        for code, snapshot in snapshots.items():
+            self.update(code, snapshot)
+
+    def flush(self):
+        """
+        append the bars completed since the last call to the cache backend
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        groups = {}
+        for code, interval, bar in pending:
+            groups.setdefault((code, interval), []).append(bar)
+        for (code, interval), rows in groups.items():
+            key = _cache_key(code, interval)
+            header = key not in self._saved and load_bars(code, interval) is None
+            _append_bars(key, pd.DataFrame(rows, columns=COLUMNS), header)
+            self._saved.add(key)
+
+    def poll(self, codes):
+        """
+        fetch the realtime quotes of the codes concurrently and merge them
+
+        :param codes: list of str, codes of :func:`xalpha.universal.get_rt`
+        :return: dict of code: snapshot, the codes failing to fetch are left out
+        """
+
+        def _get(code):
+            try:
+                return xu.get_rt(code)
+            except Exception as e:
+                logger.warning("fails to fetch the realtime quote of %s: %s" % (code, e))
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            rts = list(executor.map(_get, codes))
+        snapshots = {code: rt for code, rt in zip(codes, rts) if rt is not None}
+        self.update_many(snapshots)
+        self.flush()
+        return snapshots
+
+    def bars(self, code, interval, prev=None, partial=True):
+        """
+        :param code: str
+        :param interval: int, one of the intervals of the aggregator
+        :param prev: int, number of the last bars, default all those in memory
+        :param partial: bool, whether to include the current bar which is not completed yet
+        :return: pd.DataFrame with columns date, open, high, low, close and volume
+        """
+        key = (code, int(interval))
+        with self._lock:
+            rows = list(self._rings.get(key, []))
+            if partial and key in self._partial:
+                rows.append(tuple(self._partial[key]))
+        if prev is not None:
+            rows = rows[-prev:]
+        return pd.DataFrame(rows, columns=COLUMNS)
+
+    def get_bar(self, code, prev, interval, now=None):
+        """
+        the last ``prev`` bars, the current one included as in the remote APIs, if all of them were
+        observed from their start and the code was quoted within the last interval
+
+        :param now: datetime, default the current time
+        :return: pd.DataFrame or None if the aggregator doesn't cover the request
+        """
+        try:
+            interval = int(interval)
+        except (TypeError, ValueError):
+            return None
+        key = (code, interval)
+        with self._lock:
+            if interval not in self.intervals or key not in self._partial:
+                return None
+            # the feed of the code stopped, the bars after the last snapshot are unknown
+            now = pd.Timestamp(now or dt.datetime.now())
+            if self._last[code][0] < now - pd.Timedelta(seconds=interval):
+                return None
+            rows = list(self._rings.get(key, [])) + [tuple(self._partial[key])]
+            first = self._since[code].floor("%ss" % interval)
+        rows = rows[-prev:]
+        # the bar of the first snapshot misses the quotes before it
+        if len(rows) < prev or rows[0][0] <= first:
+            return None
+        return pd.DataFrame(rows, columns=COLUMNS)
+
+    def install(self):
+        """
+        serve :func:`xalpha.universal.get_bar` from this aggregator when it covers the request
+        """
+        xu.set_bar_aggregator(self)
+
+    def uninstall(self):
+        if getattr(xu, "bar_aggregator", None) is self:
+            xu.set_bar_aggregator(None)
+
+    def run(self, codes, period=3, rounds=None):
+        """
+        poll every ``period`` seconds until :meth:`stop` or ``rounds`` polls
+
+        :param codes: list of str
+        :param period: float, seconds
+        :param rounds: int, None for no limit
+        """
+        n = 0
+        while not self._stop.is_set():
+            try:
+                self.poll(codes)
+            except Exception:
+                logger.exception("poll of the realtime quotes fails")
+            n += 1
+            if rounds is not None and n >= rounds:
+                break
+            self._stop.wait(period)
+
+    def start(self, codes, period=3):
+        """
+        poll in a background thread
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.run, args=(codes, period), name="bar-aggregator", daemon=True
+        )
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """
+        stop polling, save the completed bars and stop serving :func:`xalpha.universal.get_bar`
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.uninstall()
+        self.flush()
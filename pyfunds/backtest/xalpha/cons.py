@@ -8,24 +8,19 @@ import os
 import time
 import logging
 import inspect
+import json
+import base64
+import hashlib
 from decimal import Decimal
 import requests
-from functools import wraps
+from functools import wraps, lru_cache
 from simplejson.errors import JSONDecodeError
 
 import pandas as pd
-from pyecharts.options import (
-    AxisOpts,
-    DataZoomOpts,
-    LegendOpts,
-    TooltipOpts,
-    VisualMapOpts,
-)
 from numpy import sqrt
-from scipy import optimize
 
 from xalpha import __path__
-from .exceptions import HttpStatusError
+from .exceptions import HttpStatusError, CassetteMissing
 
 logger = logging.getLogger(__name__)
 
@@ -57,13 +52,25 @@ yesterdaydash = lambda: dt.datetime.strftime(yesterdayobj(), "%Y-%m-%d")
 
 # list: all the trade date of domestic stock market in the form of string
 # update per year by ``xa.misc.update_caldate("xalpha/caldate.csv", "2023")``
-caldate = pd.read_csv(os.path.join(__path__[0], "caldate.csv"))
 # data source
 # pro = ts.pro_api()
 # df = pro.trade_cal(exchange='', start_date='20230101', end_date='20231231')
-opendate = list(caldate[caldate["is_open"] == 1]["cal_date"])
-# opendate = list(ts.trade_cal()[ts.trade_cal()['isOpen']==1]['calendarDate'])
-opendate_set = set(opendate)  # for speed checking?
+# ``caldate``, ``opendate`` and ``opendate_set`` are loaded on first access, see ``__getattr__`` below
+
+
+@lru_cache(maxsize=1)
+def _calendar():
+    """
+    read caldate.csv once and cache the trade calendar
+
+    :return: tuple of (caldate dataframe, opendate list, opendate set)
+    """
+    caldate = pd.read_csv(os.path.join(__path__[0], "caldate.csv"))
+    opendate = list(caldate[caldate["is_open"] == 1]["cal_date"])
+    # opendate = list(ts.trade_cal()[ts.trade_cal()['isOpen']==1]['calendarDate'])
+    calendar_selfcheck(opendate)
+    return caldate, opendate, set(opendate)  # set for speed checking
+
 
 # fund code list which always round down for the purchase share approximation
 droplist = ["003318", "000311", "000601", "009989"]
@@ -71,9 +78,11 @@ droplist = ["003318", "000311", "000601", "009989"]
 sqrt_days_in_year = sqrt(250.0)
 
 
-def calendar_selfcheck():
+def calendar_selfcheck(opendate=None):
 
     # Maybe consider some more stable third-party resource hosting services later
+    if opendate is None:
+        opendate = _calendar()[1]
     current_year = dt.datetime.now().year
     if str(current_year) != opendate[-1][:4]:
         logger.warning(
@@ -83,9 +92,6 @@ def calendar_selfcheck():
               " for the latest year, otherwise you may not be able to capture and process the latest NAV correctly")
 
 
-calendar_selfcheck()
-
-
 region_trans = {
     "Switzerland": "CH",
     "Japan": "JP",
@@ -112,41 +118,76 @@ connection_errors = (
     JSONDecodeError,
 )
 
-line_opts = {
-    "datazoom_opts": [
-        DataZoomOpts(is_show=True, type_="slider", range_start=50, range_end=100),
-        DataZoomOpts(
+def _line_opts():
+    from pyecharts.options import DataZoomOpts, TooltipOpts
+
+    return {
+        "datazoom_opts": [
+            DataZoomOpts(is_show=True, type_="slider", range_start=50, range_end=100),
+            DataZoomOpts(
+                is_show=True,
+                type_="slider",
+                orient="vertical",
+                range_start=50,
+                range_end=100,
+            ),
+        ],
+        "tooltip_opts": TooltipOpts(
             is_show=True,
-            type_="slider",
-            orient="vertical",
-            range_start=50,
-            range_end=100,
+            trigger="axis",
+            trigger_on="mousemove",
+            axis_pointer_type="cross",
         ),
-    ],
-    "tooltip_opts": TooltipOpts(
-        is_show=True, trigger="axis", trigger_on="mousemove", axis_pointer_type="cross"
-    ),
-}
+    }
+
+
+def _heatmap_opts():
+    from pyecharts.options import VisualMapOpts
+
+    return {
+        "visualmap_opts": VisualMapOpts(
+            min_=-1, max_=1, orient="horizontal", pos_right="middle", pos_top="bottom"
+        )
+    }
 
-heatmap_opts = {
-    "visualmap_opts": VisualMapOpts(
-        min_=-1, max_=1, orient="horizontal", pos_right="middle", pos_top="bottom"
-    )
-}
 
 # pie_opts = {
 #     "tooltip_opts": TooltipOpts(),
 #     "legend_opts": LegendOpts(orient="vertical", pos_left="left"),
 # }
 
-themeriver_opts = {
-    "xaxis_opts": AxisOpts(type_="time"),
-    "datazoom_opts": [DataZoomOpts(range_start=60, range_end=100)],
-    "tooltip_opts": TooltipOpts(trigger_on="mousemove", trigger="item"),
-    "legend_opts": LegendOpts(pos_top="top"),
+
+def _themeriver_opts():
+    from pyecharts.options import AxisOpts, DataZoomOpts, LegendOpts, TooltipOpts
+
+    return {
+        "xaxis_opts": AxisOpts(type_="time"),
+        "datazoom_opts": [DataZoomOpts(range_start=60, range_end=100)],
+        "tooltip_opts": TooltipOpts(trigger_on="mousemove", trigger="item"),
+        "legend_opts": LegendOpts(pos_top="top"),
+    }
+
+
+# module attributes which are expensive to build (pyecharts, caldate.csv)
+# and thus only evaluated on first access, see PEP 562
+_lazy_attrs = {
+    "caldate": lambda: _calendar()[0],
+    "opendate": lambda: _calendar()[1],
+    "opendate_set": lambda: _calendar()[2],
+    "line_opts": _line_opts,
+    "heatmap_opts": _heatmap_opts,
+    "themeriver_opts": _themeriver_opts,
 }
 
 
+def __getattr__(name):
+    if name in _lazy_attrs:
+        v = _lazy_attrs[name]()
+        globals()[name] = v
+        return v
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
 def xnpv(rate, cashflows):
     """
     give the current cash value based on future cashflows
@@ -175,6 +216,8 @@ def xirr(cashflows, guess=0.1):
         as a starting point for the numerical solution
     :returns: the IRR as a single floating number
     """
+    from scipy import optimize
+
     return optimize.newton(lambda r: xnpv(r, cashflows), guess)
 
 
@@ -222,6 +265,7 @@ def _date_check(dtobj, check=False):
 
 def next_onday(dtobj):
     dtobj = _date_check(dtobj, check=True)
+    opendate_set = _calendar()[2]
     dtobj += dt.timedelta(1)
     while dtobj.strftime("%Y-%m-%d") not in opendate_set:
         dtobj += dt.timedelta(1)
@@ -230,6 +274,7 @@ def next_onday(dtobj):
 
 def last_onday(dtobj):
     dtobj = _date_check(dtobj, check=True)
+    opendate_set = _calendar()[2]
     dtobj -= dt.timedelta(1)
     while dtobj.strftime("%Y-%m-%d") not in opendate_set:
         dtobj -= dt.timedelta(1)
@@ -244,6 +289,7 @@ def avail_dates(dtlist, future=False):
     :param future: bool, default False, indicating the latest day in the list is yesterday
     :return: datetime obj list
     """
+    opendate_set = _calendar()[2]
     ndtlist = []
     for d in dtlist:
         if d.strftime("%Y-%m-%d") not in opendate_set:
@@ -341,19 +387,174 @@ def reconnect(tries=5, timeout=12):
     return robustify
 
 
-rget = reconnect()(requests.get)
-rpost = reconnect()(requests.post)
+def live_transport(method, url, **kws):
+    """
+    default transport, send the request to the network via requests
+
+    :param method: str. "get" or "post"
+    :param url: str.
+    :param kws: keyword arguments passed to ``requests.request``
+    :return: requests.Response
+    """
+    return requests.request(method, url, **kws)
+
+
+class CassetteResponse:
+    """
+    response replayed from cassette, mimicking the part of ``requests.Response`` used in xalpha
+    """
+
+    def __init__(self, d):
+        self.url = d["url"]
+        self.status_code = d["status_code"]
+        self.headers = requests.structures.CaseInsensitiveDict(d["headers"])
+        self.encoding = d["encoding"]
+        self.content = base64.b64decode(d["content"])
+        self.cookies = requests.utils.cookiejar_from_dict(d.get("cookies", {}))
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self, **kws):
+        return json.loads(self.text, **kws)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise HttpStatusError(
+                "%s replayed with http status %s" % (self.url, self.status_code)
+            )
+
+
+class CassetteTransport:
+    """
+    transport which records responses into a cassette directory and replays them,
+    one json file per request keyed by method, url and payload.
+
+    :param path: str. the cassette directory
+    :param mode: str. "record" fetches via ``inner`` and saves the response,
+        "replay" only reads from cassettes and never touches the network,
+        "once" replays when recorded and records otherwise
+    :param latency: float or func returning float, default 0. seconds slept before
+        each replayed response to simulate network round trip
+    :param inner: func, default :func:`live_transport`. transport used when recording
+    """
+
+    # kws that don't change the response and are thus excluded from the cassette key
+    _ignored = ("headers", "proxies", "timeout", "verify", "cookies")
+
+    def __init__(self, path, mode="replay", latency=0, inner=None):
+        if mode not in ["record", "replay", "once"]:
+            raise ValueError("no %s option for cassette mode" % mode)
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.inner = inner or live_transport
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, method, url, **kws):
+        payload = {k: v for k, v in kws.items() if k not in self._ignored}
+        s = json.dumps([method.lower(), url, payload], sort_keys=True, default=str)
+        return hashlib.sha1(s.encode("utf-8")).hexdigest()
+
+    def _file(self, method, url, **kws):
+        return os.path.join(self.path, self.key(method, url, **kws) + ".json")
+
+    def _record(self, fname, method, url, **kws):
+        r = self.inner(method, url, **kws)
+        d = {
+            "method": method.lower(),
+            "url": url,
+            "status_code": r.status_code,
+            "headers": dict(r.headers),
+            # requests guesses the encoding of ``text`` when the header gives none
+            "encoding": r.encoding or getattr(r, "apparent_encoding", None),
+            "content": base64.b64encode(r.content).decode("ascii"),
+            # eg. the xq_a_token of xueqiu is read from the cookies of the homepage
+            "cookies": dict(getattr(r, "cookies", None) or {}),
+        }
+        with open(fname, "w", encoding="utf-8") as f:
+            json.dump(d, f, ensure_ascii=False)
+        # the same response object in record and replay
+        return CassetteResponse(d)
+
+    def _replay(self, fname, method, url):
+        try:
+            with open(fname, encoding="utf-8") as f:
+                d = json.load(f)
+        except FileNotFoundError:
+            raise CassetteMissing("no cassette for %s %s" % (method.upper(), url))
+        latency = self.latency() if callable(self.latency) else self.latency
+        if latency:
+            time.sleep(latency)
+        return CassetteResponse(d)
+
+    def __call__(self, method, url, **kws):
+        fname = self._file(method, url, **kws)
+        if self.mode == "record" or (
+            self.mode == "once" and not os.path.exists(fname)
+        ):
+            return self._record(fname, method, url, **kws)
+        return self._replay(fname, method, url)
+
+
+transport = live_transport
+
+
+def set_transport(mode=None, path=None, latency=0, inner=None):
+    """
+    set the transport under ``rget``, ``rpost``, ``rget_json`` and ``rpost_json``, i.e. for all data fetching in xalpha.
+
+    .. code-block:: python
+
+       xa.cons.set_transport("record", path="cassettes")  # fetch and save responses
+       xa.cons.set_transport("replay", path="cassettes", latency=0.05)  # offline, 50ms per request
+       xa.cons.set_transport()  # back to the network
+
+    :param mode: Optional[str or func]. None for the network, "record", "replay" or "once" for cassettes,
+        or any func with signature ``f(method, url, **kws)`` returning a response object.
+    :param path: Optional[str]. cassette directory, required for cassette modes
+    :param latency: float or func, default 0. injected seconds per replayed request
+    :param inner: Optional[func]. transport used for recording, default to the network
+    :return: the transport in effect
+    """
+    global transport
+    if mode is None:
+        transport = live_transport
+    elif callable(mode):
+        transport = mode
+    else:
+        if path is None:
+            raise ValueError("cassette transport requires a path")
+        transport = CassetteTransport(path, mode=mode, latency=latency, inner=inner)
+    return transport
+
+
+def _rget(*args, **kws):
+    return transport("get", *args, **kws)
+
+
+def _rpost(*args, **kws):
+    return transport("post", *args, **kws)
+
+
+rget = reconnect()(_rget)
+rpost = reconnect()(_rpost)
 
 
 @reconnect()
 def rget_json(*args, **kws):
-    r = requests.get(*args, **kws)
+    r = transport("get", *args, **kws)
     return r.json()
 
 
 @reconnect()
 def rpost_json(*args, **kws):
-    r = requests.post(*args, **kws)
+    r = transport("post", *args, **kws)
     return r.json()
 
 
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+level of detail downsampling for plotting long series
+
+lines are reduced by largest-triangle-three-buckets (LTTB), which keeps the visual shape
+(peaks, troughs) with a few points per pixel, candles are merged into OHLC buckets.
+The number of points is chosen from the pixel width of the chart and the zoomed fraction
+of the series, see :func:`target_points`.
+"""
+
+import numpy as np
+import pandas as pd
+
+# points rendered when the pixel width is unknown, eg. pyecharts html
+DEFAULT_WIDTH = 1600
+POINTS_PER_PIXEL = 2
+
+
+def target_points(width=None, zoom=(0, 100), points_per_pixel=POINTS_PER_PIXEL):
+    """
+    number of points to keep for the whole series so that the zoomed window still has
+    ``points_per_pixel`` points per pixel
+
+    :param width: Optional[int]. pixel width of the plot area, default ``DEFAULT_WIDTH``
+    :param zoom: Tuple[float, float]. visible range in percent of the series, eg. the
+        ``range_start``, ``range_end`` of pyecharts datazoom
+    :param points_per_pixel: float.
+    :return: int.
+    """
+    if width is None:
+        width = DEFAULT_WIDTH
+    visible = max(zoom[1] - zoom[0], 1) / 100
+    return int(np.ceil(width * points_per_pixel / visible))
+
+
+def lttb_indices(x, y, n_out):
+    """
+    positions of the points kept by LTTB, non finite points are dropped
+
+    :param x: array-like of numbers, increasing
+    :param y: array-like of numbers, same length as x
+    :param n_out: int. number of points to keep, at least 3
+    :return: np.ndarray of int positions into x and y, increasing
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    n = len(valid)
+    n_out = max(int(n_out), 3)
+    if n <= n_out:
+        return valid
+    xv, yv = x[valid], y[valid]
+
+    # n_out - 2 buckets between the first and the last point, which are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nlo, nhi = edges[i + 1], edges[i + 2]
+        else:
+            nlo, nhi = n - 1, n
+        cx, cy = xv[nlo:nhi].mean(), yv[nlo:nhi].mean()
+        area = np.abs(
+            (xv[a] - cx) * (yv[lo:hi] - yv[a]) - (xv[a] - xv[lo:hi]) * (cy - yv[a])
+        )
+        a = lo + int(np.argmax(area))
+        kept[i + 1] = a
+    return valid[kept]
+
+
+def lttb(x, y, n_out):
+    """
+    :return: Tuple[np.ndarray, np.ndarray]. x and y of the points kept by LTTB
+    """
+    idx = lttb_indices(x, y, n_out)
+    return np.asarray(x)[idx], np.asarray(y)[idx]
+
+
+def downsample_df(df, n_out, x=None, cols=None):
+    """
+    LTTB on the rows of a dataframe, keeping the union of the points kept for each column
+
+    :param df: pd.DataFrame.
+    :param n_out: int. points kept per column
+    :param x: Optional[str]. column used as x axis, default the row position
+    :param cols: Optional[List[str]]. value columns, default all numeric columns but x
+    :return: pd.DataFrame. the kept rows of df
+    """
+    if len(df) <= n_out:
+        return df
+    if x is None:
+        xs = np.arange(len(df), dtype=float)
+    else:
+        xs = df[x]
+        if pd.api.types.is_datetime64_any_dtype(xs):
+            xs = xs.values.astype("datetime64[ns]").astype(np.int64)
+        xs = np.asarray(xs, dtype=float)
+    if cols is None:
+        cols = [
+            c
+            for c in df.columns
+            if c != x and pd.api.types.is_numeric_dtype(df[c])
+        ]
+    idx = [lttb_indices(xs, df[c].values, n_out) for c in cols]
+    idx = np.unique(np.concatenate(idx)) if idx else np.arange(len(df))
+    return df.iloc[idx]
+
+
+def ohlc_buckets(df, n_out, date="date"):
+    """
+    merge consecutive candles into ``n_out`` buckets: first open, max high, min low,
+    last close, summed volume and amount, the date of the first candle and the last
+    value of any other column (eg. moving averages)
+
+    :param df: pd.DataFrame. with open, high, low, close columns
+    :param n_out: int. number of candles kept
+    :param date: str. date column
+    :return: pd.DataFrame.
+    """
+    n = len(df)
+    if n <= n_out:
+        return df
+    bucket = np.arange(n) * n_out // n
+    starts = np.flatnonzero(np.diff(bucket, prepend=-1))
+    ends = np.append(starts[1:], n) - 1
+    out = {}
+    for c in df.columns:
+        values = df[c].values
+        if c in (date, "open"):
+            out[c] = values[starts]
+        elif c == "high":
+            out[c] = np.maximum.reduceat(values.astype(float), starts)
+        elif c == "low":
+            out[c] = np.minimum.reduceat(values.astype(float), starts)
+        elif c in ("volume", "amount"):
+            out[c] = np.add.reduceat(np.nan_to_num(values.astype(float)), starts)
+        else:
+            out[c] = values[ends]
+    return pd.DataFrame(out, columns=df.columns)
@@ -3,9 +3,8 @@
 modules for evaluation and comparison on multiple object with price dataframe
 """
 
-from pyecharts.charts import HeatMap, Line
-
-from xalpha.cons import convert_date, heatmap_opts, line_opts, yesterdayobj
+import xalpha.cons as xc
+from xalpha.cons import convert_date, yesterdayobj
 
 
 class evaluate:
@@ -60,11 +59,13 @@ Therefore, it is recommended to manually set the start time to about a week afte
         :param vopts: dict, options for pyecharts instead of builtin settings
         :returns: pyecharts.charts.Line.render_notebook()
         """
+        from pyecharts.charts import Line
+
         partprice = self.totprice[self.totprice["date"] <= end]
 
         line = Line()
         if vopts is None:
-            vopts = line_opts
+            vopts = xc.line_opts
         line.set_global_opts(**vopts)
         line.add_xaxis([d.date() for d in list(partprice.date)])
         for fund in self.fundobjs:
@@ -96,6 +97,8 @@ Therefore, it is recommended to manually set the start time to about a week afte
         :param end: string or object of date, the end date of the line
         :returns: pyecharts.charts.Heatmap.render_notebook object
         """
+        from pyecharts.charts import HeatMap
+
         ctable = self.correlation_table(end)
         x_axis = list(ctable.columns)
         data = [
@@ -107,7 +110,7 @@ Therefore, it is recommended to manually set the start time to about a week afte
         heatmap.add_xaxis(x_axis)
         heatmap.add_yaxis(series_name="相关性", yaxis_data=x_axis, value=data)
         if vopts is None:
-            vopts = heatmap_opts
+            vopts = xc.heatmap_opts
         heatmap.set_global_opts(**vopts)
         if rendered:
             return heatmap.render_notebook()
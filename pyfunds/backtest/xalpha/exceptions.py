@@ -40,6 +40,14 @@ class HttpStatusError(XalphaException):
     pass
 
 
+class CassetteMissing(XalphaException):
+    """
+    Used when a request has no recorded response while replaying cassettes
+    """
+
+    pass
+
+
 class ParserFailure(XalphaException):
     """
     Used for exception when parsing fund APIs
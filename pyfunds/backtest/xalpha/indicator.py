@@ -3,12 +3,45 @@
 module for implementation of indicator class, which is designed as MinIn for systems with netvalues
 """
 
+import numpy as np
 import pandas as pd
-from pyecharts import options as opts
-from pyecharts.charts import Kline, Line, Bar, Grid
-from pyecharts.commons.utils import JsCode
 
-from xalpha.cons import line_opts, opendate, yesterdayobj, sqrt_days_in_year
+import xalpha.cons as xc
+from xalpha.cons import yesterdayobj, sqrt_days_in_year
+from xalpha.downsample import downsample_df, ohlc_buckets, target_points
+
+# visible range in percent of the datazoom sliders of the builtin pyecharts options
+_default_zoom = (50, 100)
+
+
+def _zoom(vopts):
+    """
+    visible range in percent given by the datazoom options of the chart, the narrowest one when
+    several sliders are set
+
+    :param vopts: dict, global options of pyecharts
+    :return: tuple of (start, end)
+    """
+    dzs = (vopts or {}).get("datazoom_opts")
+    if not dzs:
+        return (0, 100)
+    if not isinstance(dzs, (list, tuple)):
+        dzs = [dzs]
+    zooms = []
+    for dz in dzs:
+        d = getattr(dz, "opts", dz)
+        if not isinstance(d, dict):
+            continue
+        start, end = d.get("start"), d.get("end")
+        zooms.append(
+            (
+                _default_zoom[0] if start is None else start,
+                _default_zoom[1] if end is None else end,
+            )
+        )
+    if not zooms:
+        return _default_zoom
+    return min(zooms, key=lambda z: z[1] - z[0])
 
 
 def _upcount(ls):
@@ -72,7 +105,7 @@ class indicator:
             for date in times:
                 netvalue.append(self.unitvalue(date))  # may take a long time
             self.price = pd.DataFrame(data={"date": times, "netvalue": netvalue})
-            self.price = self.price[self.price["date"].isin(opendate)]
+            self.price = self.price[self.price["date"].isin(xc.opendate)]
             self.name = name
 
     def comparison(self, date=yesterdayobj()):
@@ -202,10 +235,9 @@ class indicator:
     def information_ratio(self, date=yesterdayobj()):
         rp = self.total_annualized_returns(date)
         rm = self.benchmark_annualized_returns(date)
-        vp = indicator.ratedaily(self.price, date)
-        vm = indicator.ratedaily(self.bmprice, date)
-        diff = [vp[i] - vm[i] for i in range(len(vm))]
-        df = pd.DataFrame(data={"rate": diff})
+        vp = np.asarray(indicator.ratedaily(self.price, date))
+        vm = np.asarray(indicator.ratedaily(self.bmprice, date))
+        df = pd.DataFrame(data={"rate": vp[: len(vm)] - vm})
         var = df.std().rate
         var = var * sqrt_days_in_year
         return (rp - rm) / var
@@ -218,15 +250,15 @@ class indicator:
         :returns: three elements tuple, the first two are the date obj of
             start and end of the time window, the third one is the drawdown amplitude in unit 1.
         """
-        li = [
-            (row["date"], row["netvalue"])
-            for i, row in self.price[self.price["date"] <= date].iterrows()
-        ]
-        res = []
-        for i, _ in enumerate(li):
-            for j in range(i + 1, len(li)):
-                res.append((li[i][0], li[j][0], (li[j][1] - li[i][1]) / li[i][1]))
-        return min(res, key=lambda x: x[2])
+        partp = self.price[self.price["date"] <= date]
+        values = partp["netvalue"].to_numpy(dtype=float)
+        # the worst (v_j - v_i) / v_i over i < j is reached at the highest v_i before each j
+        peaks = np.maximum.accumulate(values)[:-1]
+        changes = (values[1:] - peaks) / peaks
+        j = int(np.argmin(changes)) + 1
+        i = int(np.argmax(values[:j]))
+        dates = partp["date"]
+        return (dates.iloc[i], dates.iloc[j], changes[j - 1])
 
     ## The above is basically the overall quantitative indicators provided by Jukuan, and the following are other short-term technical indicators
 
@@ -463,22 +495,46 @@ class indicator:
 
     ## Here's the visualization part
 
-    def v_netvalue(self, end=yesterdayobj(), benchmark=True, rendered=True, vopts=None):
+    def v_netvalue(
+        self,
+        end=yesterdayobj(),
+        benchmark=True,
+        rendered=True,
+        vopts=None,
+        exact=False,
+        width=None,
+    ):
         """
         visulaization on  netvalue curve
 
         :param end: dateobject for indicating the end date in the figure, default to yesterday
         :param benchmark: bool, whether include benchmark's netvalue curve, default true
         :param vopts: dict, options for pyecharts instead of builtin settings
+        :param exact: bool, plot every point instead of the LTTB downsampled curves
+        :param width: Optional[int], pixel width of the chart used to choose the number of points
         """
         if getattr(self, "bmprice", None) is None:
             benchmark = False
         if benchmark:
             a, b = self.comparison(end)
+            # benchmark values on the dates of the netvalue, both curves share the x axis
+            b = a[["date"]].merge(b[["date", "netvalue"]], on="date", how="left")
         else:
             a = self.price
         if vopts is None:
-            vopts = line_opts
+            vopts = xc.line_opts
+        if not exact:
+            cols = {"a": a.netvalue.values}
+            if benchmark:
+                cols["b"] = b.netvalue.values
+            kept = downsample_df(
+                pd.DataFrame(cols), target_points(width, _zoom(vopts))
+            ).index.values
+            a = a.iloc[kept]
+            if benchmark:
+                b = b.iloc[kept]
+        from pyecharts.charts import Line
+
         line = Line()
         line.add_xaxis([d.date() for d in list(a.date)])
         line.add_yaxis(
@@ -488,7 +544,7 @@ class indicator:
         if benchmark:
             line.add_yaxis(
                 series_name=self.benchmark.name,
-                y_axis=list(b.netvalue),
+                y_axis=[None if pd.isna(v) else v for v in b.netvalue],
                 is_symbol_show=False,
             )
         if rendered:
@@ -496,7 +552,15 @@ class indicator:
         else:
             return line
 
-    def v_techindex(self, end=yesterdayobj(), col=None, rendered=True, vopts=None):
+    def v_techindex(
+        self,
+        end=yesterdayobj(),
+        col=None,
+        rendered=True,
+        vopts=None,
+        exact=False,
+        width=None,
+    ):
         """
         visualization on netvalue curve and specified indicators
 
@@ -505,12 +569,23 @@ class indicator:
             remember generate these indicators before the visualization,
             these cols don't automatically generate for visualization
         :param vopts: dict, options for pyecharts instead of builtin settings
+        :param exact: bool, plot every point instead of the LTTB downsampled curves
+        :param width: Optional[int], pixel width of the chart used to choose the number of points
         """
         partprice = self.price[self.price["date"] <= end]
+        if vopts is None:
+            vopts = xc.line_opts
+        if not exact:
+            partprice = downsample_df(
+                partprice,
+                target_points(width, _zoom(vopts)),
+                x="date",
+                cols=["netvalue"] + list(col or []),
+            )
         xdata = [d.date() for d in list(partprice.date)]
         netvaldata = list(partprice.netvalue)
-        if vopts is None:
-            vopts = line_opts
+        from pyecharts.charts import Line
+
         line = Line()
         line.add_xaxis(xdata)
         line.add_yaxis(series_name="netvalue", y_axis=netvaldata, is_symbol_show=False)
@@ -535,6 +610,8 @@ def plot_kline(
     ucolorvolume=None,
     dcolorvolume=None,
     col="",
+    exact=False,
+    width=None,
 ):
     """
     For the dataframe, the form of the upper and lower volume charts of the standard kanban software is directly drawn
@@ -544,8 +621,17 @@ def plot_kline(
     :param ucolor: str for color when going up, default red in A stock as "#ef232a"
     :param dcolor: str for color when going down, default green in A stock as "#14b143"
     :param col:
+    :param exact: bool, draw every candle instead of merging consecutive candles into
+        OHLC buckets when there are more candles than pixels of the chart
+    :param width: Optional[int], pixel width of the chart used to choose the number of candles
     :return:
     """
+    if not exact:
+        df = ohlc_buckets(df, target_points(width, _default_zoom))
+    from pyecharts import options as opts
+    from pyecharts.charts import Kline, Line, Bar, Grid
+    from pyecharts.commons.utils import JsCode
+
     # TODO: color changing seems to make no effect, possible issue with pyecharts
     if ucolorborder is None:
         ucolorborder = ucolor
@@ -16,11 +16,11 @@ from bs4 import BeautifulSoup
 from sqlalchemy import exc
 
 import xalpha.remain as rm
+import xalpha.cons as xc
 from xalpha.cons import (
     convert_date,
     droplist,
     myround,
-    opendate,
     yesterday,
     yesterdaydash,
     yesterdayobj,
@@ -623,7 +623,7 @@ class fundinfo(basicinfo):
         # shengou rate in tiantianjijin, daeshengou rate discount is not considered
         self.name = name  # the name of the fund
         df = pd.DataFrame(data=infodict)
-        df = df[df["date"].isin(opendate)]
+        df = df[df["date"].isin(xc.opendate)]
         df = df.reset_index(drop=True)
         if len(df) == 0:
             raise ParserFailure("no price table found for this fund %s" % self.code)
@@ -895,7 +895,7 @@ class fundinfo(basicinfo):
         import xalpha.universal as xu
 
         df = xu.get_daily("F" + self.code, start=lastdate.strftime("%Y%m%d"))
-        df = df[df["date"].isin(opendate)]
+        df = df[df["date"].isin(xc.opendate)]
         df = df.reset_index(drop=True)
         df = df[df["date"] <= yesterdayobj()]
         df = df[df["date"] > lastdate]
@@ -905,7 +905,7 @@ class fundinfo(basicinfo):
             df["comment"] = [0 for _ in range(len(df))]
             df["netvalue"] = df["close"]
             df = df.drop("close", axis=1)
-            df = df[df["date"].isin(opendate)]
+            df = df[df["date"].isin(xc.opendate)]
             for d in r:
                 df.loc[df["date"] == d["EXDDATE"], "comment"] = d["BONUS"]
             self.price = self.price.append(df, ignore_index=True, sort=True)
@@ -985,7 +985,7 @@ class fundinfo(basicinfo):
             }
         )
         df = df.iloc[::-1]  ## reverse the time order
-        df = df[df["date"].isin(opendate)]
+        df = df[df["date"].isin(xc.opendate)]
         df = df.reset_index(drop=True)
         df = df[df["date"] <= yesterdayobj()]
         if len(df) != 0:
@@ -1126,7 +1126,7 @@ Note that the industry here may be more subdivided, resulting in the possibility
         df["comment"] = [0 for _ in range(len(df))]
         df["netvalue"] = df["close"]
         df["date"] = pd.to_datetime(df["date"])
-        df = df[df["date"].isin(opendate)]
+        df = df[df["date"].isin(xc.opendate)]
         for d in r:
             df.loc[df["date"] == d["EXDDATE"], "comment"] = d["BONUS"]
         df = df.drop("close", axis=1)
@@ -1216,7 +1216,7 @@ class indexinfo(basicinfo):
         index = pd.DataFrame(data=dd)
         index = index.iloc[::-1]
         index = index.reset_index(drop=True)
-        self.price = index[index["date"].isin(opendate)]
+        self.price = index[index["date"].isin(xc.opendate)]
         self.price = self.price[self.price["date"] <= yesterdaydash()]
         self.name = my_list[-1][2]
 
@@ -1324,7 +1324,7 @@ class cashinfo(basicinfo):
             "comment": [0 for _ in datel],
         }
         df = pd.DataFrame(data=dfdict)
-        self.price = df[df["date"].isin(opendate)]
+        self.price = df[df["date"].isin(xc.opendate)]
 
 
 class mfundinfo(basicinfo):
@@ -1397,7 +1397,7 @@ class mfundinfo(basicinfo):
                 "comment": [0 for _ in datel],
             }
         )
-        df = df[df["date"].isin(opendate)]
+        df = df[df["date"].isin(xc.opendate)]
         if len(df) == 0:
             raise ParserFailure("no price table for %s" % self.code)
         df = df.reset_index(drop=True)
@@ -1546,7 +1546,7 @@ class mfundinfo(basicinfo):
                 "comment": comment,
             }
         )
-        df = df[df["date"].isin(opendate)]
+        df = df[df["date"].isin(xc.opendate)]
         df = df.reset_index(drop=True)
         df = df[df["date"] <= yesterdayobj()]
         if len(df) != 0:
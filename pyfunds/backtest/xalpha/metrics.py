@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+vectorized performance metrics of one strategy or a panel of strategies
+
+all the metrics are computed on a (periods x strategies) array in one pass, without
+date filtering or python loops over the periods, eg.
+
+.. code-block:: python
+
+    from xalpha.metrics import metrics
+
+    metrics(equity=df["strategy"], benchmark=df["base"], positions=df["signals"])
+    metrics(returns=panel, benchmark=index_returns, riskfree=0.03)  # one row per column
+"""
+
+import numpy as np
+import pandas as pd
+
+from xalpha.cons import sqrt_days_in_year
+
+PERIODS_PER_YEAR = int(round(sqrt_days_in_year ** 2))
+
+COLUMNS = [
+    "total_return",
+    "annual_return",
+    "volatility",
+    "sharpe",
+    "sortino",
+    "max_drawdown",
+    "max_drawdown_duration",
+    "calmar",
+    "beta",
+    "alpha",
+    "information_ratio",
+    "hit_rate",
+    "turnover",
+]
+
+
+def _to_returns(data, equity):
+    if isinstance(data, pd.Series):
+        data = data.to_frame()
+    data = pd.DataFrame(data).astype(float)
+    if equity:
+        return data.pct_change().iloc[1:]
+    return data
+
+
+def _years(data, equity, periods_per_year):
+    # net values indexed by dates span the calendar days between the first and the last one,
+    # as in ``indicator.annualized_returns``, otherwise count the periods
+    if equity and isinstance(data.index, pd.DatetimeIndex) and len(data) > 1:
+        return (data.index[-1] - data.index[0]).days / 365
+    return (len(data) - 1 if equity else len(data)) / periods_per_year
+
+
+def drawdown(equity):
+    """
+    :param equity: np.ndarray of shape (periods, strategies), positive values
+    :return: np.ndarray of the same shape, relative drawdown from the running maximum, <= 0
+    """
+    return equity / np.maximum.accumulate(equity, axis=0) - 1
+
+
+def max_drawdown_duration(dd):
+    """
+    :param dd: np.ndarray of shape (periods, strategies) from :func:`drawdown`
+    :return: np.ndarray of shape (strategies,), longest number of periods spent below a high
+    """
+    t = np.arange(dd.shape[0])[:, None]
+    last_high = np.maximum.accumulate(np.where(dd >= 0, t, 0), axis=0)
+    return (t - last_high).max(axis=0)
+
+
+def metrics(
+    equity=None,
+    returns=None,
+    benchmark=None,
+    positions=None,
+    riskfree=0.0,
+    periods_per_year=PERIODS_PER_YEAR,
+    benchmark_is_equity=None,
+):
+    """
+    performance metrics of strategies
+
+    :param equity: pd.Series or pd.DataFrame of net values, one column per strategy
+    :param returns: pd.Series or pd.DataFrame of period returns, instead of ``equity``
+    :param benchmark: Optional[pd.Series]. net values (with ``equity``) or returns (with
+        ``returns``) of the benchmark, aligned on the same index, for beta, alpha and the
+        information ratio
+    :param positions: Optional. positions or weights of the strategies, same shape as the
+        input, for the turnover
+    :param riskfree: float. annual riskfree rate in the unit of 1
+    :param periods_per_year: int. number of periods in a year, 250 trading days by default;
+        net values indexed by dates are annualized over their calendar days instead
+    :param benchmark_is_equity: Optional[bool]. force the interpretation of ``benchmark``
+    :return: pd.Series of the metrics for a series input, pd.DataFrame with one row per
+        strategy for a dataframe input. Returns, volatility and alpha are annualized,
+        max_drawdown is negative and max_drawdown_duration counted in periods
+    """
+    if (equity is None) == (returns is None):
+        raise ValueError("give exactly one of equity and returns")
+    data = returns if equity is None else equity
+    single = isinstance(data, pd.Series)
+    rets = _to_returns(data, equity is not None)
+    names = list(rets.columns)
+    r = rets.to_numpy()
+    valid = ~np.isnan(r)
+    r0 = np.where(valid, r, 0.0)
+    n = valid.sum(axis=0)
+    years = _years(data, equity is not None, periods_per_year)
+    sqrt_ppy = np.sqrt(periods_per_year)
+
+    curve = np.vstack([np.ones((1, r.shape[1])), np.cumprod(1 + r0, axis=0)])
+    total = curve[-1] - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annual = (1 + total) ** (1 / years) - 1 if years > 0 else np.full_like(total, np.nan)
+        vol = np.nanstd(r, axis=0, ddof=1) * sqrt_ppy
+        downside = np.sqrt((np.minimum(r0, 0) ** 2).sum(axis=0) / n) * sqrt_ppy
+        dd = drawdown(curve)
+        max_dd = dd.min(axis=0)
+        out = {
+            "total_return": total,
+            "annual_return": annual,
+            "volatility": vol,
+            "sharpe": (annual - riskfree) / vol,
+            "sortino": (annual - riskfree) / downside,
+            "max_drawdown": max_dd,
+            "max_drawdown_duration": max_drawdown_duration(dd),
+            "calmar": annual / np.abs(max_dd),
+            "hit_rate": (r0 > 0).sum(axis=0) / (valid & (r0 != 0)).sum(axis=0),
+        }
+
+        if benchmark is not None:
+            if benchmark_is_equity is None:
+                benchmark_is_equity = equity is not None
+            b = _to_returns(benchmark, benchmark_is_equity).iloc[:, 0]
+            b = b.reindex(rets.index).to_numpy()[:, None]
+            both = valid & ~np.isnan(b)
+            rc = np.where(both, r, np.nan)
+            bc = np.where(both, b, np.nan)
+            cov = np.nanmean(
+                (rc - np.nanmean(rc, axis=0)) * (bc - np.nanmean(bc, axis=0)), axis=0
+            )
+            beta = cov / np.nanvar(bc, axis=0)
+            b_annual = np.nanprod(1 + bc, axis=0) ** (1 / years) - 1
+            tracking = np.nanstd(rc - bc, axis=0, ddof=1) * sqrt_ppy
+            out["beta"] = beta
+            out["alpha"] = annual - (riskfree + beta * (b_annual - riskfree))
+            out["information_ratio"] = (annual - b_annual) / tracking
+        else:
+            out["beta"] = out["alpha"] = out["information_ratio"] = np.full(len(names), np.nan)
+
+        if positions is not None:
+            pos = pd.DataFrame(positions).astype(float)
+            if pos.shape[1] == len(names):
+                pos.columns = names
+            pos = pos.reindex(index=data.index, columns=names).to_numpy()
+            changes = np.abs(np.diff(np.nan_to_num(pos), axis=0)).sum(axis=0)
+            out["turnover"] = changes / years if years > 0 else np.nan
+        else:
+            out["turnover"] = np.full(len(names), np.nan)
+
+    table = pd.DataFrame(out, index=names)[COLUMNS]
+    if single:
+        return table.iloc[0].rename(None)
+    return table
@@ -4,7 +4,8 @@ modules for policy making: generate status table for simple backtesting
 """
 import pandas as pd
 
-from xalpha.cons import myround, opendate, yesterdaydash, convert_date
+import xalpha.cons as xc
+from xalpha.cons import myround, yesterdaydash, convert_date
 from xalpha.record import record
 
 
@@ -32,19 +33,62 @@ class policy(record):
         else:
             self.start = self.price.iloc[0].date
             self.end = self.price.iloc[-1].date
-            datel = []
-            actionl = []
-            times = pd.date_range(self.start, self.end)
-            for date in times:
-                action = self.status_gen(date)
-                if action > 0:
-                    datel.append(date)
-                    actionl.append(action)
-                elif action < 0:
-                    datel.append(date)
-                    actionl.append(action * 0.005)
-            df = pd.DataFrame(data={"date": datel, self.aim.code: actionl})
-            self.status = df
+            self.status = self._run(pd.date_range(self.start, self.end))
+
+    def _action(self, date):
+        action = self.status_gen(date)
+        if action < 0:
+            return action * 0.005
+        return action
+
+    def _run(self, times):
+        datel = []
+        actionl = []
+        for date in times:
+            action = self._action(date)
+            if action > 0 or action < 0:
+                datel.append(date)
+                actionl.append(action)
+        return pd.DataFrame(data={"date": datel, self.aim.code: actionl})
+
+    def _refresh_price(self, end):
+        self.price = self.aim.price[
+            (self.aim.price["date"] >= self.start) & (self.aim.price["date"] <= end)
+        ]
+
+    def extend(self, end):
+        """
+        run the policy on the dates after ``self.end`` up to ``end``, with the rows appended to
+        ``self.aim.price`` since the policy was built, and append the decisions to ``self.status``
+
+        :param end: string or object of date
+        :returns: pd.DataFrame, the new rows of the status table
+        """
+        end = convert_date(end)
+        if end <= self.end:
+            return self.status.iloc[:0]
+        self._refresh_price(end)
+        new = self._run(pd.date_range(self.end + pd.Timedelta(days=1), end))
+        self.end = end
+        self.status = pd.concat([self.status, new], ignore_index=True)
+        return new
+
+    def peek(self, date):
+        """
+        decision of the policy on ``date`` after ``self.end``, eg. on a realtime estimate appended
+        to ``self.aim.price``, the state of the policy and its status table are left unchanged
+
+        :param date: string or object of date
+        :returns: float, positive for buying money, negative for selling ratio as in the status table
+        """
+        date = convert_date(date)
+        state = dict(self.__dict__)
+        try:
+            self._refresh_price(date)
+            return self._action(date)
+        finally:
+            self.__dict__.clear()
+            self.__dict__.update(state)
 
     def status_gen(self, date):
         """
@@ -216,7 +260,7 @@ class grid(policy):
 
     def status_gen(self, date):
 
-        if date.strftime("%Y-%m-%d") not in opendate:
+        if date.strftime("%Y-%m-%d") not in xc.opendate_set:
             return 0
 
         if date == self.start:
@@ -260,7 +304,7 @@ class indicator_cross(policy):
         super().__init__(infoobj, start, end, totmoney)
 
     def status_gen(self, date):
-        if date.strftime("%Y-%m-%d") not in opendate:
+        if date.strftime("%Y-%m-%d") not in xc.opendate_set:
             return 0
         rows = self.price[self.price["date"] <= date]
         if len(rows) == 1:
@@ -337,7 +381,7 @@ class indicator_points(policy):
         super().__init__(infoobj, start, end, totmoney)
 
     def status_gen(self, date):
-        if date.strftime("%Y-%m-%d") not in opendate:
+        if date.strftime("%Y-%m-%d") not in xc.opendate_set:
             return 0
         rows = self.price[self.price["date"] <= date]
         if len(rows) == 1:
@@ -8,7 +8,10 @@ module for realtime watch and notfication
 # 因此该模块可能随时不再支持
 
 import datetime as dt
+import logging
 import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from email.header import Header
 from email.mime.text import MIMEText
 from email.utils import formataddr, parseaddr
@@ -19,6 +22,8 @@ from xalpha.cons import today_obj, rget
 from xalpha.info import fundinfo
 from xalpha.trade import trade
 
+logger = logging.getLogger(__name__)
+
 
 def _format_addr(s):
     """
@@ -96,6 +101,44 @@ class rtdata:
         )
 
 
+def get_rtdata(codes, max_workers=8):
+    """
+    get real time data of several funds concurrently
+
+    :param codes: list of strings of six digitals for funds
+    :param max_workers: int, number of funds fetched at the same time
+    :returns: dict of code: rtdata object, the funds failing to fetch are left out
+    """
+
+    def _get(code):
+        try:
+            return rtdata(code)
+        except Exception as e:
+            logger.warning("fails to fetch the estimate of %s: %s" % (code, e))
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        rts = list(executor.map(_get, codes))
+    return {code: rt for code, rt in zip(codes, rts) if rt is not None}
+
+
+def _append_estimate(fundobj, rt):
+    """
+    append the estimate netvalue of rt to the price table of fundobj
+
+    :returns: the date of the estimate, None if the netvalue of that date is already known
+    """
+    rtdate = dt.datetime.combine(rt.time, dt.time.min)
+    if (rtdate - fundobj.price.iloc[-1].date).days <= 0:
+        return None
+    row = pd.DataFrame(
+        [[rtdate, rt.rtvalue, fundobj.price.iloc[-1].totvalue, 0]],
+        columns=["date", "netvalue", "totvalue", "comment"],
+    )
+    fundobj.price = pd.concat([fundobj.price, row], ignore_index=True, sort=True)
+    return rtdate
+
+
 def rfundinfo(
     code, round_label=0, dividend_label=0, fetch=False, save=False, path="", form="csv"
 ):
@@ -118,20 +161,28 @@ def rfundinfo(
         path=path,
         form=form,
     )
-    rt = rtdata(code)
-    rtdate = dt.datetime.combine(rt.time, dt.time.min)
-    rtvalue = rt.rtvalue
-    if (rtdate - fundobj.price.iloc[-1].date).days > 0:
-        fundobj.price = fundobj.price.append(
-            pd.DataFrame(
-                [[rtdate, rtvalue, fundobj.price.iloc[-1].totvalue, 0]],
-                columns=["date", "netvalue", "totvalue", "comment"],
-            ),
-            ignore_index=True,
-        )
+    _append_estimate(fundobj, rtdata(code))
     return fundobj
 
 
+def _suggestion(policy, action, name):
+    """
+    the purchase suggestion of a row of the status table of the policy, in Chinese
+    """
+    if action > 0:
+        sug = "买入%s元" % action
+    elif action < 0:
+        ratio = -action / 0.005 * 100
+        share = (
+            trade(policy.aim, policy.status).briefdailyreport().get("currentshare", 0)
+        )
+        share = -action / 0.005 * share
+        sug = "卖出%s%%的份额，也即%s份额" % (ratio, share)
+    else:
+        sug = "暂不操作"
+    return "根据%s计划，建议%s，%s(%s)" % (name, sug, policy.aim.name, policy.aim.code)
+
+
 class review:
     """
     review policys and give the realtime purchase suggestions
@@ -160,20 +211,7 @@ class review:
                     self.namelist[i],
                 )
                 self.warn.append(warn)
-                if warn[2] > 0:
-                    sug = "买入%s元" % warn[2]
-                elif warn[2] < 0:
-                    ratio = -warn[2] / 0.005 * 100
-                    share = (
-                        trade(fundinfo(warn[1]), policy.status)
-                        .briefdailyreport()
-                        .get("currentshare", 0)
-                    )
-                    share = -warn[2] / 0.005 * share
-                    sug = "卖出%s%%的份额，也即%s份额" % (ratio, share)
-                self.message.append(
-                    "根据%s计划，建议%s，%s(%s)" % (warn[3], sug, warn[0], warn[1])
-                )
+                self.message.append(_suggestion(policy, warn[2], warn[3]))
         self.content = "\n".join(map(str, self.message))
 
     def __str__(self):
@@ -197,3 +235,210 @@ class review:
                 print("邮件发送失败")
         else:
             print("没有提醒待发送")
+
+
+def mail_subscriber(conf, types=("policy",), title="Notification"):
+    """
+    subscriber of :class:`rtwatcher` sending an email for each event
+
+    :param conf: the configuration dictionary of :func:`mail`
+    :param types: tuple of the event types sent, "policy" and/or "estimate"
+    :param title: str, title of the emails
+    :returns: the callback to give to ``rtwatcher.subscribe``
+    """
+
+    def send(event):
+        if event["type"] in types and not mail(title, event["message"], **conf):
+            logger.warning("fails to send the email of %s" % event["message"])
+
+    return send
+
+
+class rtwatcher:
+    """
+    long running watch of the realtime estimates of a list of funds. The fundinfo objects are built
+    once, each poll fetches the estimates of all the funds concurrently, appends them to the price
+    tables in place, runs the registered policies on the estimate date only and publishes what moved
+    to the subscribers, eg.
+
+    .. code-block:: python
+
+        w = rtwatcher(["001469", "110022"], interval=60, threshold=0.001)
+        w.add_policy(xa.policy.buyandhold(w.infos["001469"], start="2018-08-10"), "Plan A")
+        w.subscribe(print)
+        w.subscribe(mail_subscriber(conf))
+        w.start()
+
+    Each event is a dict with the keys type ("estimate" or "policy"), code, date and message. Estimate
+    events also have name, time, value and change (relative to the last netvalue), policy events
+    have name (the policy name) and action (as in the status table). An estimate is published again
+    when it moves by more than ``threshold``, a policy when its decision for the day changes.
+
+    :param funds: list of fund codes or fundinfo objects
+    :param interval: float, seconds between two polls
+    :param threshold: float, minimum relative move of an estimate to publish it again
+    :param max_workers: int, number of funds fetched at the same time
+    :param infokws: options of fundinfo for the codes, eg. fetch=True, save=True, path="data/"
+    """
+
+    def __init__(self, funds, interval=60, threshold=0.0, max_workers=8, **infokws):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_workers = max_workers
+        self.infos = {}
+        self.policies = []
+        self.subscribers = []
+        self.estimates = {}  # code: last published estimate event
+        self.actions = {}  # policy name: (date, action) last published
+        self._confirmed = {}  # code: number of rows of the price table without the estimate
+        codes = [f for f in funds if isinstance(f, str)]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            infos = list(executor.map(lambda code: fundinfo(code, **infokws), codes))
+        for fundobj in infos + [f for f in funds if not isinstance(f, str)]:
+            self._add_info(fundobj)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _add_info(self, fundobj):
+        self.infos[fundobj.code] = fundobj
+        self._confirmed[fundobj.code] = len(fundobj.price)
+
+    def add_policy(self, policy, name=None):
+        """
+        run the policy on each estimate of its fund, the fund is added to the watch list if needed
+
+        :param policy: policy object, its aim is replaced by the fundinfo object of the watcher
+        :param name: the name of the policy in the events, default as its index
+        """
+        code = policy.aim.code
+        if code not in self.infos:
+            self._add_info(policy.aim)
+        policy.aim = self.infos[code]
+        if name is None:
+            name = len(self.policies)
+        self.policies.append((name, policy))
+
+    def subscribe(self, callback):
+        """
+        :param callback: function called with each published event
+        """
+        self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self.subscribers = [c for c in self.subscribers if c is not callback]
+
+    def publish(self, event):
+        for callback in self.subscribers:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("subscriber %s fails on %s" % (callback, event["message"]))
+
+    def _estimate(self, code, rt):
+        """
+        put the estimate rt in the price table of the fund and give the events it triggers
+        """
+        fundobj = self.infos[code]
+        fundobj.price = fundobj.price.iloc[: self._confirmed[code]]
+        last = self.estimates.get(code)
+        rtdate = dt.datetime.combine(rt.time, dt.time.min)
+        if last is not None and rtdate > last["date"]:
+            # a new day, the netvalues published since the last estimate are fetched first
+            try:
+                fundobj.update()
+            except Exception as e:
+                logger.warning("fails to update the netvalues of %s: %s" % (code, e))
+            self._confirmed[code] = len(fundobj.price)
+        policies = [(name, p) for name, p in self.policies if p.aim.code == code]
+        for _, policy in policies:
+            policy.extend(fundobj.price.iloc[-1].date)
+        lastvalue = fundobj.price.iloc[-1].netvalue
+        if _append_estimate(fundobj, rt) is None:
+            return []
+
+        events = []
+        value = rt.rtvalue
+        if (
+            last is None
+            or last["date"] != rtdate
+            or abs(value - last["value"]) > self.threshold * abs(last["value"])
+        ):
+            change = value / lastvalue - 1
+            event = {
+                "type": "estimate",
+                "code": code,
+                "name": rt.name,
+                "date": rtdate,
+                "time": rt.time,
+                "value": value,
+                "change": change,
+                "message": "%s(%s)估值%s，涨跌%.2f%%" % (rt.name, code, value, change * 100),
+            }
+            self.estimates[code] = event
+            events.append(event)
+
+        for name, policy in policies:
+            action = policy.peek(rtdate)
+            lastdate, lastaction = self.actions.get(name, (None, 0))
+            if lastdate != rtdate:
+                lastaction = 0
+            if action != lastaction:
+                self.actions[name] = (rtdate, action)
+                events.append(
+                    {
+                        "type": "policy",
+                        "code": code,
+                        "name": name,
+                        "date": rtdate,
+                        "action": action,
+                        "message": _suggestion(policy, action, name),
+                    }
+                )
+        return events
+
+    def poll(self):
+        """
+        fetch the estimates once and publish the events
+
+        :returns: list of the events published
+        """
+        rts = get_rtdata(list(self.infos), self.max_workers)
+        events = []
+        for code, rt in rts.items():
+            events.extend(self._estimate(code, rt))
+        for event in events:
+            self.publish(event)
+        return events
+
+    def run(self, rounds=None):
+        """
+        poll every ``interval`` seconds until :meth:`stop` or ``rounds`` polls
+
+        :param rounds: int, None for no limit
+        """
+        n = 0
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("poll of the estimates fails")
+            n += 1
+            if rounds is not None and n >= rounds:
+                break
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """
+        poll in a background thread
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="rtwatcher", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
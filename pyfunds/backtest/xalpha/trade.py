@@ -7,11 +7,10 @@ import datetime as dt
 import logging
 
 import pandas as pd
-from pyecharts.charts import Bar, Line
-from pyecharts import options as opts
 
 import xalpha.remain as rm
-from xalpha.cons import convert_date, line_opts, myround, xirr, yesterdayobj
+import xalpha.cons as xc
+from xalpha.cons import convert_date, myround, xirr, yesterdayobj
 from xalpha.exceptions import ParserFailure, TradeBehaviorError
 from xalpha.record import irecord
 import xalpha.universal as xu
@@ -107,6 +106,9 @@ def vtradevolume(cftable, freq="D", rendered=True):
         W for week and M for month, namely the trade volume is shown based on the time unit
     :returns: the Bar object
     """
+    from pyecharts import options as opts
+    from pyecharts.charts import Bar
+
     ### WARN: datazoom and time conflict, sliding till 1970..., need further look into pyeacharts
     startdate = cftable.iloc[0]["date"]
     if freq == "D":
@@ -202,6 +204,9 @@ def vtradecost(
 
     :returns: pyecharts.line
     """
+    from pyecharts import options as opts
+    from pyecharts.charts import Line
+
     funddata = []
     costdata = []
     pprice = self.price[self.price["date"] <= end]
@@ -375,7 +380,7 @@ class trade:
                 else:
                     feelabel = None
                 value = int(value * 100 + 1e-6) / 100
-                assert feelabel is None or feelabel >= 0.0,
+                assert feelabel is None or feelabel >= 0.0
                 rdate, cash, share = self.aim.shengou(value, date, fee=feelabel)
                 rem = rm.buy([], share, rdate)
             else:
@@ -532,7 +537,20 @@ class trade:
         partcftb = self.cftable[self.cftable["date"] <= date]
         value = self.get_netvalue(date)
 
-
+        if len(partcftb) == 0:
+            reportdict = {
+                "基金名称": [self.name],
+                "基金代码": [self.code],
+                "当日净值": [value],
+                "持有份额": [0],
+                "基金现值": [0],
+                "基金总申购": [0],
+                "历史最大占用": [0],
+                "基金分红与赎回": [0],
+                "换手率": [0],
+                "基金收益总额": [0],
+                "投资收益率": [0],
+            }
             df = pd.DataFrame(reportdict, columns=reportdict.keys())
             return df
         # totinput = myround(-sum(partcftb.loc[:,'cash']))
@@ -557,7 +575,21 @@ class trade:
         else:
             returnrate = round((ereturn / btnk) * 100, 4)
 
-
+        reportdict = {
+            "基金名称": [self.name],
+            "基金代码": [self.code],
+            "当日净值": [value],
+            "单位成本": [unitcost],
+            "持有份额": [currentshare],
+            "基金现值": [currentcash],
+            "基金总申购": [totinput],
+            "历史最大占用": [btnk],
+            "基金持有成本": [totinput - totoutput],
+            "基金分红与赎回": [totoutput],
+            "换手率": [turnover],
+            "基金收益总额": [ereturn],
+            "投资收益率": [returnrate],
+        }
         df = pd.DataFrame(reportdict, columns=reportdict.keys())
         return df
 
@@ -641,9 +673,11 @@ class trade:
             self.briefdailyreport(d).get("currentvalue", 0) for d in partp.date
         ]
 
+        from pyecharts.charts import Line
+
         line = Line()
         if vopts is None:
-            vopts = line_opts
+            vopts = xc.line_opts
 
         line.add_xaxis(date)
 
@@ -697,13 +731,13 @@ class itrade(trade):
                 or code.startswith("SH5119")
                 or code.startswith("SH5198")
             ):
-
+                self.type_ = "7"  # 货币基金
             elif (
                 code.startswith("SH5")
                 or code.startswith("SZ16")
                 or code.startswith("SZ159")
             ):
-
+                self.type_ = "9"  # 场内基金
             elif code.startswith("SH11") or code.startswith("SZ12"):
                 if self.name.endswith("1") or self.name.endswith("转2"):
                     self.type_ = "2"
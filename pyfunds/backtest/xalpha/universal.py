@@ -13,6 +13,7 @@ import pandas as pd
 import logging
 import inspect
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import wraps, lru_cache
 from uuid import uuid4
 from sqlalchemy import exc
@@ -939,8 +940,21 @@ ycDefIds={uid}&&wrjxCBFlag=0&&locale=zh_CN".format(
     return df
 
 
-def get_bond_rates_range(rating, duration=3, freq="W-FRI", start=None, end=None):
-    l = []
+def get_bond_rates_range(
+    rating, duration=3, freq="W-FRI", start=None, end=None, workers=None
+):
+    """
+    获取某评级企业债在一段时间内指定久期的预期利率，逐日结果缓存于 backend 中，
+    再次调用时仅抓取缓存中缺失的日期。
+
+    :param rating: str. eg AAA, B-AA+.3
+    :param duration: float, default 3. 久期，年
+    :param freq: str, default "W-FRI".
+    :param start: str.
+    :param end: str.
+    :param workers: Optional[int]. 并发请求数上限，默认为 ``range_workers``
+    :return: pd.DataFrame. 包含 date, close 两列
+    """
     if rating.startswith("B-"):
         rating = rating[2:]
     rs = rating.split(".")
@@ -948,10 +962,16 @@ def get_bond_rates_range(rating, duration=3, freq="W-FRI", start=None, end=None)
         duration = float(rs[1])
         rating = rs[0]
 
-    for d in pd.date_range(start, end, freq=freq):
-        df = get_bond_rates(rating, d.strftime("%Y-%m-%d"))
-        l.append([d, df[df["year"] <= duration].iloc[-1]["rate"]])
-    return pd.DataFrame(l, columns=["date", "close"])
+    def _rate(date):
+        df = get_bond_rates(rating, date)
+        return {"close": df[df["year"] <= duration].iloc[-1]["rate"]}
+
+    return _get_range_by_date(
+        "bondr-%s-%s" % (rating, duration),
+        pd.date_range(start, end, freq=freq),
+        _rate,
+        workers=workers,
+    )
 
 
 @data_source("jq")
@@ -978,6 +998,17 @@ def set_handler(method="daily", f=None):
     setattr(thismodule, "get_" + method + "_handler", f)
 
 
+def set_bar_aggregator(aggregator=None):
+    """
+    serve :func:`get_bar` from the bars built in process by a
+    :class:`xalpha.bars.BarAggregator` whenever they cover the request
+
+    :param aggregator: BarAggregator, default None to fetch the bars remotely only
+    :return: None
+    """
+    setattr(thismodule, "bar_aggregator", aggregator)
+
+
 def _get_daily(
     code, start=None, end=None, prev=365, _from=None, wrapper=True, handler=True, **kws
 ):
@@ -2346,18 +2377,105 @@ def get_teb(code, date):
     return {"e": df["e"].sum(), "b": df["b"].sum(), "m": df["market_cap"].sum()}  # 亿人民币
 
 
-def get_teb_range(code, start, end, freq="W-FRI"):
+def get_teb_range(code, start, end, freq="W-FRI", workers=None):
+    """
+    获取指数在一段时间内的总盈利，总净资产与总市值，逐日结果缓存于 backend 中，
+    再次调用时仅抓取缓存中缺失的日期。
+
+    :param code: str. 聚宽或雪球形式的指数代码
+    :param start: str.
+    :param end: str.
+    :param freq: str, default "W-FRI".
+    :param workers: Optional[int]. 并发请求数上限，默认为 ``range_workers``
+    :return: pd.DataFrame. 包含 date, e, b, m 四列
+    """
     if len(code.split(".")) != 2:
         code = _inverse_convert_code(code)
-    data = {"date": [], "e": [], "b": [], "m": []}
-    for d in pd.date_range(start, end, freq=freq):
-        data["date"].append(d)
-        r = get_teb(code, d.strftime("%Y-%m-%d"))
-        data["e"].append(r["e"])
-        data["b"].append(r["b"])
-        data["m"].append(r["m"])
-    df = pd.DataFrame(data)
-    return df
+    return _get_range_by_date(
+        "tebr-" + code,
+        pd.date_range(start, end, freq=freq),
+        lambda date: get_teb(code, date),
+        workers=workers,
+    )
+
+
+# 区间批量抓取时的默认并发数上限
+range_workers = 4
+
+
+def _load_range_cache(key):
+    backend = ioconf.get("backend")
+    if backend in ["csv", "sql"]:
+        return fetch_backend(key)
+    d = getattr(thismodule, "cached_dict", None) or {}
+    return d.get(ioconf.get("prefix", "") + key)
+
+
+def _save_range_cache(key, df):
+    backend = ioconf.get("backend")
+    if backend in ["csv", "sql"]:
+        save_backend(key, df, mode="w")
+    else:
+        if not getattr(thismodule, "cached_dict", None):
+            setattr(thismodule, "cached_dict", {})
+        getattr(thismodule, "cached_dict")[ioconf.get("prefix", "") + key] = df
+
+
+def _get_range_by_date(key, dates, f, workers=None):
+    """
+    逐日调用 f 并拼接为表格。已缓存在 backend 中的日期直接读取，
+    缺失的日期通过线程池并发抓取，新结果写回 backend。
+
+    :param key: str. 缓存表名
+    :param dates: Iterable[pd.Timestamp].
+    :param f: func. f("%Y-%m-%d") -> Dict[str, float]
+    :param workers: Optional[int]. 并发请求数上限，默认为 ``range_workers``
+    :return: pd.DataFrame. 包含 date 列以及 f 返回字典的各列，按日期升序
+    """
+    dates = list(dates)
+    df0 = _load_range_cache(key)
+    if df0 is not None and len(df0) > 0:
+        df0["date"] = pd.to_datetime(df0["date"])
+        cached_dates = set(df0["date"])
+    else:
+        df0 = None
+        cached_dates = set()
+    missing = [d for d in dates if d not in cached_dates]
+
+    if missing:
+        workers = min(workers or range_workers, len(missing))
+        rows = []
+        error = None
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(f, d.strftime("%Y-%m-%d")): d for d in missing
+            }
+            for future in as_completed(futures):
+                try:
+                    r = future.result()
+                except Exception as e:
+                    logger.warning(
+                        "fails at fetching %s on %s: %s" % (key, futures[future], e)
+                    )
+                    error = e
+                    continue
+                r = dict(r)
+                r["date"] = futures[future]
+                rows.append(r)
+        if rows:
+            df1 = pd.DataFrame(rows)
+            if df0 is not None:
+                df1 = pd.concat([df0, df1], ignore_index=True, sort=False)
+            df0 = df1.sort_values("date").reset_index(drop=True)
+            _save_range_cache(key, df0)
+        if error is not None:
+            # 已成功的日期已写入缓存，下次调用只需补抓失败的日期
+            raise error
+
+    if df0 is None:
+        return pd.DataFrame({"date": []})
+    df = df0[df0["date"].isin(dates)].reset_index(drop=True)
+    return df[["date"] + [c for c in df.columns if c != "date"]]
 
 
 def _convert_code(code):
@@ -2388,7 +2506,6 @@ def _inverse_convert_code(code):
         return code[2:] + ".XSHE"
 
 
-@lru_cache_time(ttl=60, maxsize=512)
 def get_bar(
     code, prev=24, interval=3600, _from=None, handler=True, start=None, end=None
 ):
@@ -2409,6 +2526,18 @@ def get_bar(
             if fr is not None:
                 return fr
 
+    aggregator = getattr(thismodule, "bar_aggregator", None)
+    if aggregator is not None and not _from and start is None and end is None:
+        # 进程内由实时行情合成的 K 线，不受 API 条数和缓存时间的限制
+        df = aggregator.get_bar(code, prev, interval)
+        if df is not None:
+            return df
+
+    return _get_bar(code, prev, interval, _from, start, end)
+
+
+@lru_cache_time(ttl=60, maxsize=512)
+def _get_bar(code, prev, interval, _from=None, start=None, end=None):
     if not _from:
         if (
             (start is not None)